@@ -0,0 +1,209 @@
+"""Serve the explorers' aggregates as JSON at /api, alongside the app.
+
+A Panel plugin, loaded with
+
+    panel serve app.py --plugins api
+
+or with --plugins metrics --plugins api to serve the metrics as well.
+
+Every route takes ?election=, which defaults to the election being served.
+
+    /api/flows                     preferences from each party to each party,
+                                   with totals (?electorate= to pick some)
+    /api/electorates/<stub>        an electorate's first preferences, and each
+                                   exclusion's flows and running totals
+    /api/electorates               many electorates in one response, picked with
+                                   ?electorate=a&electorate=b (all if none)
+    /api/greens?pct=<0-100>        the seats won with that share of the Greens'
+                                   preferences going to the ALP
+
+Responses are cached with the store's data, so a repeated request costs a
+lookup. Each is sent with an ETag hashed from its body (the batch route's
+from its electorates' and their ETags), and a request whose If-None-Match
+still matches is answered 304 Not Modified.
+Electorates keep their entries (and ETags) across a live count's refreshes
+until their own data changes.
+"""
+
+import hashlib
+import json
+
+from tornado.web import HTTPError, RequestHandler
+
+from data_store import data_args, elections, get_store
+
+# responses cached per store; the batch route is built from the electorates'
+CACHE_SIZE = 1024
+
+data_dir, election = data_args()
+
+
+def dumps(value):
+    return json.dumps(value, separators=(",", ":"))
+
+
+def digest(text):
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def _version(store):
+    return (store.mtime, store.version)
+
+
+def flows(store, electorates):
+    """The table of OverallPrefExplorer.get_table, for some electorates or all."""
+    table = store.party_flows.table(electorates)
+    return {
+        "electorates": electorates,
+        "from": table.index.astype(str).to_list(),
+        "to": table.columns.astype(str).to_list(),
+        "preferences": table.to_numpy().tolist(),
+    }
+
+
+def electorate(store, stub):
+    """An electorate's rows, as ElectoratePrefExplorer shows them."""
+    candidates = store.index.candidates(stub)
+    exclusions = []
+    for exclusion, rows in store.index.exclusions(stub):
+        first = rows.iloc[0]
+        exclusions.append(
+            {
+                "exclusion": exclusion,
+                "fromCandidate": first["fromCandidate"],
+                "fromParty": first["fromParty"],
+                "votesDistributed": int(first["votesDistributed"]),
+                "toCandidate": rows["toCandidate"].to_list(),
+                "toParty": rows["toParty"].astype(str).to_list(),
+                "preferences": rows["preferences"].to_list(),
+                "toRunningTotal": rows["toRunningTotal"].to_list(),
+            }
+        )
+    return {
+        "electorate": stub,
+        "name": store.electorates.get(stub, stub),
+        "candidate": candidates["candidate"].to_list(),
+        "party": candidates["party"].astype(str).to_list(),
+        "count": candidates["count"].to_list(),
+        "exclusions": exclusions,
+    }
+
+
+def greens(store, pct):
+    """The tally of GreensPrefExplorer at a slider position, and the winner of
+    each seat the Greens' preferences decided."""
+    flips = store.greens_flips
+    breakpoints = flips.breakpoints
+    return {
+        "pct": pct,
+        "actualPct": flips.actual_pref,
+        "tally": {str(p): int(n) for p, n in flips.tally(pct).items()},
+        "actual": {str(p): int(n) for p, n in flips.party_tally.items()},
+        "seats": [
+            {
+                "electorate": e,
+                "name": store.electorates.get(e, e),
+                "party": "ALP" if flip <= pct else str(party),
+                # slider position from which the ALP wins, if any
+                "alpFrom": int(flip) if flip <= 100 else None,
+            }
+            for e, flip, party in zip(
+                breakpoints.index, breakpoints["pct"], breakpoints["party"]
+            )
+        ],
+    }
+
+
+class ApiHandler(RequestHandler):
+    def set_default_headers(self):
+        self.set_header("Content-Type", "application/json")
+        # to be read by graphics on other sites, and checked before each use
+        self.set_header("Access-Control-Allow-Origin", "*")
+        self.set_header("Cache-Control", "no-cache")
+
+    def write_error(self, status_code, **kwargs):
+        self.finish(dumps({"error": self._reason}))
+
+    def store(self):
+        name = self.get_argument("election", election)
+        if name not in elections(data_dir, election):
+            raise HTTPError(404, reason=f"Unknown election: {name}")
+        return get_store(data_dir, name)
+
+    def electorates(self, known, picked=None):
+        """The electorates asked for, each of which must be `known`."""
+        if picked is None:
+            picked = self.get_arguments("electorate")
+        for stub in picked:
+            if stub not in known:
+                raise HTTPError(404, reason=f"Unknown electorate: {stub}")
+        return picked
+
+    def cached(self, store, key, build):
+        """(ETag, JSON) of a response, built on its first request."""
+
+        def entry():
+            body = dumps(build())
+            return f'"{digest(body)}"', body
+
+        return store.cache("api", CACHE_SIZE).get(key, entry)
+
+    def respond(self, etag, body):
+        self.set_header("Etag", etag)
+        if self.check_etag_header():
+            self.set_status(304)
+        else:
+            self.write(body)
+
+
+class FlowsHandler(ApiHandler):
+    def get(self):
+        store = self.store()
+        picked = self.electorates(store.party_flows.electorates)
+        # the same electorates, picked in any order, are one entry
+        picked = sorted(set(picked)) or None
+        key = ("flows", picked and tuple(picked), _version(store))
+        self.respond(*self.cached(store, key, lambda: flows(store, picked)))
+
+
+class ElectoratesHandler(ApiHandler):
+    def get(self, stub=None):
+        store = self.store()
+        known = store.index.electorates
+        if stub is not None:
+            self.electorates(known, [stub])
+            self.respond(*self.entry(store, stub))
+            return
+
+        picked = list(dict.fromkeys(self.electorates(known))) or known.to_list()
+        entries = [self.entry(store, stub) for stub in picked]
+        body = ",".join(f"{dumps(s)}:{body}" for s, (_, body) in zip(picked, entries))
+        etags = ",".join(f"{s}={etag}" for s, (etag, _) in zip(picked, entries))
+        self.respond(f'"{digest(etags)}"', f"{{{body}}}")
+
+    def entry(self, store, stub):
+        # keyed by the electorate alone, so it is dropped once it changes
+        return self.cached(store, ("electorate", stub), lambda: electorate(store, stub))
+
+
+class GreensHandler(ApiHandler):
+    def get(self):
+        store = self.store()
+        # without Greens-decided seats, every pct gives the actual tally
+        actual = store.greens_flips.actual_pref
+        try:
+            pct = int(self.get_argument("pct", 0 if actual is None else actual))
+        except ValueError:
+            pct = -1
+        if not 0 <= pct <= 100:
+            raise HTTPError(400, reason="pct must be a whole number from 0 to 100")
+        key = ("greens", pct, _version(store))
+        self.respond(*self.cached(store, key, lambda: greens(store, pct)))
+
+
+ROUTES = [
+    ("/api/flows", FlowsHandler, {}),
+    (r"/api/electorates/?", ElectoratesHandler, {}),
+    (r"/api/electorates/([^/]+)", ElectoratesHandler, {}),
+    ("/api/greens", GreensHandler, {}),
+]
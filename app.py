@@ -1,16 +1,23 @@
-import json
+from functools import partial
 
-import holoviews as hv
-import pandas as pd
 import panel as pn
+from bokeh.models import ColumnDataSource
 
-from consts import IND
-from electorate_pref_explorer import ElectoratePrefExplorer
-from greens_pref_explorer import GreensPrefExplorer
-from overall_pref_explorer import OverallPrefExplorer
+from data_store import (
+    data_args,
+    elections,
+    get_store,
+    share_frames,
+    unsubscribe_all,
+    watch,
+    watch_args,
+)
+from perf import SessionTimings, metrics, nbytes, serve_logging
+from utils import app_imports, load_holoviews
 
-hv.extension("bokeh")
-hv.opts.defaults(active_tools=["pan"])
+load_holoviews()
+serve_logging()
+share_frames()
 
 pn.extension(
     defer_load=True,
@@ -20,47 +27,246 @@ pn.extension(
     # loading_color="#0000ff",
 )
 
-# Read data
-with open("data/electorates.json", "r") as f:
-    electorates = json.load(f)
-electorates = {x["stub"]: x["electorateName"] for x in electorates}
+timings = SessionTimings()
 
-distribution = pd.read_parquet("data/qld_2024_distributions.parq")
-first_pref = pd.read_parquet("data/qld_2024_first_prefs.parq")
-final_tally = pd.read_parquet("data/qld_2024_final_tally.parq")
+# Data is loaded once per server process and shared by every session. The
+# data can be chosen when serving the app, e.g.
+#   panel serve app.py --args --data-dir synthetic --election synthetic_1
+# and any other election in the data directory's dataset (see dataset.py) can
+# be chosen in the app. On count night, serve with --watch [SECONDS] to
+# check the data for updated tables and send the changes to every session.
+data_dir, election = data_args()
+with timings.timed("data store"):
+    store = get_store(data_dir, election)
+if watch_args() is not None:
+    watch(watch_args())
 
 
-# the actual party tally
-idx = final_tally.groupby("electorate")["count"].idxmax()
-actual_party_tally = final_tally.loc[idx].value_counts("party")
-actual_party_tally = actual_party_tally[actual_party_tally > 0]
-actual_party_tally.name = "Actual"
+# Each tab is only built (and its module imported) when it is first opened.
+# Given the tab's explorer, a builder loads the current election into it
+# instead.
+def overall_flows(explorer=None):
+    with timings.timed("Overall Preference Flows: import"), app_imports():
+        from overall_pref_explorer import OverallPrefExplorer
 
-distribution_party = distribution[
-    (distribution["fromParty"] != IND) & (distribution["toParty"] != IND)
-]
+    data = {
+        "data": store.distribution_party,
+        "party_tally": store.actual_party_tally,
+        "flows": store.party_flows,
+        "winners": store.winners,
+        "names": store.electorates,
+    }
+    with timings.timed("Overall Preference Flows: build"):
+        if explorer is not None:
+            explorer.param.update(**data)
+            return explorer
+        return OverallPrefExplorer(**data)
 
-# The 1st tab
-tab_overall_flows = OverallPrefExplorer(
-    data=distribution_party, party_tally=actual_party_tally
-)
 
-# 2nd tab: pref distribution explorer for each electorate
-tab_electorate_explorer = ElectoratePrefExplorer(
-    distribution, first_pref, {v: k for k, v in electorates.items()}
-)
+# pref distribution explorer for each electorate
+def electorate_explorer(explorer=None):
+    with timings.timed("Electorate Explorer: import"), app_imports():
+        from electorate_pref_explorer import CACHE_SIZE, ElectoratePrefExplorer
+
+    data = (
+        store.index,
+        {v: k for k, v in store.electorates.items()},
+        store.cache("electorate", CACHE_SIZE),
+    )
+    with timings.timed("Electorate Explorer: build"):
+        if explorer is not None:
+            explorer.load(*data)
+            return explorer
+        return ElectoratePrefExplorer(*data)
+
+
+# Greens as 3rd party explorer; open the app with ?client_side=1 to move the
+# slider's work into the browser
+def greens_explorer(explorer=None):
+    with timings.timed("Greens Pref Explorer: import"), app_imports():
+        from greens_pref_explorer import WAFFLE_CACHE_SIZE, GreensPrefExplorer
+
+    data = (store.index, store.actual_party_tally, store.electorates)
+    client_side = pn.state.session_args.get("client_side", [b"0"])[0] == b"1"
+    with timings.timed("Greens Pref Explorer: build"):
+        if explorer is not None:
+            explorer.load(*data, flips=store.greens_flips)
+            return explorer
+        return GreensPrefExplorer(
+            *data,
+            cache=store.cache("waffle", WAFFLE_CACHE_SIZE),
+            flips=store.greens_flips,
+            client_side=client_side,
+        )
+
+
+# what-if recount of every electorate's final count
+def whatif_explorer(explorer=None):
+    with timings.timed("What-if: import"), app_imports():
+        from consts import IND
+        from whatif_pref_explorer import WhatIfPrefExplorer
+
+    data = (
+        store.recount,
+        store.actual_party_tally,
+        store.electorates,
+        store.recount.default_pairs(exclude=[IND]),
+    )
+    with timings.timed("What-if: build"):
+        if explorer is not None:
+            explorer.load(*data)
+            return explorer
+        return WhatIfPrefExplorer(*data)
 
-# Greens as 3rd party explorer
-tab_greens_explorer = GreensPrefExplorer(distribution, actual_party_tally, electorates)
+
+# Monte Carlo simulation of the final counts
+def simulation_explorer(explorer=None):
+    with timings.timed("Simulation: import"), app_imports():
+        from consts import IND
+        from simulation_pref_explorer import SimulationPrefExplorer
+
+    data = (
+        store.recount,
+        store.electorates,
+        store.recount.default_pairs(exclude=[IND]),
+    )
+    with timings.timed("Simulation: build"):
+        if explorer is not None:
+            explorer.load(*data)
+            return explorer
+        return SimulationPrefExplorer(*data)
+
+
+# uniform swings between two parties, on a pendulum of the final margins
+def swing_explorer(explorer=None):
+    with timings.timed("Uniform Swing: import"), app_imports():
+        from swing_pref_explorer import SwingPrefExplorer
+
+    data = (store.pendulum, store.actual_party_tally, store.electorates)
+    with timings.timed("Uniform Swing: build"):
+        if explorer is not None:
+            explorer.load(*data)
+            return explorer
+        return SwingPrefExplorer(*data)
+
+
+builders = {
+    "Overall Preference Flows": overall_flows,
+    "Electorate Explorer": electorate_explorer,
+    "Greens Pref Explorer": greens_explorer,
+    "What-if": whatif_explorer,
+    "Simulation": simulation_explorer,
+    "Uniform Swing": swing_explorer,
+}
+# explorers that can update just the electorates changed during a live count
+refreshers = {
+    "Electorate Explorer": lambda explorer, changed: explorer.refresh(
+        store.index, changed
+    ),
+    "Greens Pref Explorer": lambda explorer, changed: explorer.refresh(
+        store.index, store.actual_party_tally, changed, store.greens_flips
+    ),
+}
 tabs = pn.Tabs(
-    ("Overall Preference Flows", tab_overall_flows),
-    ("Electorate Explorer", tab_electorate_explorer),
-    ("Greens Pref Explorer", tab_greens_explorer),
+    *[(name, pn.Column(sizing_mode="stretch_both")) for name in builders],
+    dynamic=True,
+)
+explorers = {}
+
+
+def build_tab(event=None):
+    name = list(builders)[tabs.active]
+    placeholder = tabs[tabs.active]
+    if not placeholder.objects:
+        explorers[name] = builders[name]()
+        placeholder.objects = [explorers[name]]
+        timings.log()
+
+
+def reload_explorers(changed=None):
+    """Load the store into the tabs built so far, or only the electorates
+    changed during a live count."""
+    for name, explorer in list(explorers.items()):
+        if changed and name in refreshers:
+            refreshers[name](explorer, changed)
+        else:
+            builders[name](explorer)
+    build_tab()
+    timings.log()
+
+
+doc = pn.state.curdoc
+
+
+def store_changed(changed):
+    # called from the thread watching the data, so the session's explorers
+    # are updated on its own event loop
+    doc.add_next_tick_callback(partial(reload_explorers, changed))
+
+
+def switch_election(event):
+    global store
+    store.unsubscribe(store_changed)
+    with timings.timed(f"data store: {event.new}"):
+        store = get_store(data_dir, event.new)
+    store.subscribe(store_changed)
+    reload_explorers()
+
+
+def session_memory():
+    """Estimated bytes of frames and arrays held by this session alone, such
+    as the Greens explorer's bar data; the store's frames, and the tallies of
+    the Greens' flips, are shared by every session, so aren't counted."""
+    shared = {id(frame) for frame in store.frames.values()}
+    if "greens_flips" in vars(store):
+        shared.update(id(tally) for tally in store.greens_flips.tallies)
+    held = []
+    for explorer in list(explorers.values()):
+        for value in vars(explorer).values():
+            if isinstance(value, ColumnDataSource):
+                held += value.data.values()
+            elif id(value) not in shared:
+                held.append(value)
+    return nbytes(*held)
+
+
+# sessions are counted, and their memory estimated, for the /metrics route
+# served by metrics.py
+session_id = doc.session_context.id if doc.session_context else str(id(doc))
+metrics.session_started(session_id, session_memory)
+store.subscribe(store_changed)
+
+
+# the session's module globals are cleared before this is called, so what it
+# needs is bound to it here
+def session_destroyed(
+    context,
+    listener=store_changed,
+    session_id=session_id,
+    unsubscribe_all=unsubscribe_all,
+    metrics=metrics,
+):
+    unsubscribe_all(listener)
+    metrics.session_ended(session_id)
+
+
+pn.state.on_session_destroyed(session_destroyed)
+
+
+election_select = pn.widgets.Select(
+    name="Election",
+    options=elections(data_dir, election),
+    value=election,
+    width=200,
 )
+election_select.visible = len(election_select.options) > 1
+election_select.param.watch(switch_election, "value")
+tabs.param.watch(build_tab, "active")
+build_tab()
 
 template = pn.template.BootstrapTemplate(
     title="Queensland Election Preference Flow Explorer",
     sidebar=[],
 )
-template.main.append(tabs)
+template.main.append(pn.Column(election_select, tabs, sizing_mode="stretch_both"))
 template.servable()
@@ -0,0 +1,132 @@
+"""Measure what the Greens explorer's bars send to the browser per slider tick.
+
+The electorate bars are rendered into a Bokeh document, the slider is swept
+across its range and back in steps of --step, and every change to the
+document is serialised as the PATCH-DOC message the server would send.
+This is done for the original bars, rebuilt as new hv.Bars on every tick,
+and for the persistent bars whose data source is patched.
+
+    python -m benchmarks.greens_bytes_per_tick [--step 1]
+
+Rebuilding the bars takes seconds a tick, so the default step is 5; --step 1
+sweeps every position, and takes five times as long.
+"""
+
+import argparse
+import time
+
+import holoviews as hv
+import numpy as np
+import panel as pn
+from bokeh.document import Document
+from bokeh.models import NumeralTickFormatter
+from bokeh.protocol import Protocol
+
+from consts import colours
+from data_store import get_store, share_frames
+from greens_pref_explorer import GreensPrefExplorer
+from utils import hide_hook
+
+
+class RebuildGreensPrefExplorer(GreensPrefExplorer):
+    """The explorer with the bars rebuilt on every tick, as they used to be."""
+
+    def patch_bars(self):
+        pass
+
+    @staticmethod
+    def vote_bars(data, electorate):
+        running_totals = data[["toCandidate", "toRunningTotal", "toParty"]]
+        return hv.Bars(running_totals.sort_values("toRunningTotal")).opts(
+            hover_tooltips=[
+                ("Candidate", "@toCandidate"),
+                ("Party", "@toParty"),
+                ("Votes", "@toRunningTotal{0,0}"),
+            ],
+            invert_axes=True,
+            show_legend=False,
+            default_tools=["hover"],
+            toolbar=None,
+            axiswise="xaxis",
+            xformatter=NumeralTickFormatter(format="0 a"),
+            hooks=[hide_hook],
+        )
+
+    def electorate_bars(self):
+        return pn.panel(self.rebuilt_bars)
+
+    @pn.depends("green_pref")
+    def rebuilt_bars(self):
+        bars = []
+        data = self.flips.rows_at(self.green_pref)
+        for electorate, rows in data.groupby("electorate"):
+            bars.append(
+                self.vote_bars(rows, electorate).opts(
+                    width=200,
+                    height=80,
+                    ylabel="",
+                    yaxis=None,
+                    fontsize={"title": 10},
+                    color="toParty",
+                    cmap=colours,
+                    xaxis="bare",
+                    title=self.electorates[electorate],
+                )
+            )
+        return pn.FlexBox(*bars, align_items="center")
+
+
+def measure(explorer, positions):
+    """Bytes sent and seconds taken by each slider tick."""
+    doc = Document()
+    doc.add_root(explorer.electorate_bars().get_root(doc))
+
+    events = []
+    doc.on_change(lambda event: events.append(event))
+    protocol = Protocol()
+
+    sizes, times = [], []
+    for position in positions:
+        events.clear()
+        start = time.perf_counter()
+        explorer.green_pref = position
+        message = protocol.create("PATCH-DOC", events) if events else None
+        times.append(time.perf_counter() - start)
+        if message is None:
+            sizes.append(0)
+            continue
+        sizes.append(
+            len(message.header_json)
+            + len(message.metadata_json)
+            + len(message.content_json)
+            + sum(len(buffer.data) for buffer in message.buffers)
+        )
+    return np.array(sizes), np.array(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--step", type=int, default=5, help="slider step")
+    args = parser.parse_args()
+
+    hv.extension("bokeh")
+    share_frames()
+    store = get_store()
+    positions = list(range(0, 101, args.step)) + list(range(100, -1, -args.step))
+
+    print(f"{len(positions)} slider ticks")
+    print(f"  {'':<8} {'mean bytes':>12} {'max bytes':>12} {'mean ms':>10}")
+    for name, cls in [
+        ("rebuild", RebuildGreensPrefExplorer),
+        ("patch", GreensPrefExplorer),
+    ]:
+        explorer = cls(store.index, store.actual_party_tally, store.electorates)
+        sizes, times = measure(explorer, positions)
+        print(
+            f"  {name:<8} {sizes.mean():12,.0f} {sizes.max():12,} "
+            f"{times.mean() * 1000:10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
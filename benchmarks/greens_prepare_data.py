@@ -0,0 +1,114 @@
+"""Compare the Greens explorer's data preparation with the original per-electorate loop.
+
+Both implementations are run on the election data replicated 10 times (with
+the electorates renamed) and timed. tests/test_greens_flips.py checks the
+results against a recount of each seat at each slider position.
+
+    python -m benchmarks.greens_prepare_data
+"""
+
+import argparse
+import timeit
+
+import pandas as pd
+
+from data_store import get_store
+from election_index import ElectionIndex
+from greens_flips import GreensFlips
+
+
+class LoopGreensFlips(GreensFlips):
+    """The flips worked out as prepare_data did before being vectorised."""
+
+    @staticmethod
+    def greens_decider(df):
+        x, y = df["toRunningTotal"] - df["preferences"]
+        return df["votesDistributed"].iloc[0] >= abs(x - y)
+
+    def __init__(self, index, party_tally):
+        self.party_tally = party_tally
+        self.data = index.distribution
+        max_exclusion = self.data.groupby("electorate")["exclusion"].max("exclusion")
+
+        self.greens_third = []
+        for electorate, exclusion in max_exclusion.items():
+            df = self.data.loc[electorate]
+            df = df[df["exclusion"] == exclusion]
+            if (
+                (df["fromParty"].unique()[0] == "The Greens")
+                and ("ALP" in self.data["toParty"].unique())
+                and self.greens_decider(df)
+            ):
+                self.greens_third.append((electorate, exclusion))
+
+        all_data = []
+        for electorate, exclusion in self.greens_third:
+            df = self.data.loc[electorate]
+            df = df[df["exclusion"] == exclusion].copy(deep=True)
+            all_data.append(df)
+        self.data = pd.concat(all_data)
+
+        labor = self.data["toParty"] == "ALP"
+        total_transferred = self.data[labor]["votesDistributed"].sum()
+        total_labor = self.data[labor]["preferences"].sum()
+
+        self.data = self.data.reset_index().set_index(["electorate", "exclusion"])
+        self.data = self.data.loc[self.greens_third][
+            [
+                "toParty",
+                "toCandidate",
+                "preferences",
+                "toRunningTotal",
+                "votesDistributed",
+            ]
+        ].droplevel(level="exclusion")
+        self.data["origTotal"] = self.data["toRunningTotal"] - self.data["preferences"]
+
+        idx = self.data.reset_index().groupby("electorate")["toRunningTotal"].idxmax()
+        self.old_tally = self.data.reset_index().loc[idx].value_counts("toParty")
+
+        self.data = self.data.astype(
+            {"preferences": "int32", "toRunningTotal": "int32", "origTotal": "int32"}
+        )
+        self.find_breakpoints()
+
+        self.actual_pref = int((total_labor / total_transferred) * 100)
+
+
+def replicate(index, times):
+    """Copies of the data with renamed electorates."""
+    frames = {"distribution": [], "first_pref": []}
+    for i in range(times):
+        for table, frame in frames.items():
+            frame.append(getattr(index, table).rename(index=lambda e, i=i: f"{e}-{i}"))
+    return ElectionIndex(*(pd.concat(f) for f in frames.values()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--times", type=int, default=10, help="data replication")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    store = get_store()
+    index = replicate(store.index, args.times)
+
+    tally = store.actual_party_tally
+    implementations = {
+        "loop": lambda index: LoopGreensFlips(index, tally),
+        "vectorised": lambda index: GreensFlips(index.final_rows(), tally),
+    }
+
+    print(f"Greens flips of {len(index.electorates)} electorates")
+    results = {}
+    for name, flips in implementations.items():
+        times = timeit.repeat(
+            lambda flips=flips: flips(index), number=1, repeat=args.repeat
+        )
+        results[name] = min(times)
+        print(f"  {name:<10} {results[name] * 1000:8.1f} ms")
+    print(f"  speed-up   {results['loop'] / results['vectorised']:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
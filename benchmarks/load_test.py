@@ -0,0 +1,306 @@
+"""Load test the app with concurrent sessions from a headless Bokeh client.
+
+The app is started with panel serve (or an already running server is given
+with --url, as its root or the app's URL), and for each number of sessions
+that many simulated users connect at once, each over a websocket of its own,
+in a thread of its own.
+Each user opens the Electorate Explorer and steps through the electorates,
+then opens the Greens explorer and sweeps its slider. A step's round trip is
+the time from the change being sent until the server's last update in
+reply, once nothing more has arrived for --settle seconds. The server's
+resident memory is read from its /metrics route, served by metrics.py.
+
+    python -m benchmarks.load_test --sessions 1 5 10 25
+"""
+
+import argparse
+import asyncio
+import json
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+import numpy as np
+import panel.models  # noqa: F401 (registers Panel's models with the client)
+from bokeh.client import pull_session
+from bokeh.document.events import MessageSentEvent
+from bokeh.events import DocumentReady
+from bokeh.models import Select, Slider, Tabs
+from tornado.websocket import WebSocketClosedError
+
+from data_store import DATA_DIR, ELECTION
+
+APP = Path(__file__).parent.parent / "app.py"
+# the panel script, as the app is served in production; python -m panel would
+# put the working directory on sys.path, hiding imports that only work there
+PANEL = shutil.which("panel", path=str(Path(sys.executable).parent)) or "panel"
+# tabs of the app, by position
+ELECTORATE_TAB, GREENS_TAB = 1, 2
+ELECTORATE_SELECT = "Select Electorate"
+GREENS_SLIDER = "Greens to ALP pref. %"
+
+
+class User:
+    """One simulated user, with a session of their own."""
+
+    def __init__(self, url, settle, timeout):
+        self.settle, self.timeout = settle, timeout
+        self.round_trips = {"tab": [], "electorate": [], "green_pref": []}
+        self.timeouts = 0
+        self.last_update = self.reading = None
+
+        start = time.perf_counter()
+        self.session = pull_session(url=url)
+        doc = self.session.document
+        # changes applied from the server's messages have the session as setter
+        doc.on_change(self.changed)
+        # the browser reports the page ready, and the app then loads its views
+        ready = MessageSentEvent(doc, "bokeh_event", DocumentReady())
+        self.wait(lambda: doc.callbacks.trigger_on_change(ready))
+        self.connect = time.perf_counter() - start
+
+    def changed(self, event):
+        if event.setter is self.session:
+            self.last_update = time.perf_counter()
+
+    def model(self, type, title):
+        for model in self.session.document.select({"type": type}):
+            if model.title == title:
+                return model
+        return None
+
+    async def receive(self, start, until):
+        """Apply the server's messages until they settle, or time runs out."""
+        # ClientSession only offers to wait for a reply, which drops any
+        # updates that arrive before it, so its connection is read directly.
+        # A read is never cancelled, as that could lose part of a message
+        connection = self.session._connection
+        while True:
+            now = time.perf_counter()
+            settled = self.last_update and now - self.last_update >= self.settle
+            if settled and (until is None or until()):
+                return True
+            if now - start >= self.timeout:
+                return False
+            if self.reading is None:
+                self.reading = asyncio.ensure_future(connection._pop_message())
+            wait = 0.05
+            if self.last_update and not settled:
+                wait = self.settle - (now - self.last_update)
+            done, _ = await asyncio.wait([self.reading], timeout=wait)
+            if not done:
+                continue
+            message, self.reading = self.reading.result(), None
+            if message is None:
+                raise ConnectionError("The server closed the session")
+            if message.msgtype == "PATCH-DOC":
+                self.session._handle_patch(message)
+
+    def wait(self, change, until=None):
+        """Make a change, as the browser would, and wait for the server's
+        reply; returns the seconds until its last update, or None."""
+        self.last_update = None
+        start = time.perf_counter()
+        change()
+        io_loop = self.session._connection.io_loop
+        if io_loop.run_sync(lambda: self.receive(start, until)):
+            return self.last_update - start
+        return None
+
+    def step(self, kind, change, until=None):
+        seconds = self.wait(change, until)
+        if seconds is None:
+            self.timeouts += 1
+        else:
+            self.round_trips[kind].append(seconds)
+
+    def run(self, electorates, pct_step):
+        """Open the explorers and step through them; a step to where a widget
+        already is changes nothing, so is skipped."""
+        tabs = self.session.document.select_one({"type": Tabs})
+        self.step(
+            "tab",
+            lambda: setattr(tabs, "active", ELECTORATE_TAB),
+            # the tab's view is built after it is shown
+            lambda: self.model(Select, ELECTORATE_SELECT) is not None,
+        )
+        select = self.model(Select, ELECTORATE_SELECT)
+        options = [o[0] if isinstance(o, (list, tuple)) else o for o in select.options]
+        for option in options[:electorates]:
+            if option != select.value:
+                self.step(
+                    "electorate", lambda option=option: setattr(select, "value", option)
+                )
+
+        self.step(
+            "tab",
+            lambda: setattr(tabs, "active", GREENS_TAB),
+            lambda: self.model(Slider, GREENS_SLIDER) is not None,
+        )
+        slider = self.model(Slider, GREENS_SLIDER)
+        for pct in range(0, 101, pct_step):
+            if pct != slider.value:
+                self.step("green_pref", lambda pct=pct: self.release(slider, pct))
+
+    @staticmethod
+    def release(slider, value):
+        """Drag a slider to a value and let go, as the browser reports it."""
+        slider.value = value
+        # read-only in Python, as only the browser sets it; the app's sliders
+        # only call back once released
+        slider.set_from_json("value_throttled", value)
+
+    def close(self):
+        self.session.close()
+
+
+def server_rss(url):
+    """Resident memory of the server, from its /metrics route."""
+    try:
+        with urllib.request.urlopen(f"{url}/metrics?format=json", timeout=5) as r:
+            return json.load(r)["process_resident_memory_bytes"]
+    except OSError:
+        return None
+
+
+def serve(port, data_dir, election):
+    """Start the app, returning the process once it answers."""
+    server = subprocess.Popen(
+        [
+            PANEL,
+            "serve",
+            APP.name,
+            "--port",
+            str(port),
+            "--plugins",
+            "metrics",
+            # closed sessions are discarded within a second
+            "--check-unused-sessions",
+            "500",
+            "--unused-session-lifetime",
+            "500",
+            "--args",
+            "--data-dir",
+            str(Path(data_dir).resolve()),
+            "--election",
+            election,
+        ],
+        # where panel serve finds the metrics plugin
+        cwd=APP.parent,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    for _ in range(120):
+        if server_rss(f"http://localhost:{port}") is not None:
+            return server
+        time.sleep(0.5)
+    server.terminate()
+    sys.exit("The app didn't start")
+
+
+def load(url, sessions, args):
+    """Run `sessions` users at once; returns the users and the seconds taken."""
+    users, errors = [None] * sessions, []
+    ready = threading.Barrier(sessions)
+
+    def run(i):
+        try:
+            ready.wait()
+            users[i] = User(url, args.settle, args.timeout)
+            users[i].run(args.electorates, args.step)
+        # a refused, closed or timed out connection; anything else is a bug
+        # in the test, and is raised
+        except (OSError, WebSocketClosedError) as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    for user in users:
+        if user is not None:
+            user.close()
+    if errors:
+        print(f"  {len(errors)} sessions failed: {errors[0]!r}")
+    return [user for user in users if user is not None], seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 25])
+    parser.add_argument(
+        "--url",
+        help="of a running server, instead of starting one: its root, e.g. "
+        "http://localhost:5006, or the app's URL",
+    )
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--electorates", type=int, help="to step through; default all")
+    parser.add_argument("--step", type=int, default=5, help="Greens slider step")
+    parser.add_argument("--settle", type=float, default=0.1, help="seconds")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds per step")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--election", default=ELECTION)
+    args = parser.parse_args()
+
+    server = None
+    if args.url is None:
+        server = serve(args.port, args.data_dir, args.election)
+        args.url = f"http://localhost:{args.port}"
+    # the metrics are served from the root, beside the app
+    args.url = args.url.rstrip("/").removesuffix("/app")
+    app = f"{args.url}/app"
+
+    try:
+        for sessions in args.sessions:
+            peak, done = [server_rss(args.url) or 0], threading.Event()
+
+            def sample(done=done, peak=peak):
+                while not done.wait(0.5):
+                    peak.append(server_rss(args.url) or 0)
+
+            sampler = threading.Thread(target=sample)
+            sampler.start()
+            users, seconds = load(app, sessions, args)
+            done.set()
+            sampler.join()
+
+            if not users:
+                print(f"{sessions} sessions: all failed", flush=True)
+                continue
+            connect = np.array([u.connect for u in users]) * 1000
+            steps = sum(len(t) for u in users for t in u.round_trips.values())
+            print(
+                f"{sessions} sessions: connect p50 {np.percentile(connect, 50):.0f} ms, "
+                f"p95 {np.percentile(connect, 95):.0f} ms; "
+                f"{steps / seconds:.1f} steps/s; "
+                f"{sum(u.timeouts for u in users)} timeouts; "
+                f"server RSS peak {max(peak) / 2**20:.0f} MiB"
+            )
+            print(
+                f"  {'round trip ms':<14} {'p50':>7} {'p90':>7} {'p99':>7} {'max':>7}"
+            )
+            for kind in ["tab", "electorate", "green_pref"]:
+                times = np.array([t for u in users for t in u.round_trips[kind]])
+                if times.size == 0:
+                    continue
+                p50, p90, p99 = np.percentile(times * 1000, [50, 90, 99])
+                print(
+                    f"  {kind:<14} {p50:7.0f} {p90:7.0f} {p99:7.0f} "
+                    f"{times.max() * 1000:7.0f}",
+                    flush=True,
+                )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
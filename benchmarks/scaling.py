@@ -0,0 +1,93 @@
+"""Time the explorers on synthetic elections of increasing size.
+
+An election is generated with synthetic.py for each number of seats, loaded
+into a DataStore, and the work that grows with the data is timed: the
+Greens explorer's prepare_data, the overall Sankey, the Greens bars (one
+chart per electorate) rendered to Bokeh models, and building every
+electorate's views in the electorate explorer.
+
+    python -m benchmarks.scaling --seats 93 151 500 1500 --candidates 7
+"""
+
+import argparse
+import tempfile
+import time
+
+import holoviews as hv
+
+from benchmarks.suite import render
+from cache import LRUCache
+from data_store import DataStore, share_frames
+from synthetic import generate, write, write_electorates
+
+
+def timed(function, repeat):
+    """Best time of `repeat` calls, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(store, repeat):
+    from electorate_pref_explorer import ElectoratePrefExplorer
+    from greens_pref_explorer import GreensPrefExplorer
+    from overall_pref_explorer import OverallPrefExplorer
+
+    greens = GreensPrefExplorer(
+        store.index, store.actual_party_tally, store.electorates
+    )
+    overall = OverallPrefExplorer(
+        data=store.distribution_party,
+        party_tally=store.actual_party_tally,
+        flows=store.party_flows,
+    )
+    electorates = {v: k for k, v in store.electorates.items()}
+
+    def build_views():
+        cache = LRUCache(3 * len(electorates))
+        ElectoratePrefExplorer(store.index, electorates, cache=cache).warm()
+
+    return {
+        "prepare_data": timed(lambda: greens.prepare_data(store.index), repeat),
+        "get_sankey": timed(lambda: render(overall.get_sankey()), repeat),
+        "greens bars": timed(lambda: render(greens.electorate_bars()), repeat),
+        "electorate views": timed(build_views, repeat),
+        "greens seats": len(greens.flips.greens_third),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seats", type=int, nargs="+", default=[93, 151, 500, 1500])
+    parser.add_argument("--candidates", type=int, default=7)
+    parser.add_argument("--parties", type=int, default=9)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    hv.extension("bokeh")
+    share_frames()
+    columns = ["prepare_data", "get_sankey", "greens bars", "electorate views"]
+    print(f"{args.candidates} candidates per seat, best of {args.repeat}, in ms")
+    print(
+        f"  {'seats':>6} {'rows':>8} {'greens':>7}"
+        + "".join(f"{c:>18}" for c in columns)
+    )
+    with tempfile.TemporaryDirectory() as data_dir:
+        for seats in args.seats:
+            tables = generate(seats, args.candidates, args.parties)
+            write(data_dir, "synthetic", tables)
+            write_electorates(data_dir, seats)
+            store = DataStore(data_dir, "synthetic", bundle=False)
+            result = measure(store, args.repeat)
+            print(
+                f"  {seats:>6} {len(store.distribution):>8,} {result['greens seats']:>7}"
+                + "".join(f"{result[c] * 1000:18.1f}" for c in columns),
+                flush=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
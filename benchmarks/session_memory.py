@@ -0,0 +1,76 @@
+"""Measure the memory each concurrent session of the app costs the server.
+
+Sessions are built in one process, as panel serve would build them: app.py
+is run for a new Bokeh document, and the given tabs are opened. A first
+session loads the data and imports the explorers; the resident memory after
+it is the baseline, and each further session's share of the growth over it
+is reported as more sessions are held open.
+
+    python -m benchmarks.session_memory --sessions 1 50 500
+"""
+
+import argparse
+import gc
+import logging
+import runpy
+import sys
+import time
+from pathlib import Path
+
+import panel as pn
+from bokeh.document import Document
+
+from data_store import DATA_DIR, ELECTION
+from perf import rss
+
+APP = Path(__file__).parent.parent / "app.py"
+
+
+def session(tabs):
+    """Run the app for a new document and open some tabs; returns its globals."""
+    pn.state.curdoc = Document()
+    app = runpy.run_path(str(APP))
+    for tab in tabs:
+        app["tabs"].active = tab
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument(
+        "--tabs", type=int, nargs="+", default=[0, 1, 2], help="to open, by position"
+    )
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--election", default=ELECTION)
+    args = parser.parse_args()
+
+    sys.argv = [str(APP), "--data-dir", args.data_dir, "--election", args.election]
+    logging.disable(logging.WARNING)
+    sessions = [session(args.tabs)]
+    gc.collect()
+    baseline = rss()
+    print(f"baseline {baseline / 2**20:.1f} MiB after the first session")
+    print(
+        f"  {'sessions':>8} {'RSS MiB':>10} {'MiB/session':>12} "
+        f"{'estimate KiB':>13} {'s/session':>10}"
+    )
+    for count in sorted(args.sessions):
+        start, built = time.perf_counter(), 0
+        while len(sessions) < count + 1:
+            sessions.append(session(args.tabs))
+            built += 1
+        gc.collect()
+        grown = rss() - baseline
+        # what the /metrics route reports for the newest session
+        estimate = sessions[-1]["session_memory"]()
+        print(
+            f"  {count:>8} {rss() / 2**20:10.1f} {grown / count / 2**20:12.2f} "
+            f"{estimate / 2**10:13.1f} "
+            f"{(time.perf_counter() - start) / max(built, 1):10.2f}",
+            flush=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Compare loading the data store from the Arrow bundle and from the sources.
+
+Each load runs in a fresh process, which reports the time taken to import
+the store and to load the data, and its resident memory before and after.
+
+    python bundle.py
+    python -m benchmarks.startup
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from bundle import bundle_path
+from data_store import DATA_DIR, ELECTION
+
+CHILD = """
+import json, sys, time
+
+def rss():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+
+start, before = time.perf_counter(), rss()
+from data_store import DataStore
+imported = time.perf_counter()
+store = DataStore(sys.argv[1], sys.argv[2], bundle=sys.argv[3] == "bundle")
+loaded = time.perf_counter()
+json.dump(
+    {
+        "import": imported - start,
+        "load": loaded - imported,
+        "rss": rss(),
+        "rss_load": rss() - before,
+        "source": str(store.bundle or store.data_dir),
+    },
+    sys.stdout,
+)
+"""
+
+
+def run(data_dir, election, mode):
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, data_dir, election, mode],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--election", default=ELECTION)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if not bundle_path(args.data_dir, args.election).exists():
+        sys.exit("No bundle; build it first with `python bundle.py`")
+
+    print(f"median of {args.repeat} fresh processes")
+    print(
+        f"  {'':<8} {'import ms':>10} {'load ms':>10} {'RSS MiB':>10} {'+RSS MiB':>10}"
+    )
+    for mode in ["sources", "bundle"]:
+        runs = [run(args.data_dir, args.election, mode) for _ in range(args.repeat)]
+        median = {
+            key: statistics.median(r[key] for r in runs)
+            for key in ["import", "load", "rss", "rss_load"]
+        }
+        print(
+            f"  {mode:<8} {median['import'] * 1000:10.1f} {median['load'] * 1000:10.1f}"
+            f" {median['rss'] / 2**20:10.1f} {median['rss_load'] / 2**20:10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
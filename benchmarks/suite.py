@@ -0,0 +1,257 @@
+"""Time the explorers' construction and callbacks, without a browser.
+
+Each case is a list of calls, each timed on its own: for example one call
+per electorate, or one per slider position. Views are rendered to Bokeh
+models, as the server would do before sending them to a browser. The first
+few calls of every case are then run again under tracemalloc, which is much
+slower, for the peak memory of a call.
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --compare results.json
+
+Cases whose name ends in "cold" start from an empty cache; "warm" cases are
+run with everything they use already cached.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import holoviews as hv
+import numpy as np
+import panel as pn
+from bokeh.document import Document
+
+from cache import LRUCache
+from data_store import DATA_DIR, ELECTION, get_store, share_frames
+
+PERCENTILES = [50, 90, 99]
+# calls of each case run again for their peak memory
+MEMORY_CALLS = 10
+# times each call of a case that makes only one call is repeated
+SINGLE_CALLS = 10
+
+
+def setup(function):
+    """Mark a call as setting up a case, so it isn't timed."""
+
+    def call():
+        function()
+
+    call.setup = True
+    return call
+
+
+def render(view):
+    """Render a view to Bokeh models, as a server session would."""
+    return pn.panel(view).get_root(Document())
+
+
+def overall_cases(store):
+    from overall_pref_explorer import OverallPrefExplorer
+
+    def build():
+        OverallPrefExplorer(
+            data=store.distribution_party,
+            party_tally=store.actual_party_tally,
+            flows=store.party_flows,
+            winners=store.winners,
+            names=store.electorates,
+        )
+
+    yield "OverallPrefExplorer.__init__", [build] * SINGLE_CALLS
+
+
+def electorate_cases(store):
+    from electorate_pref_explorer import CACHE_SIZE, ElectoratePrefExplorer
+
+    cache = LRUCache(CACHE_SIZE)
+    explorer = ElectoratePrefExplorer(
+        store.index, {v: k for k, v in store.electorates.items()}, cache=cache
+    )
+    electorates = list(store.electorates)
+
+    def select(electorate, view):
+        def call():
+            explorer.electorate = electorate
+            render(view())
+
+        return call
+
+    for name, view in [
+        ("first_pref_bars", explorer.first_pref_bars),
+        ("sankey_and_running_totals", explorer.sankey_and_running_totals),
+    ]:
+        calls = [select(e, view) for e in electorates]
+        yield f"ElectoratePrefExplorer.{name} cold", [setup(cache.clear)] + calls
+        yield f"ElectoratePrefExplorer.{name} warm", [setup(explorer.warm)] + calls
+
+
+def greens_cases(store):
+    from greens_pref_explorer import WAFFLE_CACHE_SIZE, GreensPrefExplorer
+
+    cache = LRUCache(WAFFLE_CACHE_SIZE)
+    explorer = GreensPrefExplorer(
+        store.index, store.actual_party_tally, store.electorates, cache=cache
+    )
+    render(explorer.electorate_bars())
+    sweep = list(range(101))
+
+    def move(pct):
+        def call():
+            explorer.green_pref = pct
+
+        return call
+
+    def waffle(pct):
+        def call():
+            explorer.green_pref = pct
+            render(asyncio.run(explorer.new_waffle()))
+
+        return call
+
+    yield (
+        "GreensPrefExplorer.prepare_data",
+        [lambda: explorer.prepare_data(store.index)] * SINGLE_CALLS,
+    )
+    yield "GreensPrefExplorer.pref_changed sweep", [move(p) for p in sweep]
+    yield (
+        "GreensPrefExplorer.electorate_bars",
+        [lambda: render(explorer.electorate_bars())] * SINGLE_CALLS,
+    )
+    # the waffle is only redrawn for the few distinct tallies
+    yield (
+        "GreensPrefExplorer.new_waffle cold",
+        [setup(cache.clear)] + [waffle(p) for p in sweep],
+    )
+    yield (
+        "GreensPrefExplorer.new_waffle warm",
+        [setup(lambda: [waffle(p)() for p in sweep])] + [waffle(p) for p in sweep],
+    )
+
+
+def run_case(calls, repeat):
+    """Seconds taken by each call of a case, over `repeat` runs."""
+    times = []
+    for _ in range(repeat):
+        for call in calls:
+            start = time.perf_counter()
+            call()
+            if not getattr(call, "setup", False):
+                times.append(time.perf_counter() - start)
+    return times
+
+
+def peak_memory(calls):
+    """Largest peak of memory allocated by Python during one of the calls."""
+    peak = 0
+    tracemalloc.start()
+    try:
+        timed = 0
+        for call in calls:
+            if timed == MEMORY_CALLS:
+                break
+            if getattr(call, "setup", False):
+                call()
+                continue
+            tracemalloc.reset_peak()
+            call()
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            timed += 1
+        return peak
+    finally:
+        tracemalloc.stop()
+
+
+def summarise(times, peak):
+    times = np.array(times) * 1000
+    result = {"mean_ms": times.mean()}
+    result.update(
+        {f"p{p}_ms": v for p, v in zip(PERCENTILES, np.percentile(times, PERCENTILES))}
+    )
+    result.update({"max_ms": times.max(), "peak_kib": peak / 1024})
+    return {"calls": len(times)} | {k: round(float(v), 3) for k, v in result.items()}
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    width = max(len(name) for name in results)
+    header = f"  {'':<{width}} {'calls':>6} {'p50 ms':>9} {'p90 ms':>9} "
+    header += f"{'p99 ms':>9} {'peak KiB':>9}"
+    if baseline:
+        header += f" {'p50 vs base':>12}"
+    print(header)
+    for name, r in results.items():
+        line = (
+            f"  {name:<{width}} {r['calls']:>6} {r['p50_ms']:9.2f} {r['p90_ms']:9.2f}"
+            f" {r['p99_ms']:9.2f} {r['peak_kib']:9.0f}"
+        )
+        if baseline and name in baseline:
+            line += f" {r['p50_ms'] / max(baseline[name]['p50_ms'], 1e-9):11.2f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=1, help="runs of each case")
+    parser.add_argument("--filter", default="", help="only cases containing this")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results to compare against")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--election", default=ELECTION)
+    args = parser.parse_args()
+
+    hv.extension("bokeh")
+    share_frames()
+    store = get_store(args.data_dir, args.election)
+
+    results = {}
+    for cases in [overall_cases, electorate_cases, greens_cases]:
+        for name, calls in cases(store):
+            if args.filter not in name:
+                continue
+            times = run_case(calls, args.repeat)
+            results[name] = summarise(times, peak_memory(calls))
+            print(f"{name}: {results[name]['p50_ms']:.2f} ms", flush=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            compared = json.load(f)
+        baseline = compared["results"]
+        print(f"\ncompared with {compared.get('commit') or args.compare}")
+    print()
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "commit": commit(),
+                    "python": platform.python_version(),
+                    "election": args.election,
+                    "repeat": args.repeat,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
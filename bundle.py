@@ -0,0 +1,121 @@
+"""Build the single-file Arrow bundle of an election's data.
+
+The bundle holds the election tables, the electorate names and the tables
+the store derives from them, so a server can start without reading the
+parquet files and electorates.json or deriving anything. It is an Arrow IPC
+(Feather v2) file with one row and a column per table, each cell holding
+that table as a list of structs. Categorical columns are stored dictionary
+encoded, and the distribution and first preferences in the store's index
+order. The file is memory-mapped when loaded, and the store indexes those
+tables as they are, so numeric columns are not copied into memory until
+they are used.
+
+    python bundle.py --data-dir data --election qld_2024
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import pandas as pd
+
+# tables written to the bundle, as read back by DataStore
+TABLES = [
+    "electorates",
+    "distribution",
+    "first_pref",
+    "final_tally",
+    "actual_party_tally",
+    "winners",
+    "distribution_party",
+]
+
+
+def bundle_path(data_dir, election):
+    return Path(data_dir) / f"{election}.arrow"
+
+
+def _table_column(frame):
+    """A frame as a one-row list<struct> column, and how to rebuild it."""
+    import pyarrow as pa
+
+    meta = {"series": None, "index": [n for n in frame.index.names if n]}
+    if isinstance(frame, pd.Series):
+        meta["series"] = frame.name
+        frame = frame.to_frame()
+    table = pa.Table.from_pandas(
+        frame.reset_index(meta["index"]) if meta["index"] else frame,
+        preserve_index=False,
+    )
+    rows = pa.StructArray.from_arrays(
+        [column.combine_chunks() for column in table.columns],
+        fields=list(table.schema),
+    )
+    return pa.ListArray.from_arrays(pa.array([0, len(rows)], pa.int32()), rows), meta
+
+
+def write_bundle(store, path):
+    import pyarrow as pa
+
+    frames = {
+        "electorates": pd.DataFrame(
+            {
+                "stub": list(store.electorates),
+                "electorateName": list(store.electorates.values()),
+            }
+        ),
+        **{name: getattr(store, name) for name in TABLES[1:]},
+        # in the index's order, for the store to use without sorting them
+        "distribution": store.index.distribution,
+        "first_pref": store.index.first_pref,
+    }
+    columns, meta = {}, {}
+    for name, frame in frames.items():
+        columns[name], meta[name] = _table_column(frame)
+    table = pa.table(columns).replace_schema_metadata(
+        {"bundle": json.dumps(meta), "election": store.election}
+    )
+    with pa.ipc.new_file(path, table.schema) as writer:
+        writer.write_table(table)
+
+
+def read_bundle(path):
+    """The tables of a bundle, memory-mapped from the file."""
+    # pyarrow is only imported once it's needed, as pandas does for parquet
+    import pyarrow as pa
+
+    # the memory map stays open for as long as any of the arrays use it
+    bundle = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+    meta = json.loads(bundle.schema.metadata[b"bundle"])
+    frames = {}
+    for name in bundle.column_names:
+        rows = bundle.column(name).chunk(0).values
+        table = pa.Table.from_arrays(
+            rows.flatten(), names=[field.name for field in rows.type]
+        )
+        frame = table.to_pandas(split_blocks=True)
+        if meta[name]["index"]:
+            frame = frame.set_index(meta[name]["index"])
+        if meta[name]["series"] is not None:
+            frame = frame[meta[name]["series"]]
+        frames[name] = frame
+    return frames
+
+
+def main():
+    from data_store import DATA_DIR, ELECTION, DataStore
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--election", default=ELECTION)
+    parser.add_argument("--output", help="default: <data-dir>/<election>.arrow")
+    args = parser.parse_args()
+
+    store = DataStore(args.data_dir, args.election, bundle=False)
+    path = args.output or bundle_path(args.data_dir, args.election)
+    write_bundle(store, path)
+    print(f"Wrote {path} ({Path(path).stat().st_size / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
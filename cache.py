@@ -0,0 +1,71 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """A bounded, thread-safe least-recently-used cache with hit/miss counters.
+
+    Values are built by the caller on a miss. Instances are meant to be shared
+    by every session in the server process, so cached values must not be
+    modified after they are built. A value whose build overlapped a discard
+    may be of the data the discard was for, so it is returned but not kept.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        # bumped by every discard
+        self.generation = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, build):
+        """The value for `key`, calling `build()` to create it on a miss."""
+        with self._lock:
+            if key in self._data:
+                self.hits += 1
+                self._data.move_to_end(key)
+                return self._data[key]
+            self.misses += 1
+            generation = self.generation
+
+        # built outside the lock, so one slow build doesn't block other keys
+        value = build()
+        with self._lock:
+            if generation != self.generation:
+                return value
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def discard(self, match):
+        """Drop the entries whose keys `match(key)` is true for."""
+        with self._lock:
+            self.generation += 1
+            for key in [k for k in self._data if match(k)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
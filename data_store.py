@@ -0,0 +1,432 @@
+import argparse
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import cached_property
+from pathlib import Path
+
+import pandas as pd
+
+from bundle import TABLES, bundle_path, read_bundle
+from cache import LRUCache
+from consts import IND
+from dataset import dataset_path, read_table, split_election
+from dataset import elections as dataset_elections
+from election_index import ElectionIndex
+from greens_flips import GreensFlips
+from party_flows import PartyFlows
+from pendulum import Pendulum
+from perf import metrics
+from recount import RecountEngine
+
+DATA_DIR = "data"
+ELECTION = "qld_2024"
+# loaded elections are evicted, least recently used first, to keep their
+# frames within this many bytes
+MEMORY_BUDGET = 512 * 2**20
+# columns of each table the store uses, or None for all of them
+COLUMNS = {
+    "distributions": None,
+    "first_prefs": None,
+    "final_tally": ["electorate", "candidate", "party", "count"],
+}
+
+logger = logging.getLogger(__name__)
+
+
+class DataStore:
+    """Loads the election data and the tables derived from it.
+
+    A store should be obtained through `get_store`, which loads the data once
+    per server process. Every session then shares the same frames, so they
+    must be treated as read-only.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, election=ELECTION, bundle=True):
+        self.data_dir = Path(data_dir)
+        self.election = election
+        self.timings = {}
+        self._caches = {}
+        # bumped whenever the data changes, e.g. during a live count
+        self.version = 0
+        self._listeners = []
+
+        # the election is read from the dataset built by dataset.py if it
+        # holds it, or else from the flat files
+        name, year = split_election(election)
+        self.dataset = dataset_path(self.data_dir)
+        partition = self.dataset / "final_tally" / f"election={name}" / f"year={year}"
+        if not partition.exists():
+            self.dataset = None
+
+        # a bundle built by bundle.py is used unless the sources are newer
+        self.mtime = self._mtime()
+        self.bundle = bundle_path(self.data_dir, election)
+        if bundle and self.bundle.exists() and not self._stale():
+            self._load_bundle()
+        else:
+            self.bundle = None
+            self._load_sources()
+
+    def _stale(self):
+        if self.dataset:
+            sources = list(self.dataset.glob("*/election=*/year=*/*.parquet"))
+        else:
+            sources = [self.data_dir / "electorates.json", *self._sources().values()]
+        built = self.bundle.stat().st_mtime
+        return any(p.exists() and p.stat().st_mtime > built for p in sources)
+
+    def _mtime(self):
+        """Time the election's tables were last modified."""
+        if self.dataset:
+            name, year = split_election(self.election)
+            sources = self.dataset.glob(f"*/election={name}/year={year}/*.parquet")
+        else:
+            sources = self._sources().values()
+        return max((p.stat().st_mtime for p in sources if p.exists()), default=0)
+
+    def _sources(self):
+        return {
+            table: self.data_dir / f"{self.election}_{table}.parq"
+            for table in ["distributions", "first_prefs", "final_tally"]
+        }
+
+    def _load_bundle(self):
+        with self._timed("bundle"):
+            frames = read_bundle(self.bundle)
+            electorates = frames.pop("electorates")
+            self.electorates = dict(
+                zip(electorates["stub"], electorates["electorateName"])
+            )
+            for name in TABLES[1:]:
+                setattr(self, name, frames[name])
+
+        with self._timed("derived"):
+            # the bundle is written in the index's order, so the mapped
+            # frames are used as they are
+            self.index = ElectionIndex(
+                self.distribution, self.first_pref, presorted=True
+            )
+
+    def _load_sources(self):
+        with self._timed("electorates"):
+            if self.dataset:
+                electorates = read_table(self.data_dir, self.election, "electorates")
+                electorates = electorates.to_dict("records")
+            else:
+                with open(self.data_dir / "electorates.json", "r") as f:
+                    electorates = json.load(f)
+            self.electorates = {x["stub"]: x["electorateName"] for x in electorates}
+
+        with self._timed("parquet"):
+            distribution, first_pref, final_tally = self._read_tables()
+
+        with self._timed("derived"):
+            self.final_tally = final_tally
+            self.winners = self._winners(final_tally)
+            self.actual_party_tally = self._tally(self.winners)
+            self._index(distribution, first_pref)
+
+    def _read_tables(self):
+        return [self._read(t) for t in ["distributions", "first_prefs", "final_tally"]]
+
+    def _index(self, distribution, first_pref):
+        # the tables are kept in the index's electorate order
+        self.index = ElectionIndex(distribution, first_pref)
+        self.distribution = self.index.distribution
+        self.first_pref = self.index.first_pref
+        self.distribution_party = self.index.without_party(IND)
+
+    @staticmethod
+    def _winners(final_tally):
+        """Party of the candidate with the most votes in each electorate."""
+        idx = final_tally.groupby("electorate", observed=True)["count"].idxmax()
+        return final_tally.loc[idx].set_index("electorate")["party"]
+
+    @staticmethod
+    def _tally(winners):
+        """Seats won by each party."""
+        tally = winners.value_counts()
+        tally = tally[tally > 0]
+        tally.name = "Actual"
+        return tally
+
+    def refresh(self):
+        """Reload the election if its tables have changed since they were read.
+
+        The tables are compared electorate by electorate, and only what is
+        derived from each electorate (its winner, whether the Greens'
+        preferences decided it, and its entries in the store's caches) is worked
+        out again for the electorates that changed.
+        Whole-election tables, such as the flows between parties, are rebuilt
+        on their next use. Listeners are then called with the changed
+        electorates, which are also returned.
+        """
+        mtime = self._mtime()
+        if mtime <= self.mtime:
+            return set()
+
+        # the new mtime is only kept once the tables are read, so a table
+        # caught half-written is read again on the next refresh
+        start = time.perf_counter()
+        tables = self._read_tables()
+        old = [self.distribution, self.first_pref, self.final_tally]
+        changed = set().union(*(changed_electorates(a, b) for a, b in zip(old, tables)))
+        if not changed:
+            self.mtime = mtime
+            return changed
+
+        distribution, first_pref, final_tally = tables
+        self.final_tally = final_tally
+        declared = final_tally["electorate"].isin(changed)
+        self.winners = pd.concat(
+            [
+                self.winners[~self.winners.index.isin(changed)],
+                self._winners(final_tally[declared]),
+            ]
+        ).sort_index()
+        self.actual_party_tally = self._tally(self.winners)
+        self._index(distribution, first_pref)
+        self.mtime = mtime
+        self.__dict__.pop("recount", None)
+        self.__dict__.pop("party_flows", None)
+        self.__dict__.pop("pendulum", None)
+        if "greens_flips" in self.__dict__:
+            self.greens_flips = self.greens_flips.updated(
+                self.index.final_rows(), self.actual_party_tally, changed
+            )
+        for cache in self._caches.values():
+            cache.discard(lambda key: isinstance(key, tuple) and key[-1] in changed)
+        self.bundle = None
+        self.version += 1
+
+        seconds = time.perf_counter() - start
+        metrics.observe("data_refresh_seconds", self.election, seconds)
+        logger.info(
+            f"Refreshed {len(changed)} electorates of {self.election} in "
+            f"{seconds * 1000:.1f} ms"
+        )
+        for listener in list(self._listeners):
+            listener(changed)
+        return changed
+
+    def subscribe(self, listener):
+        """Call `listener(electorates)` with the electorates that change.
+
+        Listeners are called from the thread that refreshes the store.
+        """
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    @cached_property
+    def recount(self):
+        """Engine for recounting every electorate's final count."""
+        return RecountEngine(self.index.final_rows())
+
+    @cached_property
+    def party_flows(self):
+        """Preferences between parties (other than independents), by electorate."""
+        return PartyFlows(self.distribution_party)
+
+    @cached_property
+    def pendulum(self):
+        """Every electorate's final two-candidate margin, sorted for swings."""
+        return Pendulum(self.index.final_rows())
+
+    @cached_property
+    def greens_flips(self):
+        """Seats decided by the Greens' preferences, shared by every session."""
+        return GreensFlips(self.index.final_rows(), self.actual_party_tally)
+
+    def cache(self, name, maxsize=128):
+        """A named cache of values derived from this store's data.
+
+        Entries whose keys are tuples ending in an electorate are dropped when
+        that electorate's data changes.
+        """
+        with _lock:
+            if name not in self._caches:
+                self._caches[name] = LRUCache(maxsize)
+            return self._caches[name]
+
+    def _read(self, table):
+        if self.dataset:
+            return read_table(self.data_dir, self.election, table, COLUMNS[table])
+        return pd.read_parquet(self._sources()[table], columns=COLUMNS[table])
+
+    @contextmanager
+    def _timed(self, step):
+        start = time.perf_counter()
+        yield
+        self.timings[step] = time.perf_counter() - start
+
+    @property
+    def load_seconds(self):
+        return sum(self.timings.values())
+
+    @property
+    def frames(self):
+        return {
+            "distribution": self.distribution,
+            "first_pref": self.first_pref,
+            "final_tally": self.final_tally,
+            "actual_party_tally": self.actual_party_tally,
+            "distribution_party": self.distribution_party,
+        }
+
+    def memory_usage(self):
+        """Memory used by each of the shared frames, in bytes."""
+        return {
+            name: int(frame.memory_usage(deep=True).sum())
+            if isinstance(frame, pd.DataFrame)
+            else int(frame.memory_usage(deep=True))
+            for name, frame in self.frames.items()
+        }
+
+    def summary(self):
+        source = self.bundle or self.dataset or self.data_dir
+        steps = ", ".join(f"{k} {v * 1000:.1f} ms" for k, v in self.timings.items())
+        memory = sum(self.memory_usage().values()) / 1024
+        return (
+            f"Loaded {self.election} from {source} in "
+            f"{self.load_seconds * 1000:.1f} ms ({steps}); {memory:.0f} KiB in memory"
+        )
+
+
+# loaded stores, least recently used first
+_stores = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_store(data_dir=DATA_DIR, election=ELECTION):
+    """Return the process-wide store for an election, loading it on first use.
+
+    Stores are kept until their frames take more than MEMORY_BUDGET, when the
+    least recently used are dropped. Sessions still using a dropped store keep
+    it alive; the next session to ask for it loads it again.
+    """
+    key = (str(Path(data_dir).resolve()), election)
+    with _lock:
+        if key in _stores:
+            _stores.move_to_end(key)
+        else:
+            _stores[key] = DataStore(data_dir, election)
+            logger.info(_stores[key].summary())
+            metrics.observe("data_load_seconds", election, _stores[key].load_seconds)
+            _evict()
+        return _stores[key]
+
+
+def _evict():
+    """Drop the least recently used stores, but never the newest, until the
+    stores fit in the memory budget."""
+    used = {key: sum(store.memory_usage().values()) for key, store in _stores.items()}
+    while len(_stores) > 1 and sum(used.values()) > MEMORY_BUDGET:
+        key, store = _stores.popitem(last=False)
+        del used[key]
+        logger.info(f"Dropped {store.election} to stay within the memory budget")
+
+
+def unsubscribe_all(listener):
+    """Stop calling `listener` from every loaded store."""
+    with _lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.unsubscribe(listener)
+
+
+def refresh_stores():
+    """Refresh every loaded store whose tables have changed."""
+    with _lock:
+        stores = list(_stores.values())
+    for store in stores:
+        try:
+            store.refresh()
+        except Exception:
+            # a table caught half-written is read again on the next refresh
+            logger.exception(f"Could not refresh {store.election}")
+
+
+_watcher = None
+
+
+def watch(interval=5.0):
+    """Refresh the loaded stores every `interval` seconds, in a thread.
+
+    There is one watcher per process, however many times this is called.
+    """
+    global _watcher
+    with _lock:
+        if _watcher is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                refresh_stores()
+
+        _watcher = threading.Thread(target=run, name="data-watcher", daemon=True)
+        _watcher.start()
+
+
+def changed_electorates(old, new):
+    """Electorates whose rows differ between two versions of a table.
+
+    Rows are compared by hash, in any order within an electorate.
+    """
+
+    def hashes(frame):
+        electorate = frame.index if frame.index.name == "electorate" else None
+        if electorate is None:
+            electorate = frame["electorate"]
+        rows = pd.util.hash_pandas_object(frame, index=False)
+        return rows.groupby(pd.Index(electorate).astype(str).to_numpy()).sum()
+
+    old, new = hashes(old), hashes(new)
+    old, new = old.align(new)
+    return set(old.index[old.ne(new)])
+
+
+def elections(data_dir=DATA_DIR, election=ELECTION):
+    """The elections that can be loaded from a data directory's dataset, or
+    just the given election if there is no dataset."""
+    return dataset_elections(data_dir) or [election]
+
+
+def share_frames():
+    """Turn on pandas' copy-on-write, in a process whose sessions share the
+    store's frames.
+
+    A session deriving (and modifying) a frame from them can then never
+    write through to the shared data. It is a process-wide option, so it is
+    set by the app and the scripts that build explorers, not on import.
+    """
+    pd.set_option("mode.copy_on_write", True)
+
+
+def data_args(argv=None):
+    """The --data-dir and --election options of a command line, if given.
+
+    Other arguments are ignored, so this can read the options passed to
+    `panel serve app.py --args ...`.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--election", default=ELECTION)
+    args, _ = parser.parse_known_args(argv)
+    return args.data_dir, args.election
+
+
+def watch_args(argv=None):
+    """Seconds between refreshes given by a command line's --watch option, or
+    None if the data isn't to be watched."""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--watch", type=float, nargs="?", const=5.0)
+    args, _ = parser.parse_known_args(argv)
+    return args.watch
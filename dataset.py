@@ -0,0 +1,108 @@
+"""Build and read the partitioned parquet dataset of every election.
+
+Each table is a hive-partitioned parquet dataset under
+<data-dir>/elections/<table>/election=<name>/year=<year>/, so one election
+can be read without touching the others' files. Elections are named
+<name>_<year>, e.g. qld_2024.
+
+    python dataset.py qld_2024
+    python dataset.py synthetic_1 synthetic_2 --source-dir synthetic
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import pandas as pd
+
+DATASET = "elections"
+# tables of the dataset, and the index of each as a data frame
+TABLES = {
+    "electorates": None,
+    "distributions": "electorate",
+    "first_prefs": "electorate",
+    "final_tally": None,
+}
+PARTITIONS = ["election", "year"]
+
+
+def dataset_path(data_dir):
+    return Path(data_dir) / DATASET
+
+
+def split_election(election):
+    """The name and year of an election, e.g. ("qld", 2024) for "qld_2024"."""
+    name, year = election.rsplit("_", 1)
+    return name, int(year)
+
+
+def elections(data_dir):
+    """The elections in a data directory's dataset, oldest first per name."""
+    partitions = dataset_path(data_dir).glob("final_tally/election=*/year=*")
+    found = [
+        (p.parent.name.split("=", 1)[1], int(p.name.split("=", 1)[1]))
+        for p in partitions
+    ]
+    return [f"{name}_{year}" for name, year in sorted(found)]
+
+
+def read_table(data_dir, election, table, columns=None):
+    """One election's rows of a table, and only the given columns of them.
+
+    The election is a filter on the partitions, so only its files are opened,
+    and only the columns asked for are read from them.
+    """
+    import pyarrow.dataset as ds
+
+    name, year = split_election(election)
+    dataset = ds.dataset(
+        dataset_path(data_dir) / table, format="parquet", partitioning="hive"
+    )
+    if columns is None:
+        columns = [c for c in dataset.schema.names if c not in PARTITIONS]
+    elif TABLES[table]:
+        columns = [TABLES[table], *columns]
+    frame = dataset.to_table(
+        columns=columns,
+        filter=(ds.field("election") == name) & (ds.field("year") == year),
+    ).to_pandas()
+    return frame.set_index(TABLES[table]) if TABLES[table] else frame
+
+
+def add_election(data_dir, election, source_dir):
+    """Add (or replace) an election's flat files in the dataset."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with open(Path(source_dir) / "electorates.json") as f:
+        electorates = pd.DataFrame(json.load(f))[["stub", "electorateName"]]
+    frames = {"electorates": electorates}
+    for table in list(TABLES)[1:]:
+        frames[table] = pd.read_parquet(Path(source_dir) / f"{election}_{table}.parq")
+
+    name, year = split_election(election)
+    for table, frame in frames.items():
+        if TABLES[table]:
+            frame = frame.reset_index()
+        partition = dataset_path(data_dir) / table / f"election={name}" / f"year={year}"
+        partition.mkdir(parents=True, exist_ok=True)
+        pq.write_table(
+            pa.Table.from_pandas(frame, preserve_index=False),
+            partition / "part-0.parquet",
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("elections", nargs="+", help="e.g. qld_2024")
+    parser.add_argument("--source-dir", default="data", help="of the flat files")
+    parser.add_argument("--data-dir", default="data", help="of the dataset")
+    args = parser.parse_args()
+
+    for election in args.elections:
+        add_election(args.data_dir, election, args.source_dir)
+        print(f"Added {election} to {dataset_path(args.data_dir)}")
+
+
+if __name__ == "__main__":
+    main()
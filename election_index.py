@@ -0,0 +1,104 @@
+import numpy as np
+
+
+class ElectionIndex:
+    """Electorate-keyed index over the distribution and first preference tables.
+
+    Both tables are sorted by electorate (and the distribution by exclusion
+    within each electorate), keeping the original order of rows otherwise.
+    Each electorate, and each exclusion within it, is then a contiguous range
+    of rows, so looking up a seat costs O(rows in the seat) rather than a scan
+    of the whole state.
+
+    Tables already in that order, on a string index, as another index's are,
+    can be given with `presorted`, and are then used as they are, uncopied.
+    """
+
+    def __init__(self, distribution, first_pref, presorted=False):
+        if presorted:
+            self.distribution, self.first_pref = distribution, first_pref
+        else:
+            # the row ranges below need the tables in the electorates' order,
+            # so both are sorted on a plain string index (a categorical one
+            # would be sorted by its categories' order)
+            distribution = distribution.set_axis(distribution.index.astype(str))
+            first_pref = first_pref.set_axis(first_pref.index.astype(str))
+            self.distribution = distribution.sort_values(
+                ["electorate", "exclusion"], kind="stable"
+            )
+            self.first_pref = first_pref.sort_index(kind="stable")
+        self.electorates = (
+            self.distribution.index.unique()
+            .union(self.first_pref.index.unique())
+            .sort_values()
+        )
+
+        # categorical codes of the electorate of every row
+        self.distribution_codes = self.electorates.get_indexer(self.distribution.index)
+        self.first_pref_codes = self.electorates.get_indexer(self.first_pref.index)
+        exclusion = self.distribution["exclusion"].to_numpy()
+        if presorted:
+            step = np.diff(self.distribution_codes)
+            if (
+                (step < 0).any()
+                or ((step == 0) & (np.diff(exclusion) < 0)).any()
+                or (np.diff(self.first_pref_codes) < 0).any()
+            ):
+                raise ValueError("The tables aren't sorted by electorate")
+
+        # row ranges of each electorate: rows[i]:rows[i + 1]
+        codes = np.arange(len(self.electorates) + 1)
+        self._seat_rows = np.searchsorted(self.distribution_codes, codes)
+        self._candidate_rows = np.searchsorted(self.first_pref_codes, codes)
+
+        # row ranges of each (electorate, exclusion) group, and the groups of
+        # each electorate: groups[seat_groups[i]:seat_groups[i + 1]]
+        change = (np.diff(self.distribution_codes) != 0) | (np.diff(exclusion) != 0)
+        self._groups = np.r_[0, np.flatnonzero(change) + 1, len(exclusion)]
+        self._group_exclusion = exclusion[self._groups[:-1]]
+        self._seat_groups = np.searchsorted(self._groups, self._seat_rows)
+
+    def _code(self, electorate):
+        return self.electorates.get_loc(electorate)
+
+    def seat(self, electorate):
+        """Distribution rows of an electorate."""
+        i = self._code(electorate)
+        return self.distribution.iloc[self._seat_rows[i] : self._seat_rows[i + 1]]
+
+    def exclusions(self, electorate):
+        """(exclusion, distribution rows) of each exclusion in an electorate."""
+        i = self._code(electorate)
+        groups = range(self._seat_groups[i], self._seat_groups[i + 1])
+        return [
+            (
+                int(self._group_exclusion[g]),
+                self.distribution.iloc[self._groups[g] : self._groups[g + 1]],
+            )
+            for g in groups
+        ]
+
+    def candidates(self, electorate, names=None):
+        """First preference rows of an electorate, optionally of some candidates."""
+        i = self._code(electorate)
+        rows = self.first_pref.iloc[
+            self._candidate_rows[i] : self._candidate_rows[i + 1]
+        ]
+        if names is not None:
+            rows = rows[rows["candidate"].isin(names)]
+        return rows
+
+    def final_rows(self):
+        """Distribution rows of the final exclusion of every electorate."""
+        last = self._seat_groups[1:] - 1
+        last = last[self._seat_groups[1:] > self._seat_groups[:-1]]
+        starts, sizes = self._groups[last], np.diff(self._groups)[last]
+        offsets = starts - np.r_[0, sizes.cumsum()[:-1]]
+        return self.distribution.iloc[
+            np.repeat(offsets, sizes) + np.arange(sizes.sum())
+        ]
+
+    def without_party(self, party):
+        """Distribution rows where neither the from nor to party is `party`."""
+        rows = self.distribution
+        return rows[(rows["fromParty"] != party) & (rows["toParty"] != party)]
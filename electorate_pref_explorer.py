@@ -1,8 +1,13 @@
+from collections import namedtuple
+
 import holoviews as hv
 import panel as pn
 import param
 from bokeh.models import NumeralTickFormatter
 from holoviews import dim
+
+from cache import LRUCache
+from perf import timed_callback
 from utils import hide_hook
 
 intro_txt = """
@@ -13,25 +18,70 @@ intro_txt = """
  The figures on the right show each such distribution, and the running total of the remaining cadidates after that distribution.
  """
 
+# three entries (prepared data, first preference bars and distribution views)
+# are cached per electorate
+CACHE_SIZE = 3 * 100
+
+ElectorateData = namedtuple("ElectorateData", ["cmap", "exclusions", "xrange"])
+
 
 class ElectoratePrefExplorer(pn.viewable.Viewer):
     electorate = param.Selector(label="Select Electorate")
 
-    def __init__(self, distribution, first_pref, electorates, **params):
+    def __init__(self, index, electorates, cache=None, **params):
         super().__init__(**params)
-        self.param.electorate.objects = electorates
-        self.param.electorate.default = next(iter(electorates))
-        self.electorate = self.param.electorate.objects[self.param.electorate.default]
-
-        self.first_pref = first_pref
-        self.distribution = distribution
+        self.load(index, electorates, cache)
 
         self.intro = pn.pane.Markdown(intro_txt)
 
+    def load(self, index, electorates, cache=None):
+        """Explore another election's electorates, in the same widgets."""
+        self.index = index
+        # shared by every session using the same data
+        self.cache = LRUCache(CACHE_SIZE) if cache is None else cache
+
+        self.param.electorate.objects = electorates
+        self.param.electorate.default = next(iter(electorates))
+        with param.discard_events(self):
+            self.electorate = electorates[self.param.electorate.default]
+        # redrawn even if the first electorate has the same stub as before
+        self.param.trigger("electorate")
+
+    def refresh(self, index, electorates):
+        """Show the new counts of some electorates, as during a live count.
+
+        DataStore.refresh has already dropped their entries from the shared
+        cache, once for every session, so only this session's view is redrawn.
+        """
+        self.index = index
+        if self.electorate in electorates:
+            self.param.trigger("electorate")
+
+    def prepared_data(self, electorate):
+        """The colour map and per-exclusion rows of an electorate."""
+        return self.cache.get(("data", electorate), lambda: self._prepare(electorate))
+
+    def _prepare(self, electorate):
+        candidates = self.index.candidates(electorate)
+        return ElectorateData(
+            cmap=dict(zip(candidates["candidate"], candidates["colour"])),
+            exclusions=dict(self.index.exclusions(electorate)),
+            xrange=(0, self.index.seat(electorate)["toRunningTotal"].max()),
+        )
+
     @pn.depends("electorate", watch=False)
+    @timed_callback
     def first_pref_bars(self):
-        data = self.first_pref.loc[self.electorate].copy()
-        data["party"] = data["party"].cat.remove_unused_categories()
+        return self.first_pref_view(self.electorate)
+
+    def first_pref_view(self, electorate):
+        return self.cache.get(
+            ("first_pref", electorate), lambda: self._first_pref_view(electorate)
+        )
+
+    def _first_pref_view(self, electorate):
+        data = self.index.candidates(electorate)
+        data = data.assign(party=data["party"].cat.remove_unused_categories())
 
         hover_tooltips = [
             ("Candidate", "@candidate"),
@@ -56,7 +106,7 @@ class ElectoratePrefExplorer(pn.viewable.Viewer):
             height=175,
         )
 
-    def prefs_sankey(self, data, electorate):
+    def prefs_sankey(self, data, electorate, cmap):
         # info about the edges
         source = data["fromCandidate"].to_list()
         target = data["toCandidate"].to_list()
@@ -65,13 +115,7 @@ class ElectoratePrefExplorer(pn.viewable.Viewer):
 
         # info about the nodes
         nodes = [source[0]] + target
-        candidate_data = self.first_pref.loc[
-            electorate and self.first_pref["candidate"].isin(nodes)
-        ]
-
-        # colour map
-        cmap = self.first_pref[["candidate", "colour"]]
-        cmap = {k: v for k, v in cmap.to_records(index=False)}
+        candidate_data = self.index.candidates(electorate, nodes)
 
         return hv.Sankey(
             (edges, candidate_data[["candidate"]]),
@@ -88,14 +132,10 @@ class ElectoratePrefExplorer(pn.viewable.Viewer):
             default_tools=["pan"],
         )
 
-    def vote_bars(self, data):
+    def vote_bars(self, data, cmap):
         # bars for running totals
         running_totals = data[["toCandidate", "toRunningTotal", "toParty"]]
 
-        # colour map
-        cmap = self.first_pref[["candidate", "colour"]]
-        cmap = {k: v for k, v in cmap.to_records(index=False)}
-
         hover_tooltips = [
             ("Candidate", "@toCandidate"),
             ("Party", "@toParty"),
@@ -118,31 +158,44 @@ class ElectoratePrefExplorer(pn.viewable.Viewer):
             xticks=4,
         )
 
-    @pn.depends("electorate", watch=False)
-    def sankey_and_running_totals(self):
-        columns = []
-        elec = self.electorate
-        for exc in sorted(self.distribution.loc[self.electorate]["exclusion"].unique()):
-            # columns.append(pn.pane.Markdown(f"### Distribution {exc}"))
-
-            data = self.distribution.loc[elec]
-            data = data[data["exclusion"] == exc]
+    def distribution_views(self, electorate):
+        """The Sankey and running total bars of each exclusion in an electorate."""
+        return self.cache.get(
+            ("views", electorate), lambda: self._distribution_views(electorate)
+        )
 
-            sankey = self.prefs_sankey(data, elec).opts(
+    def _distribution_views(self, electorate):
+        data = self.prepared_data(electorate)
+        views = []
+        for exc, rows in data.exclusions.items():
+            sankey = self.prefs_sankey(rows, electorate, data.cmap).opts(
                 width=500, height=175, title=f"Distribution {exc}"
             )
-
-            xrange = (0, self.distribution.loc[elec, "toRunningTotal"].max())
             bars = (
-                self.vote_bars(data)
+                self.vote_bars(rows, data.cmap)
                 .opts(width=300, height=175)
-                .redim(y=hv.Dimension("toRunningTotal", range=xrange))
+                .redim(y=hv.Dimension("toRunningTotal", range=data.xrange))
             )
-            bars = pn.pane.HoloViews(bars)
-            columns.append(pn.Row(sankey, bars))
+            views.append((sankey, bars))
+        return views
 
+    @pn.depends("electorate", watch=False)
+    @timed_callback
+    def sankey_and_running_totals(self):
+        columns = [
+            pn.Row(sankey, pn.pane.HoloViews(bars))
+            for sankey, bars in self.distribution_views(self.electorate)
+        ]
         return pn.Column(*columns, sizing_mode="stretch_width")
 
+    def warm(self):
+        """Build the views of every electorate, up to the size of the cache."""
+        for electorate in list(self.param.electorate.objects.values())[
+            : self.cache.maxsize // 3
+        ]:
+            self.first_pref_view(electorate)
+            self.distribution_views(electorate)
+
     def __panel__(self):
         view = pn.GridSpec(sizing_mode="stretch_both", max_width=1600)
         view[:, 0:4] = pn.Column(
@@ -0,0 +1,257 @@
+"""Export the explorers as static HTML pages, for hosting without a server.
+
+The overall explorer is saved with every choice of electorates group
+embedded, each electorate's first preference bars and distributions get a
+page of their own, and the Greens explorer is saved with its slider
+recounting the seats in the browser. Pages are rendered by a pool of worker
+processes. A page is skipped if it exists and the data it is drawn from (and
+the code that draws it) hasn't changed since it was written, as recorded in
+manifest.json.
+
+    python export.py --output site --workers 4
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from html import escape
+from pathlib import Path
+
+import pandas as pd
+
+from data_store import DATA_DIR, ELECTION, get_store, share_frames
+
+MANIFEST = "manifest.json"
+# modules whose code loads the data of every page, and renders it
+SHARED = [
+    "export.py",
+    "data_store.py",
+    "bundle.py",
+    "dataset.py",
+    "election_index.py",
+    "party_flows.py",
+    "cache.py",
+    "consts.py",
+    "perf.py",
+]
+# modules whose code draws each kind of page, besides the shared ones
+MODULES = {
+    "overall": ["overall_pref_explorer.py", "utils.py"],
+    "electorate": ["electorate_pref_explorer.py", "utils.py"],
+    "greens": ["greens_pref_explorer.py", "greens_flips.py"],
+}
+
+
+def digest(*parts):
+    """Hash of frames, series and other JSON-able values."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, (pd.DataFrame, pd.Series)):
+            h.update(pd.util.hash_pandas_object(part).to_numpy().tobytes())
+            names = part.columns if isinstance(part, pd.DataFrame) else [part.name]
+            h.update(str(list(names)).encode())
+        else:
+            h.update(json.dumps(part, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def code_digest(kind):
+    here = Path(__file__).parent
+    return digest(*[(here / name).read_text() for name in SHARED + MODULES[kind]])
+
+
+def pages(store):
+    """(kind, electorate, path, hash of its inputs) of every page."""
+    yield (
+        "overall",
+        None,
+        "overall.html",
+        digest(
+            store.distribution_party,
+            store.actual_party_tally,
+            store.winners,
+            store.electorates,
+            code_digest("overall"),
+        ),
+    )
+    code = code_digest("electorate")
+    for electorate in store.index.electorates:
+        yield (
+            "electorate",
+            electorate,
+            f"electorates/{electorate}.html",
+            digest(
+                store.index.seat(electorate),
+                store.index.candidates(electorate),
+                store.electorates.get(electorate),
+                code,
+            ),
+        )
+    yield (
+        "greens",
+        None,
+        "greens.html",
+        digest(
+            store.index.final_rows(),
+            store.actual_party_tally,
+            store.electorates,
+            code_digest("greens"),
+        ),
+    )
+
+
+_store = None
+
+
+def start_worker(data_dir, election):
+    """Load the data and plotting extension once per worker process."""
+    global _store
+    import holoviews as hv
+
+    hv.extension("bokeh")
+    share_frames()
+    _store = get_store(data_dir, election)
+
+
+def render(kind, electorate, path):
+    """Render one page to `path`; returns the seconds it took."""
+    import panel as pn
+
+    start = time.perf_counter()
+    store = _store
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if kind == "overall":
+        from overall_pref_explorer import OverallPrefExplorer
+
+        view = OverallPrefExplorer(
+            data=store.distribution_party,
+            party_tally=store.actual_party_tally,
+            flows=store.party_flows,
+            winners=store.winners,
+            names=store.electorates,
+        )
+        # the electorates group is embedded; picking them by hand needs a server
+        pn.panel(view).save(path, title="Preference flows", embed=True, progress=False)
+    elif kind == "electorate":
+        from electorate_pref_explorer import ElectoratePrefExplorer
+
+        name = store.electorates.get(electorate, electorate)
+        explorer = ElectoratePrefExplorer(store.index, {name: electorate})
+        view = pn.Column(
+            pn.pane.Markdown(f"# {name}"),
+            explorer.first_pref_bars(),
+            explorer.sankey_and_running_totals(),
+        )
+        view.save(path, title=name)
+    elif kind == "greens":
+        from greens_pref_explorer import GreensPrefExplorer
+
+        view = GreensPrefExplorer(
+            store.index,
+            store.actual_party_tally,
+            store.electorates,
+            flips=store.greens_flips,
+            client_side=True,
+        )
+        pn.panel(view).save(path, title="Greens preferences")
+    return time.perf_counter() - start
+
+
+def write_index(output, store):
+    electorates = "\n".join(
+        f'<li><a href="electorates/{e}.html">'
+        f"{escape(store.electorates.get(e, e))}</a></li>"
+        for e in sorted(
+            store.index.electorates, key=lambda e: store.electorates.get(e, e)
+        )
+    )
+    (output / "index.html").write_text(
+        f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{escape(store.election)}</title></head>
+<body>
+<h1>Preference flows: {escape(store.election)}</h1>
+<ul>
+<li><a href="overall.html">Overall preference flows</a></li>
+<li><a href="greens.html">Greens preferences to the ALP</a></li>
+</ul>
+<h2>Electorates</h2>
+<ul>
+{electorates}
+</ul>
+</body></html>
+"""
+    )
+
+
+def export(data_dir, election, output, workers=None, force=False):
+    """Render the pages whose inputs changed; returns (rendered, skipped)."""
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    manifest_path = output / MANIFEST
+    manifest = (
+        {}
+        if force or not manifest_path.exists()
+        else json.loads(manifest_path.read_text())
+    )
+
+    store = get_store(data_dir, election)
+    todo, skipped = [], 0
+    for kind, electorate, path, inputs in pages(store):
+        if manifest.get(path) == inputs and (output / path).exists():
+            skipped += 1
+        else:
+            todo.append((kind, electorate, path, inputs))
+
+    def done(path, inputs, seconds):
+        manifest[path] = inputs
+        # written as pages finish, so an interrupted export keeps its progress
+        manifest_path.write_text(json.dumps(manifest, indent=1, sort_keys=True))
+        print(f"  {path} in {seconds:.1f} s", flush=True)
+
+    if workers == 1:
+        start_worker(data_dir, election)
+        for kind, electorate, path, inputs in todo:
+            done(path, inputs, render(kind, electorate, output / path))
+    elif todo:
+        # spawn rather than fork, as in simulate.py
+        with ProcessPoolExecutor(
+            workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=start_worker,
+            initargs=(data_dir, election),
+        ) as executor:
+            futures = {}
+            for kind, electorate, path, inputs in todo:
+                future = executor.submit(render, kind, electorate, output / path)
+                futures[future] = (path, inputs)
+            for future in as_completed(futures):
+                done(*futures[future], future.result())
+
+    write_index(output, store)
+    return len(todo), skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="site")
+    parser.add_argument("--workers", type=int, help="default: number of CPUs")
+    parser.add_argument("--force", action="store_true", help="render every page")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--election", default=ELECTION)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rendered, skipped = export(
+        args.data_dir, args.election, args.output, args.workers, args.force
+    )
+    print(
+        f"Rendered {rendered} pages and skipped {skipped} unchanged in "
+        f"{time.perf_counter() - start:.1f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
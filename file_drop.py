@@ -0,0 +1,96 @@
+"""Simulate count night by dropping updated tables into a data directory.
+
+The counts of an existing election are replayed: every electorate starts
+part way through its distribution, and at each tick a few electorates count
+their next exclusion. An electorate's final tally only appears once its
+count is complete. Each tick's tables replace the last ones atomically, as
+an upstream feed would, for the app to pick up in watch mode:
+
+    python file_drop.py --target live --interval 5
+    panel serve app.py --args --data-dir live --watch 2
+"""
+
+import argparse
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_store import DATA_DIR, ELECTION
+
+
+def replace(frame, path, **kwargs):
+    """Write a parquet file so readers only ever see the old or the new one."""
+    partial = path.with_suffix(".partial")
+    frame.to_parquet(partial, **kwargs)
+    os.replace(partial, path)
+
+
+def drop(target, election, distribution, final_tally, progress):
+    """Write the tables as counted up to each electorate's progress."""
+    counted = (
+        distribution["exclusion"].to_numpy() <= progress[distribution.index].to_numpy()
+    )
+    replace(distribution[counted], target / f"{election}_distributions.parq")
+    complete = (
+        progress[final_tally["electorate"]].to_numpy()
+        >= final_tally["exclusions"].to_numpy()
+    )
+    replace(
+        final_tally[complete].drop(columns="exclusions"),
+        target / f"{election}_final_tally.parq",
+        index=False,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", default=DATA_DIR, help="of the full counts")
+    parser.add_argument("--election", default=ELECTION)
+    parser.add_argument("--target", default="live", help="directory to drop into")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds")
+    parser.add_argument("--per-tick", type=int, default=5, help="electorates")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    source, target = Path(args.data_dir), Path(args.target)
+    target.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(args.seed)
+
+    distribution = pd.read_parquet(source / f"{args.election}_distributions.parq")
+    final_tally = pd.read_parquet(source / f"{args.election}_final_tally.parq")
+    # the first preferences and names don't change during the count
+    for name in ["electorates.json", f"{args.election}_first_prefs.parq"]:
+        shutil.copy(source / name, target / name)
+
+    exclusions = distribution.groupby(level=0)["exclusion"].max()
+    final_tally["exclusions"] = exclusions[final_tally["electorate"]].to_numpy()
+    # every electorate has counted at least one exclusion
+    progress = pd.Series(
+        [int(rng.integers(1, n + 1)) for n in exclusions], index=exclusions.index
+    )
+
+    tick = 0
+    while True:
+        drop(target, args.election, distribution, final_tally, progress)
+        counting = progress.index[progress < exclusions]
+        print(
+            f"Tick {tick}: {len(exclusions) - len(counting)} of "
+            f"{len(exclusions)} electorates declared",
+            flush=True,
+        )
+        if counting.empty:
+            break
+        advanced = rng.choice(
+            counting, min(args.per_tick, len(counting)), replace=False
+        )
+        progress[advanced] += 1
+        tick += 1
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
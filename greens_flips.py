@@ -0,0 +1,158 @@
+from bisect import bisect_right
+
+import numpy as np
+import pandas as pd
+
+
+class GreensFlips:
+    """The seats the Greens' preferences decided, at every Greens to ALP rate.
+
+    Each electorate's winner is a step function of the Greens to ALP
+    percentage, so the preferences and running totals are worked out once
+    for every slider position, along with the slider position at which each
+    electorate flips to the ALP. The new tally for any position is then a
+    lookup into the sorted flip points.
+
+    Nothing here changes once built, so one instance is shared by every
+    session's GreensPrefExplorer; the arrays are read-only to keep it so.
+    """
+
+    def __init__(self, final_rows, party_tally):
+        self.party_tally = party_tally
+        self.rows = self.greens_rows(final_rows.reset_index())
+        self.greens_third = list(
+            self.rows[["electorate", "exclusion"]]
+            .drop_duplicates("electorate")
+            .itertuples(index=False, name=None)
+        )
+
+        # the final count rows as counted, with the actual preferences
+        data = self.rows.set_index("electorate")[
+            [
+                "toParty",
+                "toCandidate",
+                "preferences",
+                "toRunningTotal",
+                "votesDistributed",
+                "origTotal",
+            ]
+        ]
+        idx = data.reset_index().groupby("electorate")["toRunningTotal"].idxmax()
+        self.old_tally = data.reset_index().loc[idx].value_counts("toParty")
+        self.data = data.astype(
+            {"preferences": "int32", "toRunningTotal": "int32", "origTotal": "int32"}
+        )
+
+        # total and percentage of votes transferred from greens to ALP
+        labor = self.rows["toParty"] == "ALP"
+        total_transferred = self.rows[labor]["votesDistributed"].sum()
+        total_labor = self.rows[labor]["preferences"].sum()
+        # None if the Greens' preferences decided no seats
+        self.actual_pref = (
+            int((total_labor / total_transferred) * 100) if total_transferred else None
+        )
+
+        self.find_breakpoints()
+        for array in [self.preferences, self.running_totals]:
+            array.flags.writeable = False
+
+    @staticmethod
+    def greens_rows(rows):
+        """Final count rows of the electorates the Greens' preferences decided."""
+        rows = rows.assign(origTotal=rows["toRunningTotal"] - rows["preferences"])
+
+        # electorates where the greens' 2nd prefs were transferred last, between
+        # the ALP and one other candidate, and were enough to decide the seat
+        by_electorate = rows.groupby("electorate")
+        greens = by_electorate["fromParty"].transform("first") == "The Greens"
+        labor = (rows["toParty"] == "ALP").groupby(rows["electorate"]).transform("any")
+        orig = by_electorate["origTotal"]
+        two_left = orig.transform("size") == 2
+        margin = orig.transform("max") - orig.transform("min")
+        return rows[greens & labor & two_left & (rows["votesDistributed"] >= margin)]
+
+    def updated(self, final_rows, party_tally, electorates):
+        """The flips after some electorates' final counts changed.
+
+        Only the changed electorates' final counts are checked for the
+        Greens' preferences deciding them.
+        """
+        changed = final_rows[final_rows.index.isin(electorates)]
+        kept = self.rows[~self.rows["electorate"].isin(electorates)]
+        rows = pd.concat([kept.set_index("electorate"), changed])
+        return GreensFlips(rows.sort_index(kind="stable"), party_tally)
+
+    def find_breakpoints(self):
+        """Find the slider position at which each electorate flips to the ALP."""
+        rows = self.data.reset_index()
+        labor = (rows["toParty"] == "ALP").to_numpy()
+        votes = rows["votesDistributed"].to_numpy()
+        orig = rows["origTotal"].to_numpy()
+
+        # row of the ALP candidate, and of their opponent, in each electorate
+        position = pd.Series(np.arange(len(rows)), index=rows["electorate"])
+        other_row = position[~labor].groupby(level=0).first()
+        electorates = other_row.index
+        alp_row = position[labor].groupby(level=0).first()[electorates].to_numpy()
+        other_row = other_row.to_numpy()
+
+        # preferences of every row at every slider position
+        pcts = np.arange(101)[:, None] / 100
+        alp_prefs = (votes[alp_row] * pcts).astype("int32")
+        self.preferences = np.where(
+            labor,
+            (votes * pcts).astype("int32"),
+            votes - alp_prefs[:, electorates.get_indexer(rows["electorate"])],
+        ).astype("int32")
+        self.running_totals = self.preferences + orig
+
+        # ties go to whichever candidate comes first, as with idxmax
+        alp_total = self.running_totals[:, alp_row]
+        other_total = self.running_totals[:, other_row]
+        alp_wins = (alp_total > other_total) | (
+            (alp_total == other_total) & (alp_row < other_row)
+        )
+
+        self.breakpoints = pd.DataFrame(
+            {
+                # first slider position at which the ALP wins
+                "pct": np.where(alp_wins.any(axis=0), alp_wins.argmax(axis=0), 101),
+                # the exact (fractional) percentage at which the totals are level
+                "exact": (votes[alp_row] + orig[other_row] - orig[alp_row])
+                / (2 * votes[alp_row])
+                * 100,
+                "party": rows["toParty"].to_numpy()[other_row],
+            },
+            index=electorates,
+        ).sort_values("pct", kind="stable")
+
+        # the tally with the first k electorates (in flip order) won by the ALP:
+        # each flip moves one seat from the losing party to the ALP
+        parties = rows["toParty"].cat.categories
+        losers = np.eye(len(parties), dtype=int)[
+            parties.get_indexer(self.breakpoints["party"])
+        ]
+        flipped = np.cumsum(
+            np.eye(len(parties), dtype=int)[parties.get_loc("ALP")] - losers, axis=0
+        )
+        counts = losers.sum(axis=0) + np.vstack([np.zeros(len(parties), int), flipped])
+        tallies = (
+            pd.DataFrame(counts, columns=parties)
+            .sub(self.old_tally, axis=1)
+            .add(self.party_tally, axis=1)
+            .dropna(axis=1)
+            .astype("int")
+        )
+        tallies.columns.name = "party"
+        self.thresholds = self.breakpoints["pct"].to_list()
+        self.tallies = [row.rename("New") for _, row in tallies.iterrows()]
+
+    def tally(self, pct):
+        """Seats won by each party with `pct`% of the Greens' preferences to the ALP."""
+        return self.tallies[bisect_right(self.thresholds, pct)]
+
+    def rows_at(self, pct):
+        """The final count rows, recounted at a slider position."""
+        return self.data.assign(
+            preferences=self.preferences[pct], toRunningTotal=self.running_totals[pct]
+        )
@@ -1,14 +1,25 @@
+import asyncio
+import io
+from concurrent.futures import ThreadPoolExecutor
 from random import choice
 
-import holoviews as hv
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 import panel as pn
 import param
-from bokeh.models import NumeralTickFormatter
+from bokeh.models import (
+    CDSView,
+    ColumnDataSource,
+    FactorRange,
+    HoverTool,
+    IndexFilter,
+    NumeralTickFormatter,
+)
+from bokeh.plotting import figure
+from cache import LRUCache
 from consts import colours, other_colours
-from pywaffle import Waffle
-from utils import hide_hook
+from greens_flips import GreensFlips
+from perf import timed_callback
 
 pn.config.throttled = True
 
@@ -22,8 +33,43 @@ intro_txt = """
 
 num_cols = 4
 
+# rendered waffles, by title and tally; the slider only produces a few tallies
+WAFFLE_CACHE_SIZE = 64
+# waffles that aren't cached are drawn here, off the server's event loop
+render_pool = ThreadPoolExecutor(2, thread_name_prefix="waffle")
+
+# Recomputes the final counts and the new tally in the browser, as
+# GreensFlips.find_breakpoints does on the server, so the slider needs no
+# server callback
+client_js = """
+const pct = cb_obj.value / 100;
+const rows = source.data;
+const votes = rows.votesDistributed;
+for (let i = 0; i < votes.length; i++) {
+  const alp = Math.trunc(votes[rows.alpRow[i]] * pct);
+  const prefs = i == rows.alpRow[i] ? alp : votes[i] - alp;
+  rows.toRunningTotal[i] = rows.origTotal[i] + prefs;
+}
+source.change.emit();
+
+let k = 0;
+while (k < thresholds.length && thresholds[k] <= cb_obj.value) k++;
+const seats = tally.data.seats;
+for (let p = 0; p < seats.length; p++) {
+  seats[p] = tallies[k][p];
+  tally.data.label[p] = String(seats[p]);
+}
+tally.change.emit();
+"""
+
 
 def make_waffle(data, title):
+    # matplotlib and pywaffle are slow to import, so only pay for them once a
+    # waffle is actually drawn. The figure is made without pyplot, so it isn't
+    # kept in pyplot's figure registry and can be drawn from any thread.
+    from matplotlib.backends.backend_svg import FigureCanvasSVG
+    from pywaffle import Waffle
+
     legend = {
         "loc": "lower left",
         "bbox_to_anchor": (0, -0.5),
@@ -32,8 +78,7 @@ def make_waffle(data, title):
         "fontsize": 15,
     }
 
-    return plt.figure(
-        FigureClass=Waffle,
+    waffle = Waffle(
         rows=6,
         values=data,
         labels=[f"{k} ({v})" for k, v in data.items()],
@@ -41,175 +86,292 @@ def make_waffle(data, title):
         legend=legend,
         title={"label": title, "loc": "left", "fontsize": 15},
     )
+    FigureCanvasSVG(waffle)
+    return waffle
+
+
+def render_waffle(data, title):
+    """SVG of a waffle chart of the seats won by each party."""
+    waffle = make_waffle(data, title)
+    try:
+        svg = io.StringIO()
+        waffle.savefig(svg, format="svg", bbox_inches="tight")
+        svg = svg.getvalue()
+        # without the xml header and doctype, as the SVG pane expects
+        return svg[svg.index("<svg") :]
+    finally:
+        waffle.clear()
 
 
 class GreensPrefExplorer(pn.viewable.Viewer):
     green_pref = param.Integer(label="Greens to ALP pref. %", bounds=(0, 100))
+    client_side = param.Boolean(
+        default=False,
+        constant=True,
+        doc="Update the bars and tally in the browser, without server callbacks.",
+    )
 
-    @staticmethod
-    def greens_decider(df):
-        x, y = df["toRunningTotal"] - df["preferences"]
-        return df["votesDistributed"].iloc[0] >= abs(x - y)
-
-    def __init__(self, distribution, party_tally, electorates, **params):
+    def __init__(
+        self, index, party_tally, electorates, cache=None, flips=None, **params
+    ):
         super().__init__(**params)
-
-        self.party_tally = party_tally.copy(deep=True)
-        self.new_party_tally = self.party_tally.copy(deep=True)
-        self.new_party_tally.name = "New"
-
-        self.electorates = electorates
-        self.prepare_data(distribution)
+        self.cache = LRUCache(WAFFLE_CACHE_SIZE) if cache is None else cache
 
         self.num_cols = 4
 
         self.intro = pn.pane.Markdown(intro_txt)
+        self.flip_text = pn.pane.Markdown()
+        self.actual_waffle = pn.pane.SVG(sizing_mode="stretch_width")
+        self._view = None
+        self.load(index, party_tally, electorates, flips)
 
-        data_old = self.party_tally.sort_values(ascending=False).to_dict()
-        actual_waffle = make_waffle(data_old, title="Actual Results")
-        self.actual_waffle = pn.pane.Matplotlib(
-            actual_waffle, sizing_mode="stretch_width", tight=True, format="svg"
-        )
-
-    def prepare_data(self, distribution):
-        self.data = distribution
-        max_exclusion = self.data.groupby("electorate")["exclusion"].max("exclusion")
-
-        # then for each electorate, check if both 'The Greens' and 'ALP' were part of the distribution
-        # this will give us those electorates where greens' 2nd prefs were transferred last.
-        self.greens_third = []
-        for electorate, exclusion in max_exclusion.items():
-            df = self.data.loc[electorate]
-            df = df[df["exclusion"] == exclusion]
-            if (
-                (df["fromParty"].unique()[0] == "The Greens")
-                and ("ALP" in self.data["toParty"].unique())
-                and GreensPrefExplorer.greens_decider(df)
-            ):
-                self.greens_third.append((electorate, exclusion))
-
-        all_data = []
-        for electorate, exclusion in self.greens_third:
-            df = self.data.loc[electorate]
-            df = df[df["exclusion"] == exclusion].copy(deep=True)
-            all_data.append(df)
-        self.data = pd.concat(all_data)
-
-        # total and percentage of votes transferred from greens to ALP
-        labor = self.data["toParty"] == "ALP"
-        total_transferred = self.data[labor]["votesDistributed"].sum()
-        total_labor = self.data[labor]["preferences"].sum()
-
-        self.data = self.data.reset_index().set_index(["electorate", "exclusion"])
-        self.data = self.data.loc[self.greens_third][
-            [
-                "toParty",
-                "toCandidate",
-                "preferences",
-                "toRunningTotal",
-                "votesDistributed",
-            ]
-        ].droplevel(level="exclusion")
-        self.data["origTotal"] = self.data["toRunningTotal"] - self.data["preferences"]
-
-        idx = self.data.reset_index().groupby("electorate")["toRunningTotal"].idxmax()
-        self.old_tally = self.data.reset_index().loc[idx].value_counts("toParty")
-        self.new_tally = self.old_tally.copy(deep=True)
+    def load(self, index, party_tally, electorates, flips=None):
+        """Explore another election, redrawing the view in place if shown.
 
-        self.data = self.data.astype(
-            {"preferences": "int32", "toRunningTotal": "int32", "origTotal": "int32"}
-        )
-
-        self.green_pref = int((total_labor / total_transferred) * 100)
+        `flips` may be shared with other sessions, as it is never changed.
+        """
+        self.party_tally = party_tally
+        self.electorates = electorates
+        self.source = None
+        self.prepare_data(index, flips)
+        # one data source for every bar chart, patched as the slider moves
+        self.source = self.bar_source()
+
+        key, render = self.waffle(self.party_tally, "Actual Results")
+        self.actual_waffle.object = self.cache.get(key, render)
+        if self._view is not None:
+            self._view.objects = {}
+            self.fill_view(self._view)
+
+    def refresh(self, index, party_tally, electorates, flips=None):
+        """Show the new counts of some electorates, as during a live count.
+
+        Only the changed electorates' final counts are checked for the Greens'
+        preferences deciding them; the slider stays where it is.
+        """
+        self.party_tally = party_tally
+        if flips is None:
+            flips = self.flips.updated(index.final_rows(), party_tally, electorates)
+        self.flips = flips
+
+        # the bars are redrawn only if electorates or candidates came or went
+        source = self.bar_source()
+        if self.client_side or any(
+            not np.array_equal(source.data[c], self.source.data[c])
+            for c in ["electorate", "toCandidate"]
+        ):
+            self.source = source
+            if self._view is not None:
+                self._view.objects = {}
+                self.fill_view(self._view)
+        else:
+            self.source.data.update(
+                {c: source.data[c] for c in ["alpRow", "votesDistributed", "origTotal"]}
+            )
 
-    def new_waffle(self):
-        data_new = self.new_tally.sort_values(ascending=False).to_dict()
-        new_waffle = make_waffle(data_new, title="New Results")
-        new_waffle = pn.pane.Matplotlib(
-            new_waffle, sizing_mode="stretch_width", tight=True, format="svg"
-        )
-        return new_waffle
+        key, render = self.waffle(self.party_tally, "Actual Results")
+        self.actual_waffle.object = self.cache.get(key, render)
+        self.flip_text.object = self.flip_points()
+        # recounts the bars and new tally at the slider's position
+        self.param.trigger("green_pref")
+
+    def prepare_data(self, index, flips=None):
+        """Work out the slider's effect, unless given it, and start at the
+        actual Greens to ALP rate."""
+        if flips is None:
+            flips = GreensFlips(index.final_rows(), self.party_tally)
+        self.flips = flips
+        if flips.actual_pref is not None:
+            self.green_pref = flips.actual_pref
+        # the slider may not have moved, so the tally is set here too
+        self.new_tally = flips.tally(self.green_pref)
 
     @staticmethod
-    def vote_bars(data, electorate):
-        # bars for running totals
-        running_totals = data[["toCandidate", "toRunningTotal", "toParty"]]
-
-        hover_tooltips = [
-            ("Candidate", "@toCandidate"),
-            ("Party", "@toParty"),
-            ("Votes", "@toRunningTotal{0,0}"),
-        ]
-
-        return hv.Bars(running_totals.sort_values("toRunningTotal")).opts(
-            hover_tooltips=hover_tooltips,
-            invert_axes=True,
-            show_legend=False,
-            default_tools=["hover"],
-            toolbar=None,
-            axiswise="xaxis",
-            xformatter=NumeralTickFormatter(format="0 a"),
-            hooks=[hide_hook],
+    def waffle(tally, title):
+        """Cache key of a tally's waffle, and a function to render it."""
+        data = tally.sort_values(ascending=False).to_dict()
+        return (title, tuple(data.items())), lambda: render_waffle(data, title)
+
+    @pn.depends("green_pref")
+    @timed_callback
+    async def new_waffle(self):
+        key, render = self.waffle(self.new_tally, "New Results")
+        if key in self.cache:
+            svg = self.cache.get(key, render)
+        else:
+            loop = asyncio.get_running_loop()
+            svg = await loop.run_in_executor(render_pool, self.cache.get, key, render)
+        return pn.pane.SVG(svg, sizing_mode="stretch_width")
+
+    def flip_points(self):
+        if self.flips.actual_pref is None:
+            return "No seats were decided by the Greens' preferences."
+        breakpoints = self.flips.breakpoints
+        flips = breakpoints[breakpoints["pct"].between(1, 100)]
+        if flips.empty:
+            return "No seats change hands as the slider moves."
+        points = ", ".join(
+            f"{pct}% ({self.electorates[electorate]}, from {party})"
+            for electorate, pct, party in flips[["pct", "party"]].itertuples()
         )
+        return f"Seats flip to the ALP at {points}."
 
     @pn.depends("green_pref", watch=True)
+    @timed_callback
     def pref_changed(self):
-        labor = self.data["toParty"] == "ALP"
-
-        pct = self.green_pref / 100
-        self.data.loc[labor, "preferences"] = (
-            self.data.loc[labor, "votesDistributed"] * pct
-        ).astype("int32")
-
-        self.data.loc[~labor, "preferences"] = (
-            self.data.loc[~labor, "votesDistributed"]
-            - self.data.loc[labor, "preferences"]
-        )
-        self.data["toRunningTotal"] = self.data["preferences"] + self.data["origTotal"]
-
-        idx = self.data.reset_index().groupby("electorate")["toRunningTotal"].idxmax()
-        self.new_tally = self.data.reset_index().loc[idx].value_counts("toParty")
-        self.new_tally = (
-            (self.party_tally + (self.new_tally - self.old_tally))
-            .dropna()
-            .astype("int")
+        self.new_tally = self.flips.tally(self.green_pref)
+        if self.source is not None:
+            self.patch_bars()
+
+    def patch_bars(self):
+        """Send only the running totals that differ from those shown."""
+        totals = self.flips.running_totals[self.green_pref]
+        changed = np.flatnonzero(totals != self.source.data["toRunningTotal"])
+        if changed.size:
+            patches = list(zip(changed.tolist(), totals[changed].tolist()))
+            self.source.patch({"toRunningTotal": patches})
+
+    @timed_callback
+    def electorate_bars(self):
+        return self.bar_figures(self.source)
+
+    def bar_source(self):
+        """The final count rows, with what the browser needs to recount them."""
+        rows = self.flips.data.reset_index()
+        labor = rows["toParty"] == "ALP"
+        position = pd.Series(np.arange(len(rows)), index=rows["electorate"])
+        alp_row = position[labor.to_numpy()].groupby(level=0).first()
+        return ColumnDataSource(
+            {
+                "electorate": rows["electorate"].astype(str).to_numpy(),
+                "toCandidate": rows["toCandidate"].astype(str).to_numpy(),
+                # through object, as an empty categorical can't be cast to str
+                "toParty": rows["toParty"].astype(object).astype(str).to_numpy(),
+                "colour": [colours.get(p, "grey") for p in rows["toParty"]],
+                "alpRow": alp_row[rows["electorate"]].to_numpy("int32"),
+                "votesDistributed": rows["votesDistributed"].to_numpy("int32"),
+                "origTotal": rows["origTotal"].to_numpy(),
+                # a copy, as it is patched in place
+                "toRunningTotal": self.flips.running_totals[self.green_pref].copy(),
+            }
         )
-        self.new_tally.index.name = "party"
-        self.new_tally.name = "New"
 
-    def electorate_bars(self):
+    def bar_figures(self, source):
+        """A bar chart of each electorate, all drawn from the one source."""
+        electorates = source.data["electorate"]
+        hover = HoverTool(
+            tooltips=[
+                ("Candidate", "@toCandidate"),
+                ("Party", "@toParty"),
+                ("Votes", "@toRunningTotal{0,0}"),
+            ]
+        )
         bars = []
-        for electorate, rows in self.data.groupby("electorate"):
-            options = dict(
+        for electorate in dict.fromkeys(electorates):
+            rows = [i for i, e in enumerate(electorates) if e == electorate]
+            plot = figure(
+                y_range=FactorRange(
+                    *[source.data["toCandidate"][i] for i in rows[::-1]]
+                ),
                 width=200,
                 height=80,
-                ylabel="",
-                yaxis=None,
-                fontsize=dict(title=10),
-                color="toParty",
-                cmap=colours,
-                xaxis="bare",
+                title=self.electorates[electorate],
+                toolbar_location=None,
+                tools=[hover.clone()],
             )
-            bars.append(
-                GreensPrefExplorer.vote_bars(rows, electorate).opts(
-                    **options, title=self.electorates[electorate]
-                )
+            plot.hbar(
+                y="toCandidate",
+                right="toRunningTotal",
+                height=0.8,
+                color="colour",
+                source=source,
+                view=CDSView(filter=IndexFilter(rows)),
             )
+            plot.title.text_font_size = "10pt"
+            plot.yaxis.visible = False
+            plot.xaxis.formatter = NumeralTickFormatter(format="0 a")
+            plot.border_fill_color = None
+            plot.outline_line_color = None
+            bars.append(pn.pane.Bokeh(plot))
         return pn.FlexBox(*bars, align_items="center")
 
-    # return hv.Layout(bars).cols(num_cols)
-
-    def __panel__(self):
-        view = pn.GridSpec(sizing_mode="stretch_both", max_width=1600)
+    def tally_figure(self, source):
+        """Seats won by each party, from a source updated in place."""
+        plot = figure(
+            y_range=FactorRange(*source.data["party"][::-1]),
+            height=250,
+            title="New Results",
+            toolbar_location=None,
+            tools="",
+            sizing_mode="stretch_width",
+        )
+        plot.hbar(y="party", right="seats", height=0.8, color="colour", source=source)
+        plot.text(
+            x="seats",
+            y="party",
+            text="label",
+            x_offset=5,
+            text_baseline="middle",
+            text_font_size="12px",
+            source=source,
+        )
+        plot.xaxis.visible = False
+        plot.xgrid.visible = False
+        plot.border_fill_color = None
+        plot.outline_line_color = None
+        return pn.pane.Bokeh(plot, sizing_mode="stretch_width")
+
+    def client_view(self):
+        """The slider, bars and tally, with the recount done by the browser."""
+        slider = pn.widgets.IntSlider(
+            name=self.param.green_pref.label, start=0, end=100, value=self.green_pref
+        )
+        tallies = pd.DataFrame(self.flips.tallies)
+        tally = self.new_tally.reindex(tallies.columns, fill_value=0)
+        tally_source = ColumnDataSource(
+            {
+                "party": tallies.columns.astype(str).to_list(),
+                "seats": tally.to_numpy("int32"),
+                "label": tally.astype(str).to_list(),
+                "colour": [colours.get(p, "grey") for p in tallies.columns],
+            }
+        )
+        slider.jscallback(
+            value=client_js,
+            args={
+                "source": self.source,
+                "tally": tally_source,
+                "thresholds": self.flips.thresholds,
+                "tallies": tallies.to_numpy("int32").tolist(),
+            },
+        )
+        return slider, self.electorate_bars(), self.tally_figure(tally_source)
+
+    def fill_view(self, view):
+        """Lay out the widgets and charts of the current data in a grid."""
+        self.flip_text.object = self.flip_points()
+        if self.client_side:
+            slider, bars, new_tally = self.client_view()
+        else:
+            slider, bars, new_tally = (
+                self.param.green_pref,
+                self.electorate_bars(),
+                self.new_waffle,
+            )
         view[:, 0:4] = pn.Column(
             self.intro,
             pn.Spacer(height=50),
-            self.param.green_pref,
+            slider,
+            self.flip_text,
             pn.Spacer(height=50),
             self.actual_waffle,
             pn.Spacer(height=20),
-            self.new_waffle,
+            new_tally,
         )
         view[:, 4] = pn.Spacer()
-        view[:, 5:15] = self.electorate_bars
-        return view
+        view[:, 5:15] = bars
+
+    def __panel__(self):
+        self._view = pn.GridSpec(sizing_mode="stretch_both", max_width=1600)
+        self.fill_view(self._view)
+        return self._view
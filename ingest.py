@@ -0,0 +1,404 @@
+"""Convert a directory of saved per-electorate count files into the tables.
+
+Each source file holds one electorate's ECQ results, as JSON: the electorate's
+record as in electorates.json, with each candidate's primary votes, the
+distribution of each excluded candidate's preferences and, once the seat is
+declared, the final count:
+
+    {
+      "stub": "algester",
+      "electorateName": "Algester",
+      "candidates": [
+        {"ballotName": "TURNER, Jane", "ballotOrderNumber": 2,
+         "partyCode": "Family First", "primaryVotes": 1035}, ...
+      ],
+      "distributions": [
+        {"exclusion": 1, "excludedBallotOrderNumber": 2, "votesDistributed": 1035,
+         "transfers": [
+           {"ballotOrderNumber": 1, "preferences": 247, "runningTotal": 1807}, ...
+         ]}, ...
+      ],
+      "finalCount": [{"ballotOrderNumber": 3, "count": 14353}, ...]
+    }
+
+A candidate may also be given a "colour"; otherwise their party's is used.
+The tables are written to the data directory as the flat files the app reads,
+<election>_distributions.parq, _first_prefs.parq and _final_tally.parq, with
+the electorates added to its electorates.json, and those whose files are
+deleted removed from it. Every party column shares one categorical dtype, and
+the tables are checked against SCHEMA before they replace the old ones. The
+parties keep their order in the tables being replaced, with any others after
+them; new tables list independents first and the others alphabetically.
+Converting tables' source files over them so gives back their values and party
+order, although final_tally's party dtype lists every party, not only those in
+the final counts.
+
+Runs are incremental: the size and modification time of each source file are
+kept beside the tables, and only the electorates whose files changed are
+converted again (in parallel), the others' rows being kept. During a count,
+--watch converts the changes as they arrive:
+
+    python ingest.py raw/qld_2024 --election qld_2024 --data-dir live --watch 2
+    panel serve app.py --args --data-dir live --watch 2
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from consts import IND, colours, other_colours
+from data_store import DATA_DIR, ELECTION
+from file_drop import replace
+
+# party codes of the ECQ's candidates, where the tables use another name
+PARTY_CODES = {"Australian Labor Party": "ALP", "IND": IND}
+# columns and dtypes of each table, as the explorers use them; "party" is the
+# categorical dtype shared by every party column
+SCHEMA = {
+    "distributions": {
+        "toCandidate": "object",
+        "toBallotOrder": "uint8",
+        "toParty": "party",
+        "preferences": "int32",
+        "toRunningTotal": "int32",
+        "exclusion": "uint8",
+        "fromCandidate": "object",
+        "fromParty": "party",
+        "fromBallotOrder": "uint8",
+        "votesDistributed": "int32",
+    },
+    "first_prefs": {
+        "candidate": "object",
+        "ballotOrder": "uint8",
+        "party": "party",
+        "count": "int32",
+        "colour": "category",
+    },
+    "final_tally": {
+        "electorate": "object",
+        "candidate": "object",
+        "ballotOrder": "uint8",
+        "party": "party",
+        "count": "int32",
+        "percentage": "object",
+        "colour": "category",
+    },
+}
+# tables indexed by electorate, rather than having it as a column
+INDEXED = ["distributions", "first_prefs"]
+
+
+def manifest_path(data_dir, election):
+    return Path(data_dir) / f"{election}_sources.json"
+
+
+def table_path(data_dir, election, table):
+    return Path(data_dir) / f"{election}_{table}.parq"
+
+
+def convert(path):
+    """The electorate, and its rows of each table, from one source file."""
+    with open(path) as f:
+        try:
+            source = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{path}: {e}") from e
+    stub = source["stub"]
+
+    candidates = {}
+    for c in source["candidates"]:
+        party = PARTY_CODES.get(c["partyCode"], c["partyCode"])
+        order = c["ballotOrderNumber"]
+        # independents are told apart by their place on the ballot
+        colour = c.get("colour") or colours.get(
+            party, other_colours[order % len(other_colours)]
+        )
+        candidates[order] = (c["ballotName"], party, colour, c["primaryVotes"])
+
+    def candidate(order):
+        if order not in candidates:
+            raise ValueError(f"{path}: no candidate has ballot order {order}")
+        return candidates[order]
+
+    first_prefs = [
+        {
+            "electorate": stub,
+            "candidate": name,
+            "ballotOrder": order,
+            "party": party,
+            "count": votes,
+            "colour": colour,
+        }
+        for order, (name, party, colour, votes) in candidates.items()
+    ]
+
+    distributions = []
+    for d in sorted(source.get("distributions", []), key=lambda d: d["exclusion"]):
+        excluded = d["excludedBallotOrderNumber"]
+        from_name, from_party, _, _ = candidate(excluded)
+        for t in d["transfers"]:
+            to_name, to_party, _, _ = candidate(t["ballotOrderNumber"])
+            distributions.append(
+                {
+                    "electorate": stub,
+                    "toCandidate": to_name,
+                    "toBallotOrder": t["ballotOrderNumber"],
+                    "toParty": to_party,
+                    "preferences": t["preferences"],
+                    "toRunningTotal": t["runningTotal"],
+                    "exclusion": d["exclusion"],
+                    "fromCandidate": from_name,
+                    "fromParty": from_party,
+                    "fromBallotOrder": excluded,
+                    "votesDistributed": d["votesDistributed"],
+                }
+            )
+
+    final = source.get("finalCount") or []
+    total = sum(c["count"] for c in final)
+    final_tally = []
+    for c in final:
+        name, party, colour, _ = candidate(c["ballotOrderNumber"])
+        final_tally.append(
+            {
+                "electorate": stub,
+                "candidate": name,
+                "ballotOrder": c["ballotOrderNumber"],
+                "party": party,
+                "count": c["count"],
+                "percentage": f"{c['count'] / total * 100:.2f}%",
+                "colour": colour,
+            }
+        )
+
+    rows = {
+        "distributions": distributions,
+        "first_prefs": first_prefs,
+        "final_tally": final_tally,
+    }
+    return stub, source["electorateName"], rows
+
+
+def convert_all(paths, workers=None):
+    """Yield each file's electorate and rows as it is converted."""
+    if workers == 1 or len(paths) <= 1:
+        yield from map(convert, paths)
+        return
+    with ProcessPoolExecutor(workers) as executor:
+        yield from executor.map(convert, paths, chunksize=8)
+
+
+def to_frame(rows, table):
+    """A table's rows as a frame, with the schema's columns and dtypes (other
+    than the parties')."""
+    columns = SCHEMA[table]
+    frame = pd.DataFrame(rows, columns=list(dict.fromkeys(["electorate", *columns])))
+    frame = frame.astype(
+        {c: t for c, t in columns.items() if t not in ["object", "party", "category"]}
+    )
+    return frame.set_index("electorate") if table in INDEXED else frame
+
+
+def party_columns(table):
+    return [c for c, t in SCHEMA[table].items() if t == "party"]
+
+
+def existing_parties(data_dir, election):
+    """The parties of the tables in the data directory, in their order."""
+    parties = []
+    for table in SCHEMA:
+        path = table_path(data_dir, election, table)
+        if path.exists():
+            frame = pd.read_parquet(path, columns=party_columns(table))
+            for column in frame:
+                if isinstance(frame[column].dtype, pd.CategoricalDtype):
+                    parties += frame[column].cat.categories.to_list()
+    return list(dict.fromkeys(parties))
+
+
+def with_parties(tables, known=()):
+    """The tables with one categorical dtype for the parties of all of them.
+
+    The parties in `known` keep its order, and any others follow it.
+    """
+    columns = {table: party_columns(table) for table in tables}
+    parties = set()
+    for table, frame in tables.items():
+        for column in columns[table]:
+            parties.update(frame[column].dropna().astype(str))
+    known = [p for p in known if p in parties]
+    order = [*known, IND, *sorted(parties - {IND})]
+    party = pd.CategoricalDtype(list(dict.fromkeys(order)))
+    return {
+        table: frame.astype(dict.fromkeys(columns[table], party))
+        for table, frame in tables.items()
+    }
+
+
+def validate(tables):
+    """Raise a ValueError listing how the tables differ from SCHEMA."""
+    problems = []
+    party = None
+    for table, frame in tables.items():
+        if table in INDEXED and frame.index.name != "electorate":
+            problems.append(f"{table} isn't indexed by electorate")
+        if list(frame.columns) != list(SCHEMA[table]):
+            problems.append(f"{table} has columns {list(frame.columns)}")
+            continue
+        for column, dtype in SCHEMA[table].items():
+            actual = frame[column].dtype
+            if dtype == "party":
+                party = actual if party is None else party
+                if actual != party:
+                    problems.append(f"{table}.{column} has other parties")
+            elif str(actual) != dtype:
+                problems.append(f"{table}.{column} is {actual}, not {dtype}")
+            if frame[column].isna().any():
+                problems.append(f"{table}.{column} has missing values")
+    if problems:
+        raise ValueError("The tables don't match the schema: " + "; ".join(problems))
+
+
+def read_manifest(data_dir, election):
+    path = manifest_path(data_dir, election)
+    tables = [table_path(data_dir, election, t) for t in SCHEMA]
+    # without all of the tables, every electorate is converted again
+    if not path.exists() or not all(p.exists() for p in tables):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def ingest(source_dir, data_dir=DATA_DIR, election=ELECTION, workers=None):
+    """Bring the tables up to date with the source files.
+
+    Returns the electorates whose rows were converted again, or dropped.
+    """
+    source_dir, data_dir = Path(source_dir), Path(data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    manifest = read_manifest(data_dir, election)
+    files = {}
+    for path in sorted(source_dir.glob("*.json")):
+        stat = path.stat()
+        files[path.name] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+    changed = [
+        name
+        for name, stat in files.items()
+        if {k: manifest.get(name, {}).get(k) for k in stat} != stat
+    ]
+    removed = {v["stub"] for k, v in manifest.items() if k not in files}
+    if not changed and not removed:
+        return set()
+
+    rows = {table: [] for table in SCHEMA}
+    names = {}
+    for name, (stub, electorate, converted) in zip(
+        changed, convert_all([source_dir / name for name in changed], workers)
+    ):
+        files[name]["stub"] = stub
+        names[stub] = electorate
+        for table, table_rows in converted.items():
+            rows[table] += table_rows
+    for name, stat in files.items():
+        stat.setdefault("stub", manifest.get(name, {}).get("stub"))
+    # a file may now hold another electorate than before
+    dropped = removed | {manifest[n]["stub"] for n in changed if n in manifest}
+    redone = dropped | set(names)
+
+    tables = {}
+    for table in SCHEMA:
+        frame = to_frame(rows[table], table)
+        if manifest:
+            old = pd.read_parquet(table_path(data_dir, election, table))
+            electorate = old.index if table in INDEXED else old["electorate"]
+            kept = old[~electorate.isin(redone)]
+            # categoricals are combined as strings, and made categorical again
+            frame = pd.concat([kept.astype(frame.dtypes.to_dict()), frame])
+        if table in INDEXED:
+            frame = frame.sort_index(kind="stable")
+        else:
+            frame = frame.sort_values("electorate", kind="stable", ignore_index=True)
+        if "colour" in frame:
+            frame = frame.astype({"colour": "category"})
+        tables[table] = frame
+    tables = with_parties(tables, existing_parties(data_dir, election))
+    validate(tables)
+
+    for table, frame in tables.items():
+        path = table_path(data_dir, election, table)
+        replace(frame, path, index=table in INDEXED)
+    # the electorates of removed files, or of files now holding another one
+    add_electorates(data_dir, names, removed=dropped - set(names))
+    partial = manifest_path(data_dir, election).with_suffix(".partial")
+    with open(partial, "w") as f:
+        json.dump(files, f)
+    os.replace(partial, manifest_path(data_dir, election))
+    return redone
+
+
+def add_electorates(data_dir, names, removed=()):
+    """Add (or rename) electorates in the data directory's electorates.json,
+    and remove those in `removed`, which no longer have rows."""
+    path = Path(data_dir) / "electorates.json"
+    electorates = []
+    if path.exists():
+        with open(path) as f:
+            electorates = json.load(f)
+    electorates = [e for e in electorates if e["stub"] not in removed]
+    known = {e["stub"]: e for e in electorates}
+    for stub, name in names.items():
+        if stub in known:
+            known[stub]["electorateName"] = name
+        else:
+            electorates.append({"stub": stub, "electorateName": name})
+    partial = path.with_suffix(".partial")
+    with open(partial, "w") as f:
+        json.dump(electorates, f)
+    os.replace(partial, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source_dir", help="of the electorates' JSON files")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="to write the tables to")
+    parser.add_argument("--election", default=ELECTION)
+    parser.add_argument("--workers", type=int, help="processes; default one per CPU")
+    parser.add_argument(
+        "--watch",
+        type=float,
+        nargs="?",
+        const=5.0,
+        help="check for changed files every WATCH seconds",
+    )
+    args = parser.parse_args()
+
+    while True:
+        start = time.perf_counter()
+        try:
+            redone = ingest(args.source_dir, args.data_dir, args.election, args.workers)
+        except (KeyError, ValueError) as e:
+            if args.watch is None:
+                raise
+            # a file caught half-written is converted again on the next check
+            print(f"Could not convert {args.election}: {e}", flush=True)
+            redone = None
+        if redone:
+            print(
+                f"Converted {len(redone)} electorates of {args.election} in "
+                f"{time.perf_counter() - start:.2f} s",
+                flush=True,
+            )
+        elif args.watch is None:
+            print(f"{args.election} is up to date")
+        if args.watch is None:
+            break
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    main()
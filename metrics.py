@@ -0,0 +1,94 @@
+"""Serve the server's metrics at /metrics, alongside the app.
+
+A Panel plugin, loaded with
+
+    panel serve app.py --plugins metrics
+
+The latency histograms, live session count and estimated memory of each
+session are served in Prometheus' text format, or as JSON with ?format=json.
+Only requests from the server's own machine are answered.
+"""
+
+import json
+
+from tornado.web import RequestHandler
+
+from perf import metrics, rss
+
+# label of each histogram's values
+LABELS = {
+    "callback_seconds": "callback",
+    "startup_seconds": "step",
+    "data_load_seconds": "election",
+    "data_refresh_seconds": "election",
+}
+LOCAL = {"127.0.0.1", "::1"}
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def prometheus():
+    """The metrics in Prometheus' text exposition format."""
+    lines = []
+    histograms = sorted(metrics.histograms.items())
+    for name in dict.fromkeys(name for (name, _), _ in histograms):
+        lines.append(f"# TYPE {name} histogram")
+        for (metric, label), histogram in histograms:
+            if metric != name:
+                continue
+            labels = f'{LABELS.get(name, "label")}="{_label(label)}"'
+            seen = 0
+            for bound, n in zip((*histogram.buckets, "+Inf"), histogram.counts):
+                seen += n
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {seen}')
+            lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+            lines.append(f"{name}_count{{{labels}}} {seen}")
+
+    memory = metrics.session_memory()
+    lines.append("# TYPE sessions_active gauge")
+    lines.append(f"sessions_active {len(memory)}")
+    lines.append("# TYPE session_memory_bytes gauge")
+    for session_id, estimate in memory.items():
+        if estimate is not None:
+            lines.append(f'session_memory_bytes{{session="{session_id}"}} {estimate}')
+    lines.append("# TYPE process_resident_memory_bytes gauge")
+    lines.append(f"process_resident_memory_bytes {rss()}")
+    return "\n".join(lines) + "\n"
+
+
+def summary():
+    """The metrics as JSON, with the buckets holding the median and tail."""
+    memory = metrics.session_memory()
+    return {
+        "histograms": [
+            {
+                "metric": name,
+                LABELS.get(name, "label"): label,
+                "count": histogram.count,
+                "mean_ms": histogram.sum / max(histogram.count, 1) * 1000,
+                **{f"p{q}_le_s": histogram.quantile(q / 100) for q in [50, 90, 99]},
+            }
+            for (name, label), histogram in sorted(metrics.histograms.items())
+        ],
+        "sessions_active": len(memory),
+        "session_memory_bytes": memory,
+        "process_resident_memory_bytes": rss(),
+    }
+
+
+class MetricsHandler(RequestHandler):
+    def get(self):
+        if self.request.remote_ip not in LOCAL:
+            self.set_status(403)
+            return
+        if self.get_argument("format", "") == "json":
+            self.set_header("Content-Type", "application/json")
+            self.write(json.dumps(summary(), default=str))
+        else:
+            self.set_header("Content-Type", "text/plain; version=0.0.4")
+            self.write(prometheus())
+
+
+ROUTES = [("/metrics", MetricsHandler, {})]
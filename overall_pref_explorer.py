@@ -1,22 +1,33 @@
 import param
 import panel as pn
-import pandas as pd
 import holoviews as hv
 from consts import colours
 from bokeh.models import HoverTool
 from holoviews import dim
+from party_flows import PartyFlows
+from perf import timed_callback
 from utils import hide_hook, label_opts
 
+ALL = "All electorates"
+PICKED = "Hand-picked"
+
 
 class OverallPrefExplorer(pn.viewable.Viewer):
     data = param.DataFrame(doc="Stores preference distribution data.")
     party_tally = param.Series(doc="Stores total party tally.")
+    flows = param.ClassSelector(
+        class_=PartyFlows, doc="Preference flows, by electorate and party."
+    )
+    winners = param.Series(doc="Winning party of each electorate.")
+    names = param.Dict(default={}, doc="Name of each electorate.")
+    group = param.Selector(label="Electorates")
+    electorates = param.ListSelector(default=[], label="Hand-picked electorates")
 
     intro = """
 
     This dashboard is for exploring the preference flows during the [2024 QLD state elections](https://en.wikipedia.org/wiki/2024_Queensland_state_election). The data was extracted from [QLD Electoral Commission](https://results.elections.qld.gov.au/SGE2024).
     
-    There are three tabs: for exploring the overall preference flows, for exploring the preference flows for each electorate, and one for exploring the preference flows from the Greens to the ALP.
+    There are six tabs: for exploring the overall preference flows, for exploring the preference flows for each electorate, one for exploring the preference flows from the Greens to the ALP, one for recounting every electorate with preference rates of your choosing (What-if), one for simulating the seat tallies when those rates are uncertain (Simulation), and one for the seats won under a uniform swing between two parties (Uniform Swing).
     
     **Note**: Independent candidates are not included in the preference flows.
     
@@ -26,77 +37,104 @@ class OverallPrefExplorer(pn.viewable.Viewer):
 
     def __init__(self, **params):
         super().__init__(**params)
-        table = self.get_table()
-        sankey = self.get_sankey()
-        bars = self.get_party_bars()
+        # the flows are summed once; filtering electorates slices the sums
+        if self.flows is None:
+            with param.discard_events(self):
+                self.flows = PartyFlows(self.data)
+        self.data_changed()
 
         self._layout = pn.GridSpec(sizing_mode="stretch_both", max_width=1600)
         self._layout[:, 0:4] = pn.Column(
-            pn.pane.Markdown(self.intro), pn.Spacer(height=50), bars
+            pn.pane.Markdown(self.intro),
+            pn.Spacer(height=50),
+            self.get_party_bars,
+            pn.Spacer(height=30),
+            self.param.group,
+            pn.widgets.MultiChoice.from_param(
+                self.param.electorates, sizing_mode="stretch_width"
+            ),
         )
-        self._layout[0:10, 5:15] = sankey
-        self._layout[11:18, 4:15] = table
-
+        self._layout[0:10, 5:15] = self.get_sankey
+        self._layout[11:18, 4:15] = self.get_table
+
+    @param.depends("flows", "winners", "names", watch=True)
+    def data_changed(self):
+        """Offer the electorates of new (or updated) data."""
+        # electorates can be picked by hand, or by the party that won them
+        self._groups = {}
+        if self.winners is not None:
+            for party in self.party_tally.sort_values(ascending=False).index:
+                won = self.winners[self.winners == party].index
+                self._groups[f"Won by {party}"] = won.intersection(
+                    self.flows.electorates
+                ).to_list()
+        self.param.group.objects = [ALL, *self._groups, PICKED]
+        self.param.electorates.objects = {
+            self.names.get(e, e): e for e in self.flows.electorates
+        }
+
+        # the electorates shown are kept, as far as they are still there
+        if self.group not in self.param.group.objects:
+            with param.discard_events(self):
+                self.group = ALL
+        if self.group == PICKED:
+            with param.discard_events(self):
+                self.electorates = [
+                    e for e in self.electorates if e in self.flows.electorates
+                ]
+            self.param.trigger("electorates")
+        else:
+            self.group_changed()
+
+    @param.depends("group", watch=True)
+    def group_changed(self):
+        if self.group != PICKED:
+            with param.discard_events(self):
+                self.electorates = self._groups.get(self.group, [])
+            self.param.trigger("electorates")
+
+    @param.depends("electorates", watch=True)
+    def electorates_changed(self):
+        if self.group == PICKED or self.electorates != self._groups.get(self.group, []):
+            with param.discard_events(self):
+                self.group = PICKED if self.electorates else ALL
+
+    def selected(self):
+        """The chosen electorates, or None for all of them."""
+        return self.electorates or None
+
+    @pn.depends("electorates")
+    @timed_callback
     def get_table(self):
-        return self.data.pivot_table(
-            index=["fromParty"],
-            columns=["toParty"],
-            values="preferences",
-            aggfunc="sum",
-            margins=True,
-            margins_name="Total",
-            observed=True,
-            fill_value=0,
-        ).style.background_gradient(axis=1, cmap="BuPu")
-
-    def get_sankey(self):
-        self.data = (
-            self.data.groupby(["fromParty", "toParty"], observed=True)[["preferences"]]
-            .sum()
-            .reset_index()
+        return self.flows.table(self.selected()).style.background_gradient(
+            axis=1, cmap="BuPu"
         )
 
-        # calculate the percentage of votes transferred
-        self.data["from_pct"] = (
-            self.data["preferences"]
-            / self.data.groupby(["fromParty"], observed=True)["preferences"].transform(
-                "sum"
-            )
-            * 100
-        )
-        self.data["to_pct"] = (
-            self.data["preferences"]
-            / self.data.groupby(["toParty"], observed=True)["preferences"].transform(
-                "sum"
-            )
-            * 100
-        )
+    @pn.depends("electorates")
+    @timed_callback
+    def get_sankey(self):
+        edges = self.flows.edges(self.selected())
 
-        # %%
         # assign unique codes to the 'from' and 'to' parties
         # since sankey doesn't support acyclic connections, we have to assign unique codes
         # to both 'from' and 'to' parties.
-        self.data["from"] = pd.Categorical(
-            self.data["fromParty"].cat.remove_unused_categories()
-        ).codes
-        step = self.data["from"].max()
-        self.data["to"] = (
-            pd.Categorical(self.data["toParty"].cat.remove_unused_categories()).codes
-            + step
-            + 1
-        )
-        # code to party dict so we can construct the node dataset to be passed to hv.Sankey
-        # nodes will hold information corresponding to each code
-        from_codes = sorted(
-            dict(zip(self.data["from"], self.data["fromParty"])).items()
-        )
-        to_codes = sorted(dict(zip(self.data["to"], self.data["toParty"])).items())
+        from_parties = self.flows.from_parties
+        from_parties = from_parties[from_parties.isin(edges["fromParty"])]
+        to_parties = self.flows.to_parties
+        to_parties = to_parties[to_parties.isin(edges["toParty"])]
+        edges["from"] = from_parties.get_indexer(edges["fromParty"])
+        edges["to"] = to_parties.get_indexer(edges["toParty"]) + len(from_parties)
+
+        # code to party pairs so we can construct the node dataset to be passed to
+        # hv.Sankey; nodes will hold information corresponding to each code
+        from_codes = list(enumerate(from_parties))
+        to_codes = list(enumerate(to_parties, start=len(from_parties)))
 
         nodes = [x[1] for x in from_codes + to_codes]
         nodes = hv.Dataset(enumerate(nodes), "index", "party")
 
         # cmap for the nodes/edges
-        cmap = {str(i[0]): colours[i[1]] for i in from_codes + to_codes}
+        cmap = {str(i[0]): colours.get(i[1], "grey") for i in from_codes + to_codes}
 
         # %%
         hover = HoverTool(
@@ -117,7 +155,7 @@ class OverallPrefExplorer(pn.viewable.Viewer):
             "to_pct",
         ]
         return hv.Sankey(
-            (self.data[cols], nodes),
+            (edges[cols], nodes),
             kdims=["from", "to"],
             vdims=["preferences", "from_pct", "to_pct", "fromParty", "toParty"],
         ).opts(
@@ -129,6 +167,8 @@ class OverallPrefExplorer(pn.viewable.Viewer):
             tools=[hover],
         )
 
+    @pn.depends("party_tally")
+    @timed_callback
     def get_party_bars(self):
         bars = hv.Bars(self.party_tally.sort_values(), ["party"], ["Actual"]).opts(
             invert_axes=True,
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+
+class PartyFlows:
+    """Preferences from each party to each other party, by electorate.
+
+    The distribution rows are summed once into `flows`, an electorate x
+    from party x to party array. The flows of any subset of electorates are
+    then a sum over the first axis of a slice of it, rather than a regrouping
+    of the rows.
+    """
+
+    def __init__(self, distribution):
+        rows = distribution.reset_index()
+        self.electorates = pd.Index(rows["electorate"].unique(), name="electorate")
+        self.from_parties = rows["fromParty"].cat.categories.rename("fromParty")
+        self.to_parties = rows["toParty"].cat.categories.rename("toParty")
+
+        shape = (len(self.electorates), len(self.from_parties), len(self.to_parties))
+        cells = np.ravel_multi_index(
+            (
+                self.electorates.get_indexer(rows["electorate"]),
+                rows["fromParty"].cat.codes.to_numpy(),
+                rows["toParty"].cat.codes.to_numpy(),
+            ),
+            shape,
+        )
+        size = int(np.prod(shape))
+        # preferences, and number of rows, of every (electorate, from, to)
+        self.flows = (
+            np.bincount(cells, rows["preferences"].to_numpy("int64"), size)
+            .astype("int64")
+            .reshape(shape)
+        )
+        self.rows = np.bincount(cells, minlength=size).reshape(shape)
+
+        # the flows and percentages of all electorates
+        self.total = self.matrix()
+        self.from_pct, self.to_pct = self.percentages(self.total)
+
+    def _select(self, electorates):
+        if electorates is None:
+            return slice(None)
+        return self.electorates.get_indexer(electorates)
+
+    def matrix(self, electorates=None):
+        """Preferences from each party to each party, in some electorates."""
+        return self.flows[self._select(electorates)].sum(axis=0)
+
+    def observed(self, electorates=None):
+        """Whether each from, to pair has any rows in some electorates."""
+        return self.rows[self._select(electorates)].any(axis=0)
+
+    @staticmethod
+    def percentages(matrix):
+        """Share of each from party's, and each to party's, preferences."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            from_pct = matrix / matrix.sum(axis=1, keepdims=True) * 100
+            to_pct = matrix / matrix.sum(axis=0, keepdims=True) * 100
+        return from_pct, to_pct
+
+    def table(self, electorates=None):
+        """The flows as a from party x to party table, with totals."""
+        observed = self.observed(electorates)
+        used_from, used_to = observed.any(axis=1), observed.any(axis=0)
+        table = pd.DataFrame(
+            self.matrix(electorates)[np.ix_(used_from, used_to)],
+            index=self.from_parties[used_from],
+            columns=self.to_parties[used_to],
+        )
+        table["Total"] = table.sum(axis=1)
+        table.loc["Total"] = table.sum(axis=0)
+        return table
+
+    def edges(self, electorates=None):
+        """The observed from, to pairs, with their preferences and percentages."""
+        matrix = self.matrix(electorates)
+        if electorates is None:
+            from_pct, to_pct = self.from_pct, self.to_pct
+        else:
+            from_pct, to_pct = self.percentages(matrix)
+        f, t = np.nonzero(self.observed(electorates))
+        return pd.DataFrame(
+            {
+                "fromParty": self.from_parties[f],
+                "toParty": self.to_parties[t],
+                "preferences": matrix[f, t],
+                "from_pct": from_pct[f, t],
+                "to_pct": to_pct[f, t],
+            }
+        )
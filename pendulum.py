@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+
+class Pendulum:
+    """Two-candidate margins of every electorate, sorted for uniform swings.
+
+    Each electorate's margin is the winner's share of the votes of the two
+    candidates left after its last exclusion, less 50%. The margins of the
+    seats each party holds against each other party are sorted once, so the
+    seats a uniform swing of any size takes from one party to the other are
+    a prefix of them, found by a binary search.
+    """
+
+    def __init__(self, final_rows):
+        rows = final_rows.reset_index()
+        # the two leading candidates, if the count stopped with more left;
+        # ties go to whichever candidate comes first, as with idxmax
+        rows = rows.sort_values(
+            ["electorate", "toRunningTotal"], ascending=[True, False], kind="stable"
+        )
+        top = rows.groupby("electorate", sort=False).head(2)
+        top = top[top.groupby("electorate")["toParty"].transform("size") == 2]
+        winner, runner_up = top.iloc[::2], top.iloc[1::2]
+        won = winner["toRunningTotal"].to_numpy("float64")
+        lost = runner_up["toRunningTotal"].to_numpy("float64")
+        self.seats = pd.DataFrame(
+            {
+                "holder": winner["toParty"].astype(str).to_numpy(),
+                "challenger": runner_up["toParty"].astype(str).to_numpy(),
+                "margin": won / (won + lost) * 100 - 50,
+            },
+            index=pd.Index(winner["electorate"].to_numpy(), name="electorate"),
+        ).sort_values("margin", kind="stable")
+
+        # seats held by each party against each challenger, closest first
+        self.held = {
+            (holder, challenger): (
+                seats["margin"].to_numpy(),
+                seats.index.to_numpy(),
+            )
+            for (holder, challenger), seats in self.seats.groupby(
+                ["holder", "challenger"], sort=False
+            )
+        }
+        # contests between each pair of parties, most seats first
+        pairs = pd.Series(
+            [
+                tuple(sorted(p))
+                for p in zip(self.seats["holder"], self.seats["challenger"])
+            ]
+        )
+        self.pairs = list(pairs.value_counts().index)
+
+    def flipped(self, pair, swing):
+        """Seats that change hands with a uniform swing of `swing` points to
+        the first party of `pair` (or to the second, if negative)."""
+        to_party, from_party = pair if swing >= 0 else pair[::-1]
+        margins, electorates = self.held.get(
+            (from_party, to_party), (np.empty(0), np.empty(0, object))
+        )
+        # a seat left on a margin of exactly the swing is tied, and kept
+        return electorates[: np.searchsorted(margins, abs(swing), side="left")]
+
+    def tally(self, party_tally, pair, swing):
+        """Seats won by each party after the swing, from the actual tally."""
+        to_party, from_party = pair if swing >= 0 else pair[::-1]
+        seats = len(self.flipped(pair, swing))
+        tally = party_tally.add(
+            pd.Series({to_party: seats, from_party: -seats}), fill_value=0
+        ).astype("int")
+        return tally[tally > 0]
+
+    def contest(self, pair):
+        """Seats fought between the two parties of `pair`, with the swing to
+        the first party (negative if to the second) that changes their hands."""
+        seats = self.seats[
+            self.seats["holder"].isin(pair) & self.seats["challenger"].isin(pair)
+        ]
+        needed = seats["margin"].where(seats["holder"] == pair[1], -seats["margin"])
+        return seats.assign(swing=needed).sort_values("swing", kind="stable")
@@ -0,0 +1,184 @@
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+# loggers of the app's reports, such as startup timings and data loads
+LOGGERS = ["perf", "data_store"]
+
+# upper bounds of the latency histograms' buckets, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    """Counts of observed latencies in fixed buckets, with their sum.
+
+    Observing costs a bisect and a few additions under a lock, so it can be
+    left on around every callback.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile."""
+        with self._lock:
+            counts = list(self.counts)
+        rank, seen = q * sum(counts), 0
+        for bound, n in zip((*self.buckets, float("inf")), counts):
+            seen += n
+            if n and seen >= rank:
+                return bound
+        return None
+
+
+class Metrics:
+    """Latency histograms, by metric and label, and the live sessions."""
+
+    def __init__(self):
+        self.histograms = {}
+        self.sessions = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, label):
+        key = (name, label)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(key, Histogram())
+        return histogram
+
+    def observe(self, name, label, seconds):
+        self.histogram(name, label).observe(seconds)
+
+    def session_started(self, session_id, memory=None):
+        """Count a session, with a function estimating the memory it holds."""
+        with self._lock:
+            self.sessions[session_id] = memory
+
+    def session_ended(self, session_id):
+        with self._lock:
+            self.sessions.pop(session_id, None)
+
+    def session_memory(self):
+        """Estimated bytes held by each live session, worked out when asked."""
+        with self._lock:
+            sessions = dict(self.sessions)
+        return {
+            session_id: memory() if memory else None
+            for session_id, memory in sessions.items()
+        }
+
+
+metrics = Metrics()
+
+
+def timed_callback(function):
+    """Record the latency of every call to a callback in `metrics`.
+
+    Apply it beneath `pn.depends`, so Panel still sees the callback's
+    dependencies and whether it is a coroutine.
+    """
+    name = function.__qualname__
+    histogram = metrics.histogram("callback_seconds", name)
+
+    if inspect.iscoroutinefunction(function):
+
+        @functools.wraps(function)
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+
+    else:
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+
+    return timed
+
+
+def nbytes(*objects):
+    """Bytes held by frames, series and arrays; other objects are ignored."""
+    total = 0
+    for obj in objects:
+        if hasattr(obj, "memory_usage"):
+            usage = obj.memory_usage(index=True)
+            total += int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+        elif hasattr(obj, "nbytes"):
+            total += int(obj.nbytes)
+    return total
+
+
+def rss():
+    """Resident memory of this process, in bytes."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def serve_logging():
+    """Log the app's reports at panel serve's --log-level (INFO by default).
+
+    panel serve only sets the level of Bokeh's own loggers, and the app's
+    would otherwise drop anything below WARNING.
+    """
+    level = logging.getLogger("bokeh").getEffectiveLevel()
+    for name in LOGGERS:
+        logging.getLogger(name).setLevel(level)
+
+
+class SessionTimings:
+    """Records how long each part of a session took to build."""
+
+    def __init__(self, name="session"):
+        self.name = name
+        self.timings = {}
+
+    @contextmanager
+    def timed(self, step):
+        start = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - start
+        self.timings[step] = self.timings.get(step, 0) + seconds
+        metrics.observe("startup_seconds", step, seconds)
+
+    @property
+    def total(self):
+        return sum(self.timings.values())
+
+    def report(self):
+        width = max((len(k) for k in self.timings), default=0)
+        lines = [f"{self.name} startup: {self.total * 1000:.1f} ms"]
+        lines += [
+            f"  {step:<{width}}  {seconds * 1000:8.1f} ms"
+            for step, seconds in self.timings.items()
+        ]
+        return "\n".join(lines)
+
+    def log(self):
+        logger.info(self.report())
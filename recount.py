@@ -0,0 +1,165 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+Outcome = namedtuple("Outcome", ["winners", "tally"])
+
+
+class RecountEngine:
+    """Recounts every electorate's final count under different preference flows.
+
+    The rows of each electorate's final exclusion are held as flat arrays, one
+    entry per remaining candidate. A scenario is a vector of rates, one per
+    (from party, to party) pair in `pairs`, giving the share of the excluded
+    candidate's votes that flow to each remaining candidate. NaN keeps the
+    share observed in that electorate. Candidates without a rate share
+    whatever is left over in proportion to their observed shares.
+
+    Only the final distribution is recounted; the order of earlier
+    exclusions is assumed not to change.
+    """
+
+    def __init__(self, distribution):
+        rows = distribution.reset_index()
+        rows = rows[
+            rows["exclusion"]
+            == rows.groupby("electorate")["exclusion"].transform("max")
+        ].sort_values("electorate", kind="stable")
+
+        self.electorates = pd.Index(rows["electorate"].unique(), name="electorate")
+        self.parties = (
+            rows["toParty"].cat.categories.union(rows["fromParty"].cat.categories)
+        ).rename("party")
+
+        electorate = self.electorates.get_indexer(rows["electorate"])
+        self._to = self.parties.get_indexer(rows["toParty"])
+        self._from = self.parties.get_indexer(rows["fromParty"])
+        self._votes = rows["votesDistributed"].to_numpy(dtype="float64")
+        self._orig = (rows["toRunningTotal"] - rows["preferences"]).to_numpy(
+            dtype="float64"
+        )
+        self._share = rows["preferences"].to_numpy(dtype="float64") / self._votes
+        self._preferences = rows["preferences"].to_numpy(dtype="float64")
+
+        self._electorate = electorate
+
+        pairs = pd.MultiIndex.from_arrays(
+            [self.parties[self._from], self.parties[self._to]], names=["from", "to"]
+        )
+        self.pairs = pairs.unique().sort_values()
+        self._row_pair = self.pairs.get_indexer(pairs)
+
+        everyone = _Recount(self, np.ones(len(rows), dtype=bool))
+        self._observed_winners = everyone.winners(self.rates()[None])[0]
+
+    @property
+    def observed_rates(self):
+        """Vote-weighted share of each pair's votes, across all electorates."""
+        votes = np.bincount(self._row_pair, self._votes, len(self.pairs))
+        prefs = np.bincount(self._row_pair, self._preferences, len(self.pairs))
+        return pd.Series(prefs / votes, index=self.pairs, name="rate")
+
+    def rates(self, overrides=None):
+        """A rate vector with the given {(from, to): rate} pairs set."""
+        rates = np.full(len(self.pairs), np.nan)
+        for pair, rate in (overrides or {}).items():
+            rates[self.pairs.get_loc(pair)] = rate
+        return rates
+
+    def default_pairs(self, exclude=()):
+        """The main recipient of each party's preferences in the final counts."""
+        flows = (
+            pd.Series(self._preferences, index=self.pairs[self._row_pair])
+            .groupby(level=[0, 1])
+            .sum()
+            .drop(list(exclude), level="from", errors="ignore")
+            .drop(list(exclude), level="to", errors="ignore")
+        )
+        return flows.groupby(level="from").idxmax().to_list()
+
+    def evaluate(self, rates, batch_size=10_000):
+        """Winner of every electorate and party tally for each rate vector.
+
+        `rates` has shape (len(pairs),) or (n, len(pairs)). Returns winners as
+        party codes with shape (n, electorates) and tallies with shape
+        (n, parties).
+        """
+        rates = np.atleast_2d(np.asarray(rates, dtype="float64"))
+        winners = np.empty((len(rates), len(self.electorates)), dtype="int64")
+        winners[:] = self._observed_winners
+
+        # only electorates with a rate set somewhere in the batch can change
+        pairs = ~np.isnan(rates).all(axis=0)
+        electorates = np.zeros(len(self.electorates), dtype=bool)
+        electorates[self._electorate[pairs[self._row_pair]]] = True
+        rows = electorates[self._electorate]
+        if rows.any():
+            recount = _Recount(self, rows)
+            for start in range(0, len(rates), batch_size):
+                batch = slice(start, start + batch_size)
+                winners[batch][:, electorates] = recount.winners(rates[batch])
+
+        offsets = np.arange(len(rates))[:, None] * len(self.parties)
+        tally = np.bincount(
+            (winners + offsets).ravel(), minlength=len(rates) * len(self.parties)
+        ).reshape(len(rates), len(self.parties))
+        return Outcome(winners, tally)
+
+    def tally(self, outcome):
+        """Party tallies of an outcome as a frame, one row per rate vector."""
+        return pd.DataFrame(outcome.tally, columns=self.parties)
+
+    def winners(self, outcome):
+        """Winning party of each electorate, one row per rate vector."""
+        return pd.DataFrame(
+            self.parties.to_numpy()[outcome.winners], columns=self.electorates
+        )
+
+
+class _Recount:
+    """The final counts of a subset of the electorates, ready to recount.
+
+    The rows are laid out on an (electorate, candidate) grid, padded with
+    candidates who receive nothing and can't win.
+    """
+
+    def __init__(self, engine, rows):
+        electorate = engine._electorate[rows]
+        starts = np.flatnonzero(np.r_[True, np.diff(electorate) != 0])
+        sizes = np.diff(np.r_[starts, len(electorate)])
+        grid = np.repeat(np.arange(len(sizes)), sizes)
+        slot = np.arange(len(electorate)) - np.repeat(starts, sizes)
+        shape = (len(sizes), sizes.max())
+
+        def on_grid(values, fill):
+            out = np.full(shape, fill, dtype=np.asarray(values).dtype)
+            out[grid, slot] = values
+            return out
+
+        # padding uses an extra, never set, pair
+        self.pair = on_grid(engine._row_pair[rows], len(engine.pairs))
+        self.share = on_grid(engine._share[rows], 0.0)
+        self.votes = on_grid(engine._votes[rows], 0.0)
+        self.orig = on_grid(engine._orig[rows], -np.inf)
+        self.party = on_grid(engine._to[rows], -1)
+
+    def winners(self, rates):
+        rates = np.hstack([rates, np.full((len(rates), 1), np.nan)])
+        rate = rates[:, self.pair]
+        fixed = ~np.isnan(rate)
+        rate[~fixed] = 0
+
+        fixed_total = rate.sum(axis=2, keepdims=True)
+        free_total = np.where(fixed, 0, self.share).sum(axis=2, keepdims=True)
+        # set rates can't hand out more than all of the votes; if there is no
+        # one else to give them to, they are scaled up to all of the votes
+        scale = np.where(free_total > 0, np.maximum(fixed_total, 1), fixed_total)
+        scale[scale == 0] = 1
+        leftover = np.clip(1 - fixed_total, 0, None) / np.where(
+            free_total > 0, free_total, 1
+        )
+        share = np.where(fixed, rate / scale, self.share * leftover)
+
+        slot = (self.orig + self.votes * share).argmax(axis=2)
+        return self.party[np.arange(len(self.party)), slot]
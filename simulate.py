@@ -0,0 +1,287 @@
+"""Monte Carlo simulation of seat tallies under uncertain preference flows.
+
+Preference rates for (from party, to party) pairs are drawn from the given
+distributions and every electorate's final count is recounted for each draw
+with the RecountEngine. Draws are split into chunks, each with its own seed
+spawned from the run's seed, so a run gives the same result however many
+worker processes it is spread over.
+
+    python simulate.py --draws 1000000 --rate "The Greens:ALP:normal:0.78:0.05"
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import site
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from consts import IND
+from data_store import DATA_DIR, ELECTION, get_store
+
+# the rate simulated without --rate, if the election has it
+GREENS_ALP = ("The Greens", "ALP")
+# samplers of the supported distributions, by name and parameters
+DISTRIBUTIONS = {
+    "normal(mean, sd)": lambda rng, a, b, n: rng.normal(a, b, n),
+    "beta(alpha, beta)": lambda rng, a, b, n: rng.beta(a, b, n),
+    "uniform(low, high)": lambda rng, a, b, n: rng.uniform(a, b, n),
+}
+SAMPLERS = {name.split("(")[0]: sampler for name, sampler in DISTRIBUTIONS.items()}
+
+
+@dataclass(frozen=True)
+class RateSpec:
+    """Distribution of the share of one party's votes that flow to another."""
+
+    from_party: str
+    to_party: str
+    kind: str = "normal"
+    a: float = 0.5
+    b: float = 0.05
+
+    @classmethod
+    def parse(cls, text):
+        """Parse "from:to:kind:a:b", e.g. "The Greens:ALP:normal:0.78:0.05"."""
+        from_party, to_party, kind, a, b = text.split(":")
+        if kind not in SAMPLERS:
+            raise ValueError(f"Unknown distribution {kind!r}")
+        return cls(from_party, to_party, kind, float(a), float(b))
+
+    @property
+    def pair(self):
+        return (self.from_party, self.to_party)
+
+    def sample(self, rng, n):
+        return np.clip(SAMPLERS[self.kind](rng, self.a, self.b, n), 0, 1)
+
+
+class SimulationResult:
+    """Counts accumulated over the draws of a simulation."""
+
+    def __init__(self, engine, draws=0, seats=None, wins=None):
+        self.engine = engine
+        self.draws = draws
+        parties, electorates = len(engine.parties), len(engine.electorates)
+        # seats[p, k]: draws in which party p won k seats
+        self.seats = (
+            np.zeros((parties, electorates + 1), "int64") if seats is None else seats
+        )
+        # wins[e, p]: draws in which electorate e was won by party p
+        self.wins = np.zeros((electorates, parties), "int64") if wins is None else wins
+
+    def __add__(self, other):
+        return SimulationResult(
+            self.engine,
+            self.draws + other.draws,
+            self.seats + other.seats,
+            self.wins + other.wins,
+        )
+
+    @classmethod
+    def from_outcome(cls, engine, outcome):
+        parties, electorates = len(engine.parties), len(engine.electorates)
+        seats = np.bincount(
+            (outcome.tally + np.arange(parties) * (electorates + 1)).ravel(),
+            minlength=parties * (electorates + 1),
+        ).reshape(parties, electorates + 1)
+        wins = np.bincount(
+            (outcome.winners + np.arange(electorates) * parties).ravel(),
+            minlength=electorates * parties,
+        ).reshape(electorates, parties)
+        return cls(engine, len(outcome.tally), seats, wins)
+
+    def seat_distribution(self):
+        """Share of draws in which each party won each number of seats."""
+        seats = pd.DataFrame(
+            self.seats.T / max(self.draws, 1), columns=self.engine.parties
+        ).rename_axis("seats")
+        return seats.loc[:, self.seats[:, 1:].any(axis=1)]
+
+    def win_probabilities(self):
+        """Share of draws in which each party won each electorate."""
+        wins = pd.DataFrame(
+            self.wins / max(self.draws, 1),
+            index=self.engine.electorates,
+            columns=self.engine.parties,
+        )
+        return wins.loc[:, wins.any()]
+
+    def summary(self, majority=None):
+        """Mean, 5th and 95th percentile of each party's seats."""
+        majority = majority or len(self.engine.electorates) // 2 + 1
+        seats = self.seat_distribution()
+        cdf = seats.cumsum()
+        return pd.DataFrame(
+            {
+                "mean": seats.mul(seats.index, axis=0).sum(),
+                "p5": (cdf >= 0.05).idxmax(),
+                "p95": (cdf >= 0.95).idxmax(),
+                "majority": seats.loc[majority:].sum(),
+            }
+        ).sort_values("mean", ascending=False)
+
+
+def draw_rates(engine, specs, n, rng):
+    rates = np.full((n, len(engine.pairs)), np.nan)
+    for spec in specs:
+        rates[:, engine.pairs.get_loc(spec.pair)] = spec.sample(rng, n)
+    return rates
+
+
+def run_chunk(engine, specs, draws, seed):
+    rng = np.random.default_rng(seed)
+    outcome = engine.evaluate(draw_rates(engine, specs, draws, rng))
+    return SimulationResult.from_outcome(engine, outcome)
+
+
+def chunks(draws, chunk_size, seed):
+    """(draws, seed) of each chunk of a run."""
+    sizes = [chunk_size] * (draws // chunk_size)
+    if draws % chunk_size:
+        sizes.append(draws % chunk_size)
+    return list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+
+
+_executors = {}
+
+
+def get_executor(workers):
+    """A process pool shared by every run in this process."""
+    if workers not in _executors:
+        # spawn rather than fork, as the dashboard runs inside a threaded server
+        _executors[workers] = ProcessPoolExecutor(
+            workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            # workers are given the parent's sys.path, which under panel serve
+            # lacks this module's directory once the app's script has run
+            initializer=site.addsitedir,
+            initargs=(str(Path(__file__).resolve().parent),),
+        )
+    return _executors[workers]
+
+
+def simulate_iter(engine, specs, draws, seed=0, workers=None, chunk_size=50_000):
+    """Yield the accumulated result each time a chunk of draws finishes."""
+    result = SimulationResult(engine)
+    if workers == 1:
+        for size, chunk_seed in chunks(draws, chunk_size, seed):
+            result += run_chunk(engine, specs, size, chunk_seed)
+            yield result
+        return
+
+    executor = get_executor(workers)
+    futures = [
+        executor.submit(run_chunk, engine, specs, size, chunk_seed)
+        for size, chunk_seed in chunks(draws, chunk_size, seed)
+    ]
+    for future in as_completed(futures):
+        result += future.result()
+        yield result
+
+
+async def simulate_async(engine, specs, draws, seed=0, workers=None, chunk_size=50_000):
+    """Like simulate_iter, without blocking the event loop while chunks run."""
+    loop = asyncio.get_running_loop()
+    # a single worker runs chunks on the loop's default thread pool
+    executor = None if workers == 1 else get_executor(workers)
+    futures = [
+        loop.run_in_executor(executor, run_chunk, engine, specs, size, chunk_seed)
+        for size, chunk_seed in chunks(draws, chunk_size, seed)
+    ]
+    result = SimulationResult(engine)
+    for future in asyncio.as_completed(futures):
+        result += await future
+        yield result
+
+
+def simulate(engine, specs, draws, seed=0, workers=None, chunk_size=50_000):
+    result = SimulationResult(engine)
+    for result in simulate_iter(engine, specs, draws, seed, workers, chunk_size):
+        pass
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        epilog="Without --rate, the observed Greens to ALP rate is used with "
+        "a standard deviation of 5%, or if no final count has that pair, the "
+        "observed rate from each party to its main recipient.",
+    )
+    parser.add_argument("--draws", type=int, default=1_000_000)
+    parser.add_argument(
+        "--rate",
+        action="append",
+        type=RateSpec.parse,
+        default=[],
+        help="from:to:kind:a:b where kind is one of " + ", ".join(DISTRIBUTIONS),
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, help="default: number of CPUs")
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--election", default=ELECTION)
+    parser.add_argument("--json", help="write seat and win probabilities here")
+    args = parser.parse_args()
+
+    engine = get_store(args.data_dir, args.election).recount
+    if args.rate:
+        specs = args.rate
+    else:
+        pairs = [GREENS_ALP]
+        if GREENS_ALP not in engine.pairs:
+            pairs = engine.default_pairs(exclude=[IND])
+        observed = engine.observed_rates
+        specs = [RateSpec(*pair, "normal", observed[pair], 0.05) for pair in pairs]
+    for spec in specs:
+        if spec.pair not in engine.pairs:
+            print(f"Skipping {spec.from_party} to {spec.to_party}: in no final count")
+    specs = [spec for spec in specs if spec.pair in engine.pairs]
+    if not specs:
+        parser.error("none of the rates are in a final count")
+
+    start = time.perf_counter()
+    result = simulate(
+        engine, specs, args.draws, args.seed, args.workers, args.chunk_size
+    )
+    elapsed = time.perf_counter() - start
+
+    print(f"{result.draws:,} draws in {elapsed:.1f} s")
+    for spec in specs:
+        print(
+            f"  {spec.from_party} to {spec.to_party}: {spec.kind}({spec.a}, {spec.b})"
+        )
+    print()
+    print(result.summary().round(3).to_string())
+
+    wins = result.win_probabilities()
+    uncertain = wins[wins.max(axis=1) < 0.99]
+    if not uncertain.empty:
+        print()
+        print("Electorates without a near-certain winner:")
+        print(uncertain.round(3).to_string())
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "draws": result.draws,
+                    "seed": args.seed,
+                    "rates": [asdict(spec) for spec in specs],
+                    "seats": result.seat_distribution().to_dict(),
+                    "wins": wins.to_dict(orient="index"),
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import holoviews as hv
+import panel as pn
+import param
+
+from consts import colours
+from perf import timed_callback
+from simulate import RateSpec, SimulationResult, simulate_async
+from utils import hide_hook
+
+intro_txt = """
+ Preference flows are never certain. Choose a range for each preference flow below and run a simulation: the flows are drawn at random from normal distributions with the given mean and spread, and the final count of every electorate is recounted for each draw.
+
+ The chart shows how often each party won each number of seats, and the table lists the electorates whose winner depends on the flows. Both update while the simulation runs.
+ """
+
+
+class SimulationPrefExplorer(pn.viewable.Viewer):
+    draws = param.Selector(
+        objects={"10,000": 10_000, "100,000": 100_000, "1,000,000": 1_000_000},
+        default=100_000,
+        label="Number of draws",
+    )
+    seed = param.Integer(default=0, label="Random seed")
+    result = param.ClassSelector(class_=SimulationResult)
+    running = param.Boolean(default=False)
+
+    def __init__(self, engine, electorates, pairs, workers=None, **params):
+        super().__init__(**params)
+        self.workers = workers
+        self.engine = None
+        self.rates = {}
+        self.rate_column = pn.Column()
+
+        self.run_button = pn.widgets.Button(
+            name="Run simulation", button_type="primary"
+        )
+        self.run_button.on_click(self.run)
+        self.progress = pn.indicators.Progress(
+            value=0, max=100, sizing_mode="stretch_width"
+        )
+        self.load(engine, electorates, pairs)
+        self.intro = pn.pane.Markdown(intro_txt)
+
+    def load(self, engine, electorates, pairs):
+        """Simulate another election, or the new counts of a live one.
+
+        The flows chosen for pairs still offered are kept, with a mean left at
+        the observed rate following the new one. The last result is kept if
+        it is of the same electorates and parties.
+        """
+        old, self.engine, self.electorates = self.engine, engine, electorates
+        observed = engine.observed_rates
+        was = old.observed_rates if old is not None else None
+        rates = {}
+        for pair in pairs:
+            if pair in self.rates:
+                rates[pair] = self.rates[pair]
+                mean = rates[pair][1]
+                if mean.value == round(was[pair] * 100, 1):
+                    mean.value = round(observed[pair] * 100, 1)
+            else:
+                rates[pair] = (
+                    pn.widgets.Checkbox(
+                        name=f"{pair[0]} to {pair[1]}",
+                        value=pair == ("The Greens", "ALP"),
+                    ),
+                    pn.widgets.FloatSlider(
+                        name="mean %",
+                        start=0,
+                        end=100,
+                        step=0.5,
+                        value=round(observed[pair] * 100, 1),
+                    ),
+                    pn.widgets.FloatSlider(
+                        name="sd %", start=0, end=20, step=0.5, value=5
+                    ),
+                )
+        self.rates = rates
+        self.rate_column.objects = [pn.Column(*widgets) for widgets in rates.values()]
+        if old is None or not self.same_seats(old, engine):
+            self.result = SimulationResult(engine)
+
+    @staticmethod
+    def same_seats(a, b):
+        """Whether two engines recount the same electorates and parties."""
+        return a.electorates.equals(b.electorates) and a.parties.equals(b.parties)
+
+    def specs(self):
+        return [
+            RateSpec(*pair, "normal", mean.value / 100, sd.value / 100)
+            for pair, (enabled, mean, sd) in self.rates.items()
+            if enabled.value
+        ]
+
+    async def run(self, event=None):
+        if self.running:
+            return
+        self.running = True
+        self.run_button.disabled = True
+        self.progress.value = 0
+        engine = self.engine
+        try:
+            async for result in simulate_async(
+                engine, self.specs(), self.draws, self.seed, self.workers
+            ):
+                # a run carries on through a live count's updates, but not
+                # into another election
+                if not self.same_seats(engine, self.engine):
+                    break
+                self.result = result
+                self.progress.value = int(result.draws / self.draws * 100)
+        finally:
+            self.running = False
+            self.run_button.disabled = False
+
+    @pn.depends("result")
+    @timed_callback
+    def seat_histograms(self):
+        seats = self.result.seat_distribution()
+        # only parties whose number of seats varies between draws
+        seats = seats.loc[:, (seats > 0).sum() > 1]
+        if seats.empty:
+            return pn.pane.Markdown("Run a simulation to see the seats won.")
+
+        bars = []
+        for party in seats:
+            won = seats[party][seats[party] > 0]
+            bars.append(
+                hv.Bars(
+                    (won.index.astype(str), won.to_numpy()),
+                    hv.Dimension("seats", label=f"{party} seats"),
+                    hv.Dimension("share", label="Share of draws"),
+                ).opts(
+                    color=colours.get(party, "grey"),
+                    yformatter="%.2f",
+                    title=party,
+                    toolbar=None,
+                    hooks=[hide_hook],
+                    tools=["hover"],
+                    height=250,
+                    width=400,
+                )
+            )
+        return hv.Layout(bars).cols(2).opts(title=f"{self.result.draws:,} draws")
+
+    @pn.depends("result")
+    @timed_callback
+    def summary_table(self):
+        if not self.result.draws:
+            return pn.Spacer()
+        summary = self.result.summary().rename(
+            columns={
+                "mean": "Mean seats",
+                "p5": "5th pct.",
+                "p95": "95th pct.",
+                "majority": "P(majority)",
+            }
+        )
+        return pn.pane.DataFrame(summary.round(3), sizing_mode="stretch_width")
+
+    @pn.depends("result")
+    @timed_callback
+    def uncertain_seats(self):
+        if not self.result.draws:
+            return pn.Spacer()
+        wins = self.result.win_probabilities()
+        wins = wins[wins.max(axis=1) < 0.99]
+        if wins.empty:
+            return pn.pane.Markdown("Every electorate has a near-certain winner.")
+        wins = wins.loc[:, wins.any()].rename(index=self.electorates)
+        wins.index.name = "Electorate"
+        return pn.pane.DataFrame(wins.round(3), sizing_mode="stretch_width")
+
+    def __panel__(self):
+        view = pn.GridSpec(sizing_mode="stretch_both", max_width=1600)
+        view[:, 0:4] = pn.Column(
+            self.intro,
+            pn.Spacer(height=30),
+            self.rate_column,
+            self.param.draws,
+            self.param.seed,
+            self.run_button,
+            self.progress,
+        )
+        view[:, 4] = pn.Spacer()
+        view[:, 5:15] = pn.Column(
+            self.seat_histograms,
+            self.summary_table,
+            self.uncertain_seats,
+            sizing_mode="stretch_width",
+        )
+        return view
@@ -0,0 +1,183 @@
+import holoviews as hv
+import numpy as np
+import pandas as pd
+import panel as pn
+import param
+from bokeh.models import ColumnDataSource, FactorRange, HoverTool, Span
+from bokeh.plotting import figure
+
+from consts import colours
+from perf import timed_callback
+from utils import hide_hook
+
+intro_txt = """
+ Choose two parties, and use the slider to swing the vote between them by the same number of points in every electorate where they were the last two candidates standing.
+
+ A seat changes hands once the swing is larger than its margin, the winner's share of the final two-candidate count less 50%. Swings to the first party are positive, and to the second negative.
+
+ The pendulum on the right shows the swing each seat needs to change hands, with the line at the current swing: the seats it crosses change hands.
+ """
+
+
+class SwingPrefExplorer(pn.viewable.Viewer):
+    pair = param.Selector(label="Two-candidate contest")
+    swing = param.Number(
+        default=0.0, bounds=(-25.0, 25.0), step=0.1, label="Swing (points)"
+    )
+    tally = param.Series(doc="Seats won by each party after the swing.")
+    changed = param.DataFrame(doc="Electorates that change hands.")
+
+    def __init__(self, pendulum, party_tally, electorates, **params):
+        super().__init__(**params)
+        # the pendulum's bars, recoloured in place as the slider moves
+        self.source = ColumnDataSource()
+        self.line = Span(location=0, dimension="height", line_dash="dashed")
+        self.pendulum_figure = pn.pane.Bokeh(self.pendulum_plot())
+        self.load(pendulum, party_tally, electorates)
+
+        self.intro = pn.pane.Markdown(intro_txt)
+
+    def load(self, pendulum, party_tally, electorates):
+        """Swing another election, or the new counts of a live one, keeping
+        the contest (where it is still offered) and the swing."""
+        self.pendulum = pendulum
+        self.party_tally = party_tally
+        self.electorates = electorates
+        self._flipped = None
+
+        self.param.pair.objects = {f"{a} v {b}": (a, b) for a, b in pendulum.pairs}
+        with param.discard_events(self):
+            if self.pair not in pendulum.pairs:
+                self.pair = pendulum.pairs[0]
+        self.pair_changed()
+
+    @pn.depends("swing", watch=True)
+    @timed_callback
+    def swing_changed(self):
+        self.line.location = self.swing
+        flipped = self.pendulum.flipped(self.pair, self.swing)
+        # most moves of the slider change no seats, and redraw nothing else
+        key = (self.pair, self.swing > 0, len(flipped))
+        if key == self._flipped:
+            return
+        self._flipped = key
+
+        tally = self.pendulum.tally(self.party_tally, self.pair, self.swing)
+        self.tally = tally.rename("Swing")
+        seats = self.pendulum.seats.loc[flipped]
+        self.changed = pd.DataFrame(
+            {
+                "Electorate": [self.electorates.get(e, e) for e in flipped],
+                "Margin %": seats["margin"].round(2).to_numpy(),
+                "Actual": seats["holder"].to_numpy(),
+                "After swing": seats["challenger"].to_numpy(),
+            }
+        )
+        colour = self.bar_colours()
+        changed = np.flatnonzero(colour != np.asarray(self.source.data["colour"]))
+        if changed.size:
+            patches = list(zip(changed.tolist(), colour[changed].tolist()))
+            self.source.patch({"colour": patches})
+
+    @pn.depends("pair", watch=True)
+    def pair_changed(self):
+        """Draw the new contest's seats, and swing them as far as before."""
+        seats = self.pendulum.contest(self.pair)
+        names = [self.electorates.get(e, e) for e in seats.index]
+        self._seats = seats
+        self.source.data = {
+            "electorate": names,
+            "swing": seats["swing"].to_numpy(),
+            "margin": seats["margin"].to_numpy(),
+            "holder": seats["holder"].to_numpy(),
+            "colour": self.bar_colours(),
+        }
+        plot = self.pendulum_figure.object
+        plot.y_range.factors = names
+        plot.height = 60 + 14 * len(names)
+        plot.xaxis.axis_label = f"Swing to {self.pair[0]} (points)"
+        self.swing_changed()
+
+    def bar_colours(self):
+        """Colour of each seat's bar: its party after the swing."""
+        seats = self._seats
+        needed = seats["swing"].to_numpy()
+        # a seat left tied by the swing is kept, as in Pendulum.flipped
+        flipped = ((0 < needed) & (needed < self.swing)) | (
+            (self.swing < needed) & (needed < 0)
+        )
+        party = np.where(flipped, seats["challenger"], seats["holder"])
+        return np.array([colours.get(p, "grey") for p in party], dtype=object)
+
+    def pendulum_plot(self):
+        plot = figure(
+            y_range=FactorRange(),
+            title="Swing needed to change hands",
+            toolbar_location=None,
+            tools=[
+                HoverTool(
+                    tooltips=[
+                        ("Electorate", "@electorate"),
+                        ("Held by", "@holder"),
+                        ("Margin", "@margin{0.00}%"),
+                    ]
+                )
+            ],
+            sizing_mode="stretch_width",
+        )
+        plot.hbar(
+            y="electorate",
+            right="swing",
+            height=0.8,
+            color="colour",
+            source=self.source,
+        )
+        plot.add_layout(self.line)
+        plot.yaxis.major_label_text_font_size = "9px"
+        plot.ygrid.visible = False
+        plot.border_fill_color = None
+        plot.outline_line_color = None
+        return plot
+
+    @pn.depends("tally")
+    @timed_callback
+    def tally_bars(self):
+        tally = pd.concat([self.party_tally, self.tally], axis=1).fillna(0)
+        tally = tally.rename_axis("party").reset_index()
+        tally = tally.melt("party", var_name="result", value_name="seats")
+        return hv.Bars(tally, ["party", "result"], ["seats"]).opts(
+            invert_axes=True,
+            color="party",
+            cmap=colours,
+            xaxis=None,
+            xlabel="",
+            show_legend=False,
+            default_tools=[],
+            tools=["hover"],
+            toolbar=None,
+            title="Total seats won",
+            hooks=[hide_hook],
+            height=300,
+        )
+
+    @pn.depends("changed")
+    @timed_callback
+    def changed_seats(self):
+        if self.changed.empty:
+            return pn.pane.Markdown("No seats change hands.")
+        return pn.pane.DataFrame(self.changed, index=False, sizing_mode="stretch_width")
+
+    def __panel__(self):
+        view = pn.GridSpec(sizing_mode="stretch_both", max_width=1600)
+        view[:, 0:4] = pn.Column(
+            self.intro,
+            pn.Spacer(height=30),
+            self.param.pair,
+            self.param.swing,
+            self.changed_seats,
+        )
+        view[:, 4] = pn.Spacer()
+        view[:, 5:15] = pn.Column(
+            self.tally_bars, self.pendulum_figure, sizing_mode="stretch_width"
+        )
+        return view
@@ -0,0 +1,237 @@
+"""Generate synthetic elections with the same schema as the real data.
+
+Each electorate gets a number of candidates from a mix of parties, first
+preference votes drawn around each party's strength, and a full count in
+which the candidate with the fewest votes is excluded and their votes passed
+on, following party-to-party preference flows, until two candidates remain.
+The tables are written as <election>_distributions.parq, _first_prefs.parq
+and _final_tally.parq, with an electorates.json naming the electorates.
+
+    python synthetic.py --seats 151 --candidates 7 --parties 12 --elections 3
+    panel serve app.py --args --data-dir synthetic --election synthetic_1
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from consts import IND, colours, other_colours
+
+# parties in the order they are added, with their relative strength and
+# their position from left (-1) to right (1)
+PARTIES = {
+    "ALP": (1.0, -0.4),
+    "LNP": (1.0, 0.5),
+    "The Greens": (0.35, -0.9),
+    "One Nation": (0.2, 0.9),
+    "KAP": (0.1, 0.7),
+    "Family First": (0.05, 0.8),
+    "LCQP": (0.05, 0.6),
+    "Animal Justice Party": (0.03, -0.7),
+    "Libertarians": (0.03, 0.6),
+}
+# the major parties contest every seat
+MAJORS = ["ALP", "LNP"]
+MIN_VOTES = 100
+
+
+def make_parties(parties, rng):
+    """Strength and position of the first `parties` parties, made up past the
+    real ones, and of independents."""
+    made = dict(list(PARTIES.items())[:parties])
+    for i in range(len(made), parties):
+        made[f"Party {i + 1}"] = (0.03, rng.uniform(-1, 1))
+    made[IND] = (0.1, 0.0)
+    return made
+
+
+def preference_flows(parties, rng):
+    """Relative share of each party's preferences that goes to each other party.
+
+    Preferences mostly go to the parties closest to the one excluded.
+    """
+    position = np.array([p for _, p in parties.values()])
+    distance = np.abs(position[:, None] - position[None, :])
+    return pd.DataFrame(
+        np.exp(-3 * distance) * rng.gamma(4.0, 0.25, distance.shape),
+        index=list(parties),
+        columns=list(parties),
+    )
+
+
+def electorates(seats):
+    """Stub and name of each electorate, as in electorates.json."""
+    return [
+        {"stub": f"seat-{i + 1:03d}", "electorateName": f"Seat {i + 1}"}
+        for i in range(seats)
+    ]
+
+
+def count(candidates, votes, flows, rng):
+    """Distribution rows of a full count of one electorate."""
+    votes = votes.copy()
+    remaining = list(range(len(candidates)))
+    rows = []
+    for exclusion in range(1, len(candidates) - 1):
+        excluded = min(remaining, key=lambda c: votes[c])
+        remaining.remove(excluded)
+        from_party = candidates[excluded]["party"]
+        shares = np.array(
+            [flows.loc[from_party, candidates[c]["party"]] for c in remaining]
+        )
+        preferences = rng.multinomial(votes[excluded], shares / shares.sum())
+        for c, prefs in zip(remaining, preferences):
+            votes[c] += prefs
+            rows.append(
+                {
+                    "toCandidate": candidates[c]["candidate"],
+                    "toBallotOrder": candidates[c]["ballotOrder"],
+                    "toParty": candidates[c]["party"],
+                    "preferences": prefs,
+                    "toRunningTotal": votes[c],
+                    "exclusion": exclusion,
+                    "fromCandidate": candidates[excluded]["candidate"],
+                    "fromParty": from_party,
+                    "fromBallotOrder": candidates[excluded]["ballotOrder"],
+                    "votesDistributed": votes[excluded],
+                }
+            )
+        votes[excluded] = 0
+    return rows, [(c, votes[c]) for c in remaining]
+
+
+def generate(seats, candidates, parties, seed=0, enrolment=35_000):
+    """The distribution, first preference and final tally tables of an election."""
+    rng = np.random.default_rng(seed)
+    parties = make_parties(parties, rng)
+    strengths = {party: strength for party, (strength, _) in parties.items()}
+    minors = [p for p in strengths if p not in MAJORS]
+    flows = preference_flows(parties, rng)
+    party_colours = {
+        p: colours.get(p, other_colours[i % len(other_colours)])
+        for i, p in enumerate(strengths)
+    }
+
+    distribution, first_prefs, final_tally = [], [], []
+    for seat in electorates(seats):
+        electorate = seat["stub"]
+        # the majors, plus minor parties and independents for the rest
+        size = max(3, candidates + int(rng.integers(-1, 2)))
+        weights = np.array([strengths[p] for p in minors])
+        others = rng.choice(
+            minors, size - len(MAJORS), replace=True, p=weights / weights.sum()
+        )
+        # only independents can stand more than once in an electorate
+        seen, extra = set(), []
+        for party in others:
+            extra.append(party if party == IND or party not in seen else IND)
+            seen.add(party)
+        seat_parties = list(rng.permutation(MAJORS + extra))
+
+        shares = rng.dirichlet([strengths[p] * 20 for p in seat_parties])
+        # every candidate gets some votes, as they do in real counts
+        votes = MIN_VOTES + rng.multinomial(
+            int(enrolment * rng.uniform(0.8, 1.2)) - MIN_VOTES * len(shares), shares
+        )
+        seat_candidates = [
+            {
+                "candidate": f"CANDIDATE {order}, {party}",
+                "ballotOrder": order,
+                "party": party,
+            }
+            for order, party in enumerate(seat_parties, start=1)
+        ]
+        for candidate, n in zip(seat_candidates, votes):
+            first_prefs.append(
+                {
+                    **candidate,
+                    "count": n,
+                    "colour": party_colours[candidate["party"]],
+                    "electorate": electorate,
+                }
+            )
+
+        rows, finalists = count(seat_candidates, votes, flows, rng)
+        distribution += [{**row, "electorate": electorate} for row in rows]
+        total = sum(v for _, v in finalists)
+        for c, v in finalists:
+            final_tally.append(
+                {
+                    "electorate": electorate,
+                    **seat_candidates[c],
+                    "count": v,
+                    "percentage": f"{v / total * 100:.2f}%",
+                    "colour": party_colours[seat_candidates[c]["party"]],
+                }
+            )
+
+    party = pd.CategoricalDtype([IND, *sorted(p for p in strengths if p != IND)])
+    types = {
+        "toBallotOrder": "uint8",
+        "fromBallotOrder": "uint8",
+        "ballotOrder": "uint8",
+        "exclusion": "uint8",
+        "preferences": "int32",
+        "toRunningTotal": "int32",
+        "votesDistributed": "int32",
+        "count": "int32",
+        "toParty": party,
+        "fromParty": party,
+        "party": party,
+        "colour": "category",
+    }
+
+    def frame(rows, index=None):
+        frame = pd.DataFrame(rows)
+        frame = frame.astype({k: v for k, v in types.items() if k in frame})
+        return frame.set_index(index) if index else frame
+
+    return (
+        frame(distribution, "electorate"),
+        frame(first_prefs, "electorate"),
+        frame(final_tally),
+    )
+
+
+def write_electorates(data_dir, seats):
+    with open(Path(data_dir) / "electorates.json", "w") as f:
+        json.dump(electorates(seats), f)
+
+
+def write(data_dir, election, tables):
+    data_dir = Path(data_dir)
+    distribution, first_prefs, final_tally = tables
+    distribution.to_parquet(data_dir / f"{election}_distributions.parq")
+    first_prefs.to_parquet(data_dir / f"{election}_first_prefs.parq")
+    final_tally.to_parquet(data_dir / f"{election}_final_tally.parq", index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seats", type=int, default=151)
+    parser.add_argument("--candidates", type=int, default=7, help="per seat, ±1")
+    parser.add_argument("--parties", type=int, default=9, help="besides independents")
+    parser.add_argument("--elections", type=int, default=1)
+    parser.add_argument("--name", default="synthetic", help="elections' name prefix")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default="synthetic")
+    args = parser.parse_args()
+
+    data_dir = Path(args.data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    write_electorates(data_dir, args.seats)
+
+    seeds = np.random.SeedSequence(args.seed).spawn(args.elections)
+    for i, seed in enumerate(seeds, start=1):
+        election = f"{args.name}_{i}"
+        tables = generate(args.seats, args.candidates, args.parties, seed)
+        write(data_dir, election, tables)
+        rows = ", ".join(f"{len(t):,}" for t in tables)
+        print(f"Wrote {election} to {data_dir} ({rows} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""The /api routes' ETags, before and after the store they serve refreshes."""
+
+import asyncio
+import os
+import shutil
+
+import pandas as pd
+import pytest
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+from tornado.httpserver import HTTPServer
+from tornado.testing import bind_unused_port
+from tornado.web import Application
+
+import api
+from data_store import get_store
+
+ELECTION = "qld_2024"
+PATHS = [
+    "/api/flows",
+    "/api/greens?pct=50",
+    "/api/electorates/algester",
+    "/api/electorates/aspley",
+    "/api/electorates?electorate=algester&electorate=aspley",
+]
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    for table in ["distributions", "first_prefs", "final_tally"]:
+        shutil.copy(f"data/{ELECTION}_{table}.parq", tmp_path)
+    shutil.copy("data/electorates.json", tmp_path)
+    monkeypatch.setattr(api, "data_dir", tmp_path)
+    return tmp_path
+
+
+def fetch_all(requests):
+    """The (status, ETag) of each (path, If-None-Match) request to the API."""
+
+    async def main():
+        sock, port = bind_unused_port()
+        server = HTTPServer(Application(api.ROUTES))
+        server.add_sockets([sock])
+        client = AsyncHTTPClient()
+        responses = []
+        for path, etag in requests:
+            headers = {"If-None-Match": etag} if etag else {}
+            try:
+                response = await client.fetch(
+                    f"http://127.0.0.1:{port}{path}", headers=headers
+                )
+            except HTTPClientError as e:
+                response = e.response
+            responses.append((response.code, response.headers.get("Etag")))
+        server.stop()
+        return responses
+
+    return asyncio.run(main())
+
+
+def etags(paths):
+    return [etag for _, etag in fetch_all([(path, None) for path in paths])]
+
+
+def test_not_modified(data_dir):
+    before = etags(PATHS)
+    responses = fetch_all(list(zip(PATHS, before)))
+    assert responses == [(304, etag) for etag in before]
+    # another ETag gets the body
+    assert [code for code, _ in fetch_all([(PATHS[0], '"other"')])] == [200]
+
+
+def test_refresh(data_dir):
+    before = etags(PATHS)
+
+    path = data_dir / f"{ELECTION}_distributions.parq"
+    distribution = pd.read_parquet(path)
+    distribution.loc["algester", "preferences"] += 1
+    distribution.to_parquet(path)
+    mtime = path.stat().st_mtime + 10
+    os.utime(path, (mtime, mtime))
+    assert get_store(data_dir, ELECTION).refresh() == {"algester"}
+
+    after = etags(PATHS)
+    changed = [path for path, a, b in zip(PATHS, before, after) if a != b]
+    # aspley's entry is kept; the flows, summed over every electorate, change
+    assert "/api/electorates/aspley" not in changed
+    assert "/api/electorates/algester" in changed
+    assert "/api/flows" in changed
+    assert PATHS[-1] in changed
+    responses = fetch_all(list(zip(PATHS, before)))
+    assert [code for code, _ in responses] == [
+        200 if path in changed else 304 for path in PATHS
+    ]
@@ -0,0 +1,48 @@
+"""LRUCache's eviction order, and values built while entries are discarded."""
+
+import threading
+
+from cache import LRUCache
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(maxsize=3)
+    for key in "abc":
+        cache.get(key, lambda key=key: key.upper())
+    # a hit makes "a" the most recently used
+    assert cache.get("a", lambda: "rebuilt") == "A"
+    cache.get("d", lambda: "D")
+    assert [key for key in "abcd" if key in cache] == ["a", "c", "d"]
+    cache.get("e", lambda: "E")
+    assert [key for key in "abcde" if key in cache] == ["a", "d", "e"]
+    assert cache.stats() == {"size": 3, "maxsize": 3, "hits": 1, "misses": 5}
+
+
+def test_discard():
+    cache = LRUCache()
+    for key in [("x", 1), ("x", 2), ("y", 1)]:
+        cache.get(key, lambda: 0)
+    cache.discard(lambda key: key[1] == 1)
+    assert len(cache) == 1 and ("x", 2) in cache
+
+
+def test_build_during_discard():
+    cache = LRUCache()
+    building, discarded = threading.Event(), threading.Event()
+
+    def build():
+        # the data changes, and the cache is told, while this is built
+        building.set()
+        discarded.wait()
+        return "stale"
+
+    thread = threading.Thread(target=lambda: cache.get("key", build))
+    thread.start()
+    building.wait()
+    cache.discard(lambda key: key == "key")
+    discarded.set()
+    thread.join()
+    assert "key" not in cache
+    # the next get builds it again, and keeps it
+    assert cache.get("key", lambda: "fresh") == "fresh"
+    assert cache.get("key", lambda: "rebuilt") == "fresh"
@@ -0,0 +1,64 @@
+"""ElectionIndex lookups against filtering the tables by electorate."""
+
+import pandas as pd
+import pytest
+
+from election_index import ElectionIndex
+
+
+@pytest.fixture(scope="module")
+def tables():
+    return (
+        pd.read_parquet("data/qld_2024_distributions.parq"),
+        pd.read_parquet("data/qld_2024_first_prefs.parq"),
+    )
+
+
+def categorical(frame, categories):
+    index = pd.CategoricalIndex(frame.index, categories, name="electorate")
+    return frame.set_axis(index)
+
+
+@pytest.mark.parametrize("index", ["object", "unsorted", "categorical"])
+def test_lookups(tables, index):
+    distribution, first_pref = tables
+    if index == "unsorted":
+        distribution, first_pref = distribution.iloc[::-1], first_pref.iloc[::-1]
+    elif index == "categorical":
+        # categories in an order of their own, in one table only
+        categories = sorted(first_pref.index.unique(), key=lambda e: e[::-1])
+        distribution = categorical(distribution, categories).iloc[::-1]
+    election = ElectionIndex(distribution, first_pref)
+
+    for electorate in election.electorates:
+        seat = distribution[distribution.index == electorate]
+        rows = election.seat(electorate)
+        assert (rows.index == electorate).all()
+        assert sorted(rows["toCandidate"]) == sorted(seat["toCandidate"])
+        assert list(rows["exclusion"]) == sorted(seat["exclusion"])
+        candidates = election.candidates(electorate)
+        assert (candidates.index == electorate).all()
+        assert len(candidates) == (first_pref.index == electorate).sum()
+        for exclusion, rows in election.exclusions(electorate):
+            assert (rows["exclusion"] == exclusion).all()
+            assert len(rows) == (seat["exclusion"] == exclusion).sum()
+
+    final = election.final_rows()
+    last = distribution.groupby(level=0, observed=True)["exclusion"].transform("max")
+    assert len(final) == (distribution["exclusion"] == last).sum()
+
+
+def test_presorted(tables):
+    election = ElectionIndex(*tables)
+    presorted = ElectionIndex(
+        election.distribution, election.first_pref, presorted=True
+    )
+    # used as they are, rather than sorted into copies
+    assert presorted.distribution is election.distribution
+    assert presorted.first_pref is election.first_pref
+    assert presorted.electorates.equals(election.electorates)
+    for electorate in election.electorates:
+        assert presorted.seat(electorate).equals(election.seat(electorate))
+
+    with pytest.raises(ValueError):
+        ElectionIndex(tables[0].iloc[::-1], tables[1], presorted=True)
@@ -0,0 +1,113 @@
+"""GreensFlips against a reference that recounts one seat and position at a time."""
+
+import pandas as pd
+import pytest
+
+import synthetic
+from data_store import DataStore
+
+
+def decided(distribution):
+    """Final count rows of the seats the Greens' preferences decided, by seat."""
+    seats = {}
+    for electorate, rows in distribution.groupby(level=0, sort=False):
+        final = rows[rows["exclusion"] == rows["exclusion"].max()]
+        orig = (final["toRunningTotal"] - final["preferences"]).to_list()
+        if (
+            final["fromParty"].iloc[0] == "The Greens"
+            and "ALP" in final["toParty"].to_list()
+            and len(final) == 2
+            and final["votesDistributed"].iloc[0] >= max(orig) - min(orig)
+        ):
+            seats[electorate] = final
+    return seats
+
+
+def recount(final, pct):
+    """The final count's running totals with pct% of the Greens' votes to the ALP."""
+    votes = int(final["votesDistributed"].iloc[0])
+    alp = int(votes * (pct / 100))
+    totals = []
+    for party, total, prefs in zip(
+        final["toParty"], final["toRunningTotal"], final["preferences"]
+    ):
+        totals.append(
+            int(total) - int(prefs) + (alp if party == "ALP" else votes - alp)
+        )
+    return totals
+
+
+def winner(final, totals):
+    # ties go to the candidate listed first
+    return str(final["toParty"].iloc[totals.index(max(totals))])
+
+
+def tally(party_tally, seats, pct):
+    counts = {str(p): int(n) for p, n in party_tally.items()}
+    for final in seats.values():
+        counts[winner(final, final["toRunningTotal"].to_list())] -= 1
+        party = winner(final, recount(final, pct))
+        counts[party] = counts.get(party, 0) + 1
+    return {p: n for p, n in counts.items() if n}
+
+
+@pytest.fixture(
+    scope="module",
+    params=[("qld_2024", None), (5, 0), (5, 1), (2, 0)],
+    ids=["qld_2024", "synthetic", "synthetic-2", "two-parties"],
+)
+def store(request, tmp_path_factory):
+    election, seed = request.param
+    if seed is None:
+        return DataStore("data", election, bundle=False)
+    # elections with many Greens-decided seats, and (with two parties) none
+    data_dir = tmp_path_factory.mktemp("synthetic")
+    synthetic.write_electorates(data_dir, 60)
+    synthetic.write(data_dir, "synthetic_1", synthetic.generate(60, 5, election, seed))
+    return DataStore(data_dir, "synthetic_1", bundle=False)
+
+
+@pytest.fixture(scope="module")
+def seats(store):
+    return decided(store.index.distribution)
+
+
+def test_decided_seats(store, seats):
+    flips = store.greens_flips
+    assert [e for e, _ in flips.greens_third] == list(seats)
+    assert flips.breakpoints.index.sort_values().to_list() == sorted(seats)
+
+
+def test_actual_pref(store, seats):
+    alp = [final[final["toParty"] == "ALP"] for final in seats.values()]
+    if not alp:
+        assert store.greens_flips.actual_pref is None
+        return
+    alp = pd.concat(alp)
+    expected = int(alp["preferences"].sum() / alp["votesDistributed"].sum() * 100)
+    assert store.greens_flips.actual_pref == expected
+
+
+def test_tally(store, seats):
+    flips = store.greens_flips
+    for pct in range(101):
+        actual = {str(p): int(n) for p, n in flips.tally(pct).items() if n}
+        assert actual == tally(store.actual_party_tally, seats, pct), pct
+
+
+def test_running_totals(store, seats):
+    flips = store.greens_flips
+    for pct in range(0, 101, 5):
+        rows = flips.rows_at(pct)
+        for electorate, final in seats.items():
+            totals = rows.loc[[electorate], "toRunningTotal"].to_list()
+            assert totals == recount(final, pct), (electorate, pct)
+
+
+def test_breakpoints(store, seats):
+    breakpoints = store.greens_flips.breakpoints
+    for electorate, final in seats.items():
+        alp_wins = [
+            pct for pct in range(101) if winner(final, recount(final, pct)) == "ALP"
+        ]
+        assert breakpoints.loc[electorate, "pct"] == min(alp_wins, default=101)
@@ -0,0 +1,167 @@
+"""ingest against the tables of qld_2024, written out as source files."""
+
+import json
+import shutil
+
+import pandas as pd
+import pytest
+
+import ingest
+
+ELECTION = "qld_2024"
+
+
+def tables(data_dir):
+    return {
+        table: pd.read_parquet(ingest.table_path(data_dir, ELECTION, table))
+        for table in ingest.SCHEMA
+    }
+
+
+def sources(data_dir, source_dir):
+    """Write each electorate of the tables in data_dir as a source file."""
+    distribution, first_prefs, final_tally = tables(data_dir).values()
+    with open(data_dir / "electorates.json") as f:
+        names = {e["stub"]: e["electorateName"] for e in json.load(f)}
+    source_dir.mkdir()
+    for stub in first_prefs.index.unique():
+        source = {
+            "stub": stub,
+            "electorateName": names[stub],
+            "candidates": [
+                {
+                    "ballotName": c.candidate,
+                    "ballotOrderNumber": int(c.ballotOrder),
+                    "partyCode": str(c.party),
+                    "primaryVotes": int(c.count),
+                    "colour": str(c.colour),
+                }
+                for c in first_prefs.loc[[stub]].itertuples()
+            ],
+            "distributions": [
+                {
+                    "exclusion": int(exclusion),
+                    "excludedBallotOrderNumber": int(rows["fromBallotOrder"].iloc[0]),
+                    "votesDistributed": int(rows["votesDistributed"].iloc[0]),
+                    "transfers": [
+                        {
+                            "ballotOrderNumber": int(t.toBallotOrder),
+                            "preferences": int(t.preferences),
+                            "runningTotal": int(t.toRunningTotal),
+                        }
+                        for t in rows.itertuples()
+                    ],
+                }
+                for exclusion, rows in distribution[distribution.index == stub].groupby(
+                    "exclusion"
+                )
+            ],
+            "finalCount": [
+                {"ballotOrderNumber": int(c.ballotOrder), "count": int(c.count)}
+                for c in final_tally[final_tally["electorate"] == stub].itertuples()
+            ],
+        }
+        with open(source_dir / f"{stub}.json", "w") as f:
+            json.dump(source, f)
+
+
+def in_order(table, frame):
+    if table in ingest.INDEXED:
+        return frame.sort_index(kind="stable")
+    return frame.sort_values("electorate", kind="stable", ignore_index=True)
+
+
+@pytest.fixture(scope="module")
+def original(tmp_path_factory):
+    data_dir = tmp_path_factory.mktemp("original")
+    for table in ingest.SCHEMA:
+        shutil.copy(ingest.table_path("data", ELECTION, table), data_dir)
+    shutil.copy("data/electorates.json", data_dir)
+    return data_dir
+
+
+@pytest.fixture(scope="module")
+def source_dir(original, tmp_path_factory):
+    source_dir = tmp_path_factory.mktemp("sources") / ELECTION
+    sources(original, source_dir)
+    return source_dir
+
+
+def test_round_trip(original, source_dir, tmp_path):
+    redone = ingest.ingest(source_dir, tmp_path, ELECTION, workers=1)
+    expected = tables(original)
+    assert redone == set(expected["first_prefs"].index)
+    for table, frame in tables(tmp_path).items():
+        pd.testing.assert_frame_equal(
+            frame, in_order(table, expected[table]), check_categorical=False
+        )
+
+
+def test_party_order(original, source_dir, tmp_path):
+    # converted over the tables, as they were first converted
+    data_dir = tmp_path / "data"
+    shutil.copytree(original, data_dir)
+    ingest.ingest(source_dir, data_dir, ELECTION, workers=1)
+    expected = tables(original)
+    converted = tables(data_dir)
+    for table in ["distributions", "first_prefs"]:
+        pd.testing.assert_frame_equal(
+            converted[table], in_order(table, expected[table])
+        )
+    # final_tally's dtype lists every party, in the tables' order
+    final_tally = converted["final_tally"]
+    pd.testing.assert_frame_equal(
+        final_tally,
+        in_order("final_tally", expected["final_tally"]),
+        check_categorical=False,
+    )
+    parties = final_tally["party"].cat.categories.to_list()
+    assert parties == ingest.existing_parties(original, ELECTION)
+
+
+def test_one_changed(source_dir, tmp_path):
+    data_dir, changed = tmp_path / "data", tmp_path / "sources"
+    shutil.copytree(source_dir, changed)
+    ingest.ingest(changed, data_dir, ELECTION, workers=1)
+    before = tables(data_dir)
+    assert ingest.ingest(changed, data_dir, ELECTION, workers=1) == set()
+
+    path = changed / "algester.json"
+    with open(path) as f:
+        source = json.load(f)
+    source["candidates"][0]["primaryVotes"] += 1
+    with open(path, "w") as f:
+        json.dump(source, f)
+
+    assert ingest.ingest(changed, data_dir, ELECTION, workers=1) == {"algester"}
+    after = tables(data_dir)
+    first_prefs = before["first_prefs"]
+    first_prefs.loc[
+        (first_prefs.index == "algester")
+        & (first_prefs["ballotOrder"] == source["candidates"][0]["ballotOrderNumber"]),
+        "count",
+    ] += 1
+    for table, frame in after.items():
+        pd.testing.assert_frame_equal(frame, before[table])
+
+
+def test_removed(source_dir, tmp_path):
+    data_dir, changed = tmp_path / "data", tmp_path / "sources"
+    shutil.copytree(source_dir, changed)
+    ingest.ingest(changed, data_dir, ELECTION, workers=1)
+    before = tables(data_dir)
+
+    # its rows are removed from the tables
+    (changed / "algester.json").unlink()
+    assert ingest.ingest(changed, data_dir, ELECTION, workers=1) == {"algester"}
+    for table, frame in tables(data_dir).items():
+        old = before[table]
+        electorate = old.index if table in ingest.INDEXED else old["electorate"]
+        kept = old[electorate != "algester"]
+        if table not in ingest.INDEXED:
+            kept = kept.reset_index(drop=True)
+        pd.testing.assert_frame_equal(frame, kept)
+    # and from electorates.json
+    with open(data_dir / "electorates.json") as f:
+        stubs = [e["stub"] for e in json.load(f)]
+    assert stubs == sorted(p.stem for p in changed.glob("*.json"))
@@ -0,0 +1,55 @@
+"""PartyFlows against a groupby of the distribution rows."""
+
+import pandas as pd
+import pytest
+
+from data_store import DataStore
+
+
+@pytest.fixture(scope="module")
+def store():
+    return DataStore("data", "qld_2024", bundle=False)
+
+
+@pytest.fixture(scope="module", params=["all", "some", "one"])
+def electorates(request, store):
+    electorates = store.party_flows.electorates
+    return {"all": None, "some": electorates[::7], "one": electorates[[3]]}[
+        request.param
+    ]
+
+
+def flows(distribution, electorates):
+    """Preferences of each from, to party pair, in some electorates."""
+    if electorates is not None:
+        distribution = distribution[distribution.index.isin(electorates)]
+    return distribution.groupby(["fromParty", "toParty"], observed=True)[
+        "preferences"
+    ].sum()
+
+
+def test_table(store, electorates):
+    expected = flows(store.distribution_party, electorates).unstack(fill_value=0)
+    expected["Total"] = expected.sum(axis=1)
+    expected.loc["Total"] = expected.sum(axis=0)
+    table = store.party_flows.table(electorates)
+    pd.testing.assert_frame_equal(
+        table,
+        expected,
+        check_dtype=False,
+        check_index_type=False,
+        check_column_type=False,
+        check_names=False,
+    )
+
+
+def test_edges(store, electorates):
+    expected = flows(store.distribution_party, electorates)
+    edges = store.party_flows.edges(electorates).set_index(["fromParty", "toParty"])
+    assert edges["preferences"].to_dict() == expected.to_dict()
+    from_total = expected.groupby(level="fromParty", observed=True).transform("sum")
+    to_total = expected.groupby(level="toParty", observed=True).transform("sum")
+    from_pct = (expected / from_total * 100).to_dict()
+    to_pct = (expected / to_total * 100).to_dict()
+    assert edges["from_pct"].to_dict() == pytest.approx(from_pct)
+    assert edges["to_pct"].to_dict() == pytest.approx(to_pct)
@@ -0,0 +1,79 @@
+"""Pendulum against a reference that checks every seat's margin."""
+
+import numpy as np
+import pytest
+
+import synthetic
+from data_store import DataStore
+
+
+def margins(distribution):
+    """Holder, challenger and margin of each electorate's final two candidates."""
+    seats = {}
+    for electorate, rows in distribution.groupby(level=0, sort=False):
+        final = rows[rows["exclusion"] == rows["exclusion"].max()]
+        if len(final) < 2:
+            continue
+        # ties go to the candidate listed first
+        final = final.sort_values("toRunningTotal", ascending=False, kind="stable")
+        won, lost = final["toRunningTotal"].iloc[:2].astype(float)
+        holder, challenger = final["toParty"].iloc[:2].astype(str)
+        seats[electorate] = (holder, challenger, won / (won + lost) * 100 - 50)
+    return seats
+
+
+def flipped(seats, pair, swing):
+    """The seats the swing to pair[0] (or to pair[1], if negative) takes."""
+    to_party, from_party = pair if swing >= 0 else pair[::-1]
+    return {
+        electorate
+        for electorate, (holder, challenger, margin) in seats.items()
+        if (holder, challenger) == (from_party, to_party) and margin < abs(swing)
+    }
+
+
+@pytest.fixture(
+    scope="module",
+    params=["qld_2024", 0, 1],
+    ids=["qld_2024", "synthetic", "synthetic-2"],
+)
+def store(request, tmp_path_factory):
+    if request.param == "qld_2024":
+        return DataStore("data", "qld_2024", bundle=False)
+    data_dir = tmp_path_factory.mktemp("synthetic")
+    synthetic.write_electorates(data_dir, 60)
+    synthetic.write(
+        data_dir, "synthetic_1", synthetic.generate(60, 5, 5, request.param)
+    )
+    return DataStore(data_dir, "synthetic_1", bundle=False)
+
+
+@pytest.fixture(scope="module")
+def seats(store):
+    return margins(store.index.distribution)
+
+
+def test_margins(store, seats):
+    pendulum = store.pendulum
+    assert set(pendulum.seats.index) == set(seats)
+    for electorate, (holder, challenger, margin) in seats.items():
+        seat = pendulum.seats.loc[electorate]
+        assert (seat["holder"], seat["challenger"]) == (holder, challenger)
+        assert seat["margin"] == pytest.approx(margin)
+
+
+def test_flipped(store, seats):
+    pendulum = store.pendulum
+    # a grid of swings, and the seats' own margins, on which they are kept
+    exact = [margin for _, _, margin in seats.values()]
+    swings = np.r_[np.arange(-20, 20.5, 0.5), exact, np.negative(exact)]
+    for pair in pendulum.pairs:
+        for swing in swings:
+            expected = flipped(seats, pair, swing)
+            assert set(pendulum.flipped(pair, swing)) == expected, (pair, swing)
+            # and are added to the tally of the party the swing is to
+            tally = pendulum.tally(store.actual_party_tally, pair, swing)
+            gained = pair[0] if swing >= 0 else pair[1]
+            assert tally.get(gained, 0) == store.actual_party_tally.get(
+                gained, 0
+            ) + len(expected)
@@ -0,0 +1,84 @@
+"""RecountEngine against a reference that recounts one final count at a time."""
+
+import numpy as np
+import pytest
+
+import synthetic
+from data_store import DataStore
+
+
+def final_counts(distribution):
+    """The parties, shares and totals of each electorate's final count."""
+    counts = {}
+    for electorate, rows in distribution.groupby(level=0, sort=False):
+        final = rows[rows["exclusion"] == rows["exclusion"].max()]
+        counts[electorate] = (
+            final["fromParty"].astype(str).to_numpy(),
+            final["toParty"].astype(str).to_numpy(),
+            final["preferences"].to_numpy() / final["votesDistributed"].to_numpy(),
+            final["votesDistributed"].to_numpy(),
+            (final["toRunningTotal"] - final["preferences"]).to_numpy(),
+        )
+    return counts
+
+
+def winner(count, pair=None, rate=None):
+    """The winning party with all (rate 1) or none (rate 0) of the pair's
+    votes going to its candidates, the others sharing the rest as observed."""
+    from_party, to_party, share, votes, orig = count
+    if pair is not None:
+        fixed = (from_party == pair[0]) & (to_party == pair[1])
+        if fixed.any():
+            if rate == 1:
+                share = fixed / fixed.sum()
+            elif share[~fixed].sum() > 0:
+                share = np.where(fixed, 0, share / share[~fixed].sum())
+            else:
+                share = np.zeros(len(share))
+    # ties go to the candidate listed first
+    return to_party[(orig + votes * share).argmax()]
+
+
+@pytest.fixture(
+    scope="module",
+    params=["qld_2024", 0, 1],
+    ids=["qld_2024", "synthetic", "synthetic-2"],
+)
+def store(request, tmp_path_factory):
+    if request.param == "qld_2024":
+        return DataStore("data", "qld_2024", bundle=False)
+    data_dir = tmp_path_factory.mktemp("synthetic")
+    synthetic.write_electorates(data_dir, 60)
+    synthetic.write(
+        data_dir, "synthetic_1", synthetic.generate(60, 5, 5, request.param)
+    )
+    return DataStore(data_dir, "synthetic_1", bundle=False)
+
+
+@pytest.fixture(scope="module")
+def counts(store):
+    return final_counts(store.index.distribution)
+
+
+def test_observed(store, counts):
+    engine = store.recount
+    # every rate NaN, keeping each electorate's observed shares
+    outcome = engine.evaluate(engine.rates())
+    winners = engine.winners(outcome).iloc[0]
+    assert winners.to_dict() == {e: winner(c) for e, c in counts.items()}
+    tally = engine.tally(outcome).iloc[0]
+    actual = store.actual_party_tally
+    assert tally[tally > 0].to_dict() == actual[actual > 0].to_dict()
+
+
+def test_sweep(store, counts):
+    engine = store.recount
+    scenarios = [(pair, rate) for pair in engine.pairs for rate in [0, 1]]
+    rates = np.array([engine.rates({pair: rate}) for pair, rate in scenarios])
+    winners = engine.winners(engine.evaluate(rates))
+    flipped = 0
+    for (pair, rate), (_, row) in zip(scenarios, winners.iterrows()):
+        expected = {e: winner(c, pair, rate) for e, c in counts.items()}
+        assert row.to_dict() == expected, (pair, rate)
+        flipped += sum(expected[e] != winner(c) for e, c in counts.items())
+    assert flipped
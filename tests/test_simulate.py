@@ -0,0 +1,56 @@
+"""simulate gives the same counts however many workers its chunks run on."""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+import simulate
+from data_store import DataStore
+
+SPECS = [
+    simulate.RateSpec("The Greens", "ALP", "normal", 0.78, 0.1),
+    simulate.RateSpec("One Nation", "LNP", "beta", 6, 3),
+]
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return DataStore("data", "qld_2024", bundle=False).recount
+
+
+def run(engine, workers, seed=0):
+    return simulate.simulate(
+        engine, SPECS, 20_000, seed=seed, workers=workers, chunk_size=3_000
+    )
+
+
+async def run_async(engine, workers):
+    result = None
+    async for result in simulate.simulate_async(
+        engine, SPECS, 20_000, workers=workers, chunk_size=3_000
+    ):
+        pass
+    return result
+
+
+@pytest.fixture(scope="module")
+def one(engine):
+    return run(engine, workers=1)
+
+
+def test_draws(engine, one):
+    assert one.draws == 20_000
+    assert (one.seats.sum(axis=1) == one.draws).all()
+    assert (one.wins.sum(axis=1) == one.draws).all()
+    # the rates drawn make a difference
+    assert (one.seats > 0).sum(axis=1).max() > 1
+    assert not np.array_equal(run(engine, workers=1, seed=1).seats, one.seats)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_workers(engine, one, workers):
+    for result in [run(engine, workers), asyncio.run(run_async(engine, workers))]:
+        assert result.draws == one.draws
+        np.testing.assert_array_equal(result.seats, one.seats)
+        np.testing.assert_array_equal(result.wins, one.wins)
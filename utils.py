@@ -1,3 +1,41 @@
+import sys
+from contextlib import contextmanager
+from functools import cache
+from pathlib import Path
+
+import holoviews as hv
+
+APP_DIR = str(Path(__file__).resolve().parent)
+
+
+@contextmanager
+def app_imports():
+    """Let the app's own modules be imported after its script has run.
+
+    panel serve only puts the app's directory on sys.path while it runs the
+    script, and restores sys.path after, so a tab importing its explorer when
+    first opened would not find it.
+    """
+    added = APP_DIR not in sys.path
+    if added:
+        sys.path.insert(0, APP_DIR)
+    try:
+        yield
+    finally:
+        if added and APP_DIR in sys.path:
+            sys.path.remove(APP_DIR)
+
+
+@cache
+def load_holoviews():
+    """Load the HoloViews extension and option defaults, once per process.
+
+    Loading them again for every session keeps about 1.3 MB more per session.
+    """
+    hv.extension("bokeh")
+    hv.opts.defaults(active_tools=["pan"])
+
+
 # Bokeh hook to hide frame around the plots
 def hide_hook(plot, element):
     plot.handles["plot"].border_fill_color = None
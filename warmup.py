@@ -0,0 +1,29 @@
+"""Build every electorate's views once, when the server starts.
+
+panel serve app.py --setup warmup.py [--args --data-dir DIR --election NAME]
+"""
+
+import sys
+from pathlib import Path
+
+# panel serve runs a setup script without its directory on sys.path
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from data_store import data_args, get_store, share_frames
+from electorate_pref_explorer import CACHE_SIZE, ElectoratePrefExplorer
+from perf import SessionTimings, serve_logging
+from utils import load_holoviews
+
+load_holoviews()
+serve_logging()
+share_frames()
+
+timings = SessionTimings("warm-up")
+store = get_store(*data_args())
+with timings.timed("Electorate Explorer"):
+    ElectoratePrefExplorer(
+        store.index,
+        {v: k for k, v in store.electorates.items()},
+        cache=store.cache("electorate", CACHE_SIZE),
+    ).warm()
+timings.log()
@@ -0,0 +1,175 @@
+import holoviews as hv
+import numpy as np
+import pandas as pd
+import panel as pn
+import param
+
+from consts import colours
+from perf import timed_callback
+from utils import hide_hook
+
+intro_txt = """
+ Use the sliders below to change the share of each party's preferences that flow to another party in the final count of every electorate, and see which seats would change hands.
+
+ Where a slider doesn't fully decide an electorate's final count, the remaining votes are shared between the other candidates as they were in the election. Earlier distributions are assumed not to change.
+
+ The chart at the bottom shows how the seat tally changes as the selected preference flow is varied from 0 to 100%, with the other sliders where they are.
+ """
+
+
+class WhatIfPrefExplorer(pn.viewable.Viewer):
+    sweep = param.Selector(label="Vary preference flow")
+    tally = param.Series(doc="Seats won by each party under the current rates.")
+    sweep_tally = param.DataFrame(doc="Seats won as the swept rate varies.")
+    changed = param.DataFrame(doc="Electorates that change hands.")
+
+    def __init__(self, engine, party_tally, electorates, pairs, **params):
+        super().__init__(**params)
+        self.sliders = {}
+        self.slider_column = pn.Column()
+        # until a slider is moved, each electorate keeps its own observed flows
+        self._moved = set()
+        # every rate vector needed for the views is evaluated in one batch
+        self._pct = np.arange(101)
+        self.load(engine, party_tally, electorates, pairs)
+        self.reset = pn.widgets.Button(name="Reset to actual flows")
+        self.reset.on_click(self.reset_rates)
+
+        self.intro = pn.pane.Markdown(intro_txt)
+
+    def load(self, engine, party_tally, electorates, pairs):
+        """Recount another election, or the new counts of a live one.
+
+        Sliders the user has moved keep their values, where their pair of
+        parties is still offered; the others start at the new observed rates.
+        """
+        self.engine = engine
+        self.party_tally = party_tally
+        self.electorates = electorates
+
+        observed = engine.observed_rates
+        moved = {p: self.sliders[p].value for p in self._moved if p in pairs}
+        self.sliders = {
+            pair: pn.widgets.IntSlider(
+                name=f"{pair[0]} to {pair[1]} pref. %",
+                start=0,
+                end=100,
+                value=moved.get(pair, round(observed[pair] * 100)),
+            )
+            for pair in pairs
+        }
+        self._moved = set(moved)
+        self.slider_column.objects = list(self.sliders.values())
+        labels = {slider.name: pair for pair, slider in self.sliders.items()}
+        self.param.sweep.objects = labels
+        with param.discard_events(self):
+            if self.sweep not in labels.values():
+                self.sweep = next(iter(labels.values()))
+
+        self._observed = self.engine.evaluate(self.engine.rates()).winners[0]
+        self.rates_changed()
+        for slider in self.sliders.values():
+            slider.param.watch(self.rates_changed, "value")
+
+    def reset_rates(self, event=None):
+        observed = self.engine.observed_rates
+        with param.discard_events(self):
+            for pair, slider in self.sliders.items():
+                slider.value = round(observed[pair] * 100)
+        self._moved.clear()
+        self.rates_changed()
+
+    @pn.depends("sweep", watch=True)
+    @timed_callback
+    def rates_changed(self, *events):
+        for event in events:
+            if isinstance(event.obj, pn.widgets.IntSlider):
+                self._moved.add(self.param.sweep.objects[event.obj.name])
+        rates = self.engine.rates(
+            {pair: self.sliders[pair].value / 100 for pair in self._moved}
+        )
+        batch = np.tile(rates, (len(self._pct) + 1, 1))
+        batch[1:, self.engine.pairs.get_loc(self.sweep)] = self._pct / 100
+        outcome = self.engine.evaluate(batch)
+
+        tallies = self.engine.tally(outcome)
+        seats = tallies.loc[:, tallies.any()]
+        self.sweep_tally = seats.iloc[1:].set_index(pd.Index(self._pct, name="pct"))
+
+        tally = tallies.iloc[0]
+        self.tally = tally[tally > 0].rename("What-if")
+
+        winners = outcome.winners[0]
+        flipped = winners != self._observed
+        parties = self.engine.parties.to_numpy()
+        electorates = self.engine.electorates[flipped]
+        self.changed = pd.DataFrame(
+            {
+                "Electorate": [self.electorates[e] for e in electorates],
+                "Actual": parties[self._observed[flipped]],
+                "What-if": parties[winners[flipped]],
+            }
+        )
+
+    @pn.depends("tally")
+    @timed_callback
+    def tally_bars(self):
+        tally = pd.concat([self.party_tally, self.tally], axis=1).fillna(0)
+        tally = tally.rename_axis("party").reset_index()
+        tally = tally.melt("party", var_name="result", value_name="seats")
+        return hv.Bars(tally, ["party", "result"], ["seats"]).opts(
+            invert_axes=True,
+            color="party",
+            cmap=colours,
+            xaxis=None,
+            xlabel="",
+            show_legend=False,
+            default_tools=[],
+            tools=["hover"],
+            toolbar=None,
+            title="Total seats won",
+            hooks=[hide_hook],
+            height=300,
+        )
+
+    @pn.depends("sweep_tally")
+    @timed_callback
+    def sweep_curves(self):
+        curves = [
+            hv.Curve(
+                (self.sweep_tally.index, self.sweep_tally[party]),
+                "pct",
+                ("seats", "Seats"),
+                label=party,
+            ).opts(color=colours.get(party, "grey"))
+            for party in self.sweep_tally
+        ]
+        return hv.Overlay(curves).opts(
+            xlabel=f"{self.sweep[0]} to {self.sweep[1]} pref. %",
+            legend_position="right",
+            toolbar=None,
+            hooks=[hide_hook],
+            height=300,
+            responsive=True,
+        )
+
+    @pn.depends("changed")
+    @timed_callback
+    def changed_seats(self):
+        if self.changed.empty:
+            return pn.pane.Markdown("No seats change hands.")
+        return pn.pane.DataFrame(self.changed, index=False, sizing_mode="stretch_width")
+
+    def __panel__(self):
+        view = pn.GridSpec(sizing_mode="stretch_both", max_width=1600)
+        view[:, 0:4] = pn.Column(
+            self.intro, pn.Spacer(height=30), self.slider_column, self.reset
+        )
+        view[:, 4] = pn.Spacer()
+        view[:, 5:15] = pn.Column(
+            pn.Row(self.tally_bars, self.changed_seats),
+            self.param.sweep,
+            self.sweep_curves,
+            sizing_mode="stretch_width",
+        )
+        return view